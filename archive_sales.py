@@ -0,0 +1,33 @@
+"""
+Archival job: move closed months of sales and sales_product out of the hot
+database into one SQLite file per month, meant to run from cron.
+
+    python archive_sales.py --db inventory-final2.db --keep-months 12 --archive-dir archive
+
+The archived months stay in the daily sales reports and are read back by
+InventoryManagement.iter_sales and the "Show sales including archives" tool.
+"""
+
+import argparse
+
+from main import InventoryManagement
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old sales into per-month database files")
+    parser.add_argument("--db", default="inventory-final2.db")
+    parser.add_argument("--keep-months", type=int, default=12, help="months besides the current one to keep")
+    parser.add_argument("--archive-dir", default="", help="directory of the archive files, relative to the database")
+    parser.add_argument("--batch-size", type=int, default=5000, help="sales moved per transaction")
+    args = parser.parse_args()
+
+    inventory = InventoryManagement(args.db)
+    try:
+        moved = inventory.archive_sales(args.keep_months, args.archive_dir, args.batch_size)
+    finally:
+        inventory.close()
+
+    if not moved:
+        print("No sales to archive.")
+    for period, sales, lines in moved:
+        print(f"{period}: archived {sales} sales with {lines} lines")
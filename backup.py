@@ -0,0 +1,48 @@
+"""
+Online backup of the inventory database with the SQLite backup API, safe to
+run while the CLI or the HTTP service is writing.
+
+    python backup.py --db inventory-final2.db --dir backups
+    python backup.py --db inventory-final2.db --dir backups --interval 3600 --keep 24
+
+Without --interval one backup is taken. With it, a backup is taken every
+interval seconds until interrupted, keeping the newest --keep files.
+"""
+
+import argparse
+import time
+
+from main import BackupScheduler, InventoryManagement
+
+
+def print_progress(copied, total):
+    print(f"\rCopied {copied}/{total} pages ({100 * copied // max(total, 1)}%)", end="", flush=True)
+
+
+def print_result(result):
+    print(f"\nBacked up {result['bytes'] / 1e6:.1f} MB to {result['path']} in {result['seconds']} s "
+          f"({result['mb_per_sec']} MB/s, {result['restarts']} restarts)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online backup of the inventory database")
+    parser.add_argument("--db", default="inventory-final2.db")
+    parser.add_argument("--dir", default="backups", help="directory the backups are written to")
+    parser.add_argument("--interval", type=float, default=0, help="seconds between backups, 0 for a single backup")
+    parser.add_argument("--keep", type=int, default=24, help="number of backups to keep")
+    parser.add_argument("--pages", type=int, default=1024, help="pages copied per step")
+    parser.add_argument("--sleep", type=float, default=0.01, help="seconds to pause between steps")
+    args = parser.parse_args()
+
+    inventory = InventoryManagement(args.db)
+    scheduler = BackupScheduler(inventory, args.dir, args.interval, args.keep, args.pages, args.sleep)
+    try:
+        while True:
+            print_result(scheduler.run_once(print_progress))
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\nBackups stopped.")
+    finally:
+        inventory.close()
@@ -0,0 +1,290 @@
+"""
+Benchmark for the inventory transaction paths and display join views.
+
+For each scale factor a database is generated once with generate_data.py
+(cached in --data-dir) and copied, so every run starts from the same data.
+Each workload reports ops/sec, latency percentiles and how much the database
+file grew. With --baseline the results are compared to a stored run, and any
+workload that got slower than --tolerance is reported as a regression.
+
+    python benchmark.py --scales 0.01,0.1,1 --save-baseline benchmark-baseline.json
+    python benchmark.py --scales 0.01,0.1,1 --baseline benchmark-baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import time
+
+from generate_data import generate
+from main import JOIN_VIEWS, InventoryManagement, LatencyHistogram
+
+
+WRITE_WORKLOADS = ['purchase', 'movement', 'sales']
+VIEW_PAGE_SIZE = 50
+
+
+def db_bytes(db_name):
+    # Main file plus write-ahead log, if the database uses one
+    return sum(os.path.getsize(path) for path in (db_name, db_name + "-wal") if os.path.exists(path))
+
+
+class Benchmark:
+    def __init__(self, db_name, operations=1000, seed=42):
+        self.db_name = db_name
+        self.operations = operations
+        self.rng = random.Random(seed)
+        self.inventory = InventoryManagement(db_name)
+
+    def close(self):
+        self.inventory.close()
+
+    def new_parents(self, table, columns, rows):
+        # Insert the purchase, movement or sales rows the workload adds lines to
+        cursor = self.inventory.cursor
+        placeholders = ", ".join("?" for _ in columns)
+        cursor.execute(f"SELECT IFNULL(MAX({table}_id), 0) FROM {table}")
+        first_id = cursor.fetchone()[0] + 1
+        cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        self.inventory.conn.commit()
+        return range(first_id, first_id + len(rows))
+
+    def draws(self, scope, count):
+        # (owner_id, product_id, quantity) picks that never ask for more than is in stock
+        owner_key = "warehouse_id" if scope == "warehouse" else "location_id"
+        cursor = self.inventory.cursor
+        cursor.execute(f"SELECT {owner_key}, product_id, quantity FROM {scope}_stock WHERE quantity > 0")
+        remaining = {(owner_id, product_id): quantity for owner_id, product_id, quantity in cursor.fetchall()}
+
+        picks = []
+        while remaining and len(picks) < count:
+            pair = self.rng.choice(list(remaining))
+            quantity = min(self.rng.randint(1, 5), remaining[pair])
+            picks.append(pair + (quantity,))
+            remaining[pair] -= quantity
+            if not remaining[pair]:
+                del remaining[pair]
+        return picks
+
+    def prepare(self, workload):
+        """
+        Create the rows a write workload needs, outside the timed section
+
+        Returns:
+            list: Argument tuples, one per operation
+        """
+        rng, count, cursor = self.rng, self.operations, self.inventory.cursor
+        now = int(time.time())
+
+        if workload == 'purchase':
+            cursor.execute("SELECT MAX(product_id), MAX(supplier_id) FROM product")
+            products, suppliers = cursor.fetchone()
+            cursor.execute("SELECT warehouse_id FROM warehouse")
+            warehouses = [row[0] for row in cursor.fetchall()]
+            ids = self.new_parents('purchase', ('supplier_id', 'warehouse_id', 'purchase_date'),
+                                   [(rng.randint(1, suppliers), rng.choice(warehouses), now)
+                                    for _ in range(count)])
+            return [(rng.randint(1, products), purchase_id, rng.randint(1, 500)) for purchase_id in ids]
+
+        if workload == 'movement':
+            picks = self.draws('warehouse', count)
+            cursor.execute("SELECT location_id FROM location")
+            locations = [row[0] for row in cursor.fetchall()]
+            ids = self.new_parents('movement', ('warehouse_id', 'location_id', 'movement_date'),
+                                   [(warehouse_id, rng.choice(locations), now) for warehouse_id, _, _ in picks])
+            return [(product_id, movement_id, quantity) for (_, product_id, quantity), movement_id in zip(picks, ids)]
+
+        if workload == 'sales':
+            picks = self.draws('location', count)
+            cursor.execute("SELECT MAX(user_id) FROM user")
+            users = cursor.fetchone()[0]
+            ids = self.new_parents('sales', ('location_id', 'user_id', 'sales_date'),
+                                   [(location_id, rng.randint(1, users), now) for location_id, _, _ in picks])
+            return [(product_id, sales_id, quantity) for (_, product_id, quantity), sales_id in zip(picks, ids)]
+
+        raise ValueError(f"Unknown workload: {workload}")
+
+    def view_keys(self, table):
+        # Random existing primary keys to start pages from, found by rowid
+        cursor = self.inventory.cursor
+        cursor.execute(f"SELECT MAX(rowid) FROM {table}")
+        max_rowid = cursor.fetchone()[0] or 0
+        keys = []
+        for _ in range(self.operations if max_rowid else 0):
+            cursor.execute(f"SELECT {', '.join(self.inventory._key_columns(table))} FROM {table} WHERE rowid = ?",
+                           (self.rng.randint(1, max_rowid),))
+            row = cursor.fetchone()
+            if row:
+                keys.append(row)
+        return keys
+
+    def timed(self, function, calls):
+        # Run function once per argument tuple, returning the latency summary
+        latency = LatencyHistogram()
+        failed = 0
+        size_before = db_bytes(self.db_name)
+        started = time.perf_counter()
+        for args in calls:
+            start = time.perf_counter()
+            result = function(*args)
+            latency.record(time.perf_counter() - start)
+            failed += not result
+        elapsed = time.perf_counter() - started
+
+        summary = latency.summary()
+        summary.update(
+            ops_per_sec=round(len(calls) / elapsed, 1) if elapsed else 0.0,
+            failed=failed,
+            growth_bytes=db_bytes(self.db_name) - size_before,
+        )
+        return summary
+
+    def run(self, workloads):
+        results = {}
+        methods = {
+            'purchase': self.inventory.adjust_inventory_for_product_purchased,
+            'movement': self.inventory.adjust_inventory_for_movement,
+            'sales': self.inventory.adjust_inventory_for_sales,
+        }
+        for workload in workloads:
+            if workload in methods:
+                results[workload] = self.timed(methods[workload], self.prepare(workload))
+            else:
+                table = workload.split(":", 1)[1]
+                keys = [(None,)] + [(key,) for key in self.view_keys(table)]
+                results[workload] = self.timed(
+                    lambda after: self.inventory.fetch_page(table, VIEW_PAGE_SIZE, after), keys)
+        return results
+
+
+def prepare_database(data_dir, scale, seed):
+    # Generated databases are kept, each run works on a fresh copy
+    os.makedirs(data_dir, exist_ok=True)
+    source = os.path.join(data_dir, f"sf{scale:g}-seed{seed}.db")
+    if not os.path.exists(source):
+        print(f"Generating scale factor {scale:g} into {source}")
+        generate(source, scale, seed, progress=lambda message: None)
+
+    work = os.path.join(data_dir, "work.db")
+    for path in (work, work + "-wal", work + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.copyfile(source, work)
+    return work
+
+
+def table_rows(db_name):
+    conn = sqlite3.connect(db_name)
+    try:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        return sum(conn.execute(f"SELECT COUNT(*) FROM \"{table}\"").fetchone()[0] for table in tables)
+    finally:
+        conn.close()
+
+
+def run_benchmarks(scales, workloads, operations, seed, data_dir):
+    report = {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "operations": operations,
+        "seed": seed,
+        "scales": {},
+    }
+    for scale in scales:
+        db_name = prepare_database(data_dir, scale, seed)
+        rows = table_rows(db_name)
+        print(f"\nScale factor {scale:g}: {rows} rows, {db_bytes(db_name) / 1e6:.1f} MB")
+
+        benchmark = Benchmark(db_name, operations, seed)
+        try:
+            results = benchmark.run(workloads)
+        finally:
+            benchmark.close()
+        report["scales"][f"{scale:g}"] = {"rows": rows, "workloads": results}
+        print_results(results)
+    return report
+
+
+def print_results(results, baseline=None):
+    print(f"{'workload':<28}{'ops/sec':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'growth KB':>11}{'failed':>8}")
+    for workload, result in results.items():
+        print(f"{workload:<28}{result['ops_per_sec']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+              f"{result['p99_ms']:>10}{result['max_ms']:>10}{result['growth_bytes'] / 1024:>11.0f}{result['failed']:>8}")
+
+
+def compare(report, baseline, tolerance):
+    """
+    Compare a run with a stored baseline
+
+    Args:
+        report (dict): Results of run_benchmarks
+        baseline (dict): Results of an earlier run_benchmarks
+        tolerance (float): Allowed slowdown, 0.2 means 20%
+
+    Returns:
+        list: One message per regression
+    """
+    regressions = []
+    print(f"\nCompared with baseline (tolerance {tolerance:.0%}):")
+    for scale, current in report["scales"].items():
+        previous = baseline.get("scales", {}).get(scale)
+        if not previous:
+            print(f"  scale {scale}: not in baseline")
+            continue
+        for workload, result in current["workloads"].items():
+            old = previous["workloads"].get(workload)
+            if not old:
+                continue
+            throughput = result["ops_per_sec"] / old["ops_per_sec"] - 1 if old["ops_per_sec"] else 0.0
+            tail = result["p99_ms"] / old["p99_ms"] - 1 if old["p99_ms"] else 0.0
+            flag = ""
+            if throughput < -tolerance or tail > tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"scale {scale} {workload}: ops/sec {throughput:+.0%}, p99 {tail:+.0%}")
+            print(f"  scale {scale} {workload:<28} ops/sec {throughput:+6.0%}  p99 {tail:+6.0%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    all_workloads = WRITE_WORKLOADS + [f"view:{table}" for table in JOIN_VIEWS]
+
+    parser = argparse.ArgumentParser(description="Benchmark the inventory transaction paths")
+    parser.add_argument("--scales", default="0.01,0.1,1", help="comma separated scale factors")
+    parser.add_argument("--workloads", default=",".join(all_workloads), help="comma separated workloads")
+    parser.add_argument("--operations", type=int, default=1000, help="operations per workload")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default="bench-data", help="where generated databases are kept")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a regression, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    workloads = args.workloads.split(",")
+    unknown = set(workloads) - set(all_workloads)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+
+    report = run_benchmarks([float(scale) for scale in args.scales.split(",")],
+                            workloads, args.operations, args.seed, args.data_dir)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as file:
+                json.dump(report, file, indent=2)
+            print(f"\nResults saved to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions.")
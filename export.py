@@ -0,0 +1,132 @@
+"""
+Export the fact tables to CSV or NDJSON, streamed with flat memory use.
+
+Each table goes to its own file in --dir, optionally gzipped and optionally
+joined to readable names as in the CLI display. With --state the last
+exported rowid of every table is kept in a JSON file, and the next run only
+exports the rows added since, into a file named after that rowid. A state
+file cannot be combined with a date range: the rowid would move past rows
+outside the range and they would never be exported.
+
+    python export.py --db inventory-final2.db --format csv --gzip --start 2024-01-01 --end 2024-02-01
+    python export.py --db inventory-final2.db --tables sales,sales_product --format ndjson --state export-state.json
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import time
+
+from main import EXPORT_TABLES, InventoryManagement
+
+
+def csv_lines(columns, records):
+    # Header line, then one CSV line per record
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for record in records:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(record)
+        yield buffer.getvalue()
+
+
+def ndjson_lines(columns, records):
+    # One JSON object per line, keyed by column name
+    for record in records:
+        yield json.dumps(dict(zip(columns, record))) + "\n"
+
+
+FORMATS = {'csv': csv_lines, 'ndjson': ndjson_lines}
+
+
+def tracked(rows, progress):
+    # Pass the records of (rowid, record) pairs through, noting the last rowid and the count
+    for rowid, record in rows:
+        progress['last_rowid'] = rowid
+        progress['rows'] += 1
+        yield record
+
+
+def export_table(inventory, table, path, file_format, start=None, end=None, after_rowid=0, joined=False,
+                 compress=False):
+    """
+    Stream one table into path, written to a .partial file and renamed once complete
+
+    Returns:
+        dict: rows written and last_rowid, after_rowid if there were none
+    """
+    progress = {'rows': 0, 'last_rowid': after_rowid}
+    records = tracked(inventory.export_records(table, start, end, after_rowid, joined), progress)
+    lines = FORMATS[file_format](inventory.export_columns(table, joined), records)
+
+    partial = path + ".partial"
+    opener = gzip.open if compress else open
+    with opener(partial, "wt", newline="", encoding="utf-8") as file:
+        for line in lines:
+            file.write(line)
+    os.replace(partial, path)
+    return progress
+
+
+def load_state(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_state(path, state):
+    # Written after every table, so a failed run resumes after the tables it finished
+    with open(path + ".partial", "w") as file:
+        json.dump(state, file, indent=2)
+    os.replace(path + ".partial", path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the fact tables to CSV or NDJSON")
+    parser.add_argument("--db", default="inventory-final2.db")
+    parser.add_argument("--tables", default=",".join(EXPORT_TABLES), help="comma separated tables")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--dir", default="export", help="directory the files are written to")
+    parser.add_argument("--joined", action="store_true", help="join line tables to product, location and other names")
+    parser.add_argument("--start", help="only rows dated on or after, YYYY-MM-DD[ HH:MM:SS] UTC")
+    parser.add_argument("--end", help="only rows dated before, YYYY-MM-DD[ HH:MM:SS] UTC")
+    parser.add_argument("--gzip", action="store_true", help="compress the files")
+    parser.add_argument("--after-rowid", type=int, default=0, help="only rows after this rowid")
+    parser.add_argument("--state", help="JSON file of the last exported rowid per table, to resume from, "
+                                        "not with --start or --end")
+    args = parser.parse_args()
+
+    tables = args.tables.split(",")
+    unknown = set(tables) - set(EXPORT_TABLES)
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(sorted(unknown))}")
+    if args.state and (args.start or args.end):
+        # Rows outside the range that are older than the last one exported would be skipped for good
+        parser.error("--state cannot be combined with --start or --end")
+
+    state = load_state(args.state)
+    os.makedirs(args.dir, exist_ok=True)
+    inventory = InventoryManagement(args.db)
+    try:
+        for table in tables:
+            after_rowid = state.get(table, args.after_rowid)
+            name = table if not after_rowid else f"{table}-after-{after_rowid}"
+            path = os.path.join(args.dir, f"{name}.{args.format}" + (".gz" if args.gzip else ""))
+
+            started = time.perf_counter()
+            progress = export_table(inventory, table, path, args.format, args.start, args.end, after_rowid,
+                                    args.joined and table != EXPORT_TABLES[table], args.gzip)
+            print(f"{table}: {progress['rows']} rows to {path} in {time.perf_counter() - started:.1f}s, "
+                  f"last rowid {progress['last_rowid']}")
+            state[table] = progress['last_rowid']
+            if args.state:
+                save_state(args.state, state)
+    finally:
+        inventory.close()
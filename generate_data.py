@@ -0,0 +1,218 @@
+"""
+Synthetic data generator for the SpeedyEats schema.
+
+Populates every table created by InventoryManagement.create_tables at a
+chosen scale factor. The same seed and scale always produce the same
+database. Popularity is skewed: a few products, stores and customers account
+for most of the sales, as in production.
+
+Scale factor 1 is about 300 thousand sales lines; 100 is about 30 million.
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import time
+from itertools import accumulate, islice
+
+from main import InventoryManagement
+
+
+# Rows per table at scale factor 1
+BASE_COUNTS = {
+    'supplier': 50,
+    'product': 500,
+    'warehouse': 5,
+    'location': 100,
+    'user': 10000,
+    'purchase': 400,
+    'movement': 4000,
+    'sales': 100000,
+}
+
+WAREHOUSE_INVENTORIES = 4      # warehouse_inventory rows per warehouse
+LOCATION_INVENTORIES = 2       # location_inventory rows per location
+PURCHASE_LINES = 20            # average product_purchased rows per purchase
+MOVEMENT_LINES = 10            # average movement_product rows per movement
+SALES_LINES = 3                # average sales_product rows per sale
+HISTORY_DAYS = 365             # dates are spread over this many days before START_DATE
+START_DATE = datetime.date(2024, 12, 1)
+BATCH_SIZE = 50000             # rows per executemany call
+
+# Parents before children so foreign keys always resolve
+LOAD_ORDER = [
+    'supplier', 'nutrition', 'product', 'warehouse', 'location', 'user',
+    'warehouse_inventory', 'location_inventory', 'purchase', 'movement', 'sales',
+    'product_purchased', 'movement_product', 'sales_product', 'warehouse_product', 'location_product',
+]
+
+CATEGORIES = ['Fruits', 'Vegetables', 'Dairy', 'Bakery', 'Beverages', 'Snacks', 'Meat', 'Seafood', 'Grains', 'Frozen']
+LOCATION_TYPES = ['Retail Store', 'Kiosk', 'Drive-Thru', 'Office']
+USER_TYPES = ['customer', 'member', 'staff']
+
+
+def zipf_weights(count, exponent=1.1):
+    # Cumulative weights for random.choices, item 1 is the most popular
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def batched(rows, size=BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class DataGenerator:
+    def __init__(self, db_name, scale=1.0, seed=42):
+        self.db_name = db_name
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.counts = {table: max(1, int(count * scale)) for table, count in BASE_COUNTS.items()}
+        self.counts['nutrition'] = self.counts['product']
+
+        self.product_weights = zipf_weights(self.counts['product'])
+        self.location_weights = zipf_weights(self.counts['location'], 0.8)
+        self.user_weights = zipf_weights(self.counts['user'], 0.6)
+
+    def pick(self, count, weights, k=1):
+        return self.rng.choices(range(1, count + 1), cum_weights=weights, k=k)
+
+    def distinct_products(self, average):
+        # Distinct products for one basket, purchase or movement
+        size = max(1, min(self.counts['product'], int(self.rng.expovariate(1 / average)) + 1))
+        return set(self.pick(self.counts['product'], self.product_weights, size))
+
+    def stocked_products(self, share):
+        # Uniform share of the catalogue carried by one inventory
+        count = self.counts['product']
+        return sorted(self.rng.sample(range(1, count + 1), max(1, int(count * share))))
+
+    def random_date(self):
+        # Epoch seconds within the HISTORY_DAYS before START_DATE, as the date columns store them
+        start = datetime.datetime.combine(START_DATE, datetime.time(), datetime.timezone.utc).timestamp()
+        return int(start) - self.rng.randrange(HISTORY_DAYS * 86400)
+
+    def rows(self, table):
+        counts, rng = self.counts, self.rng
+        ids = range(1, counts.get(table, 0) + 1)
+
+        if table == 'supplier':
+            return ((i, f"Supplier {i}", f"{rng.randrange(1, 9999)} Market St, City {i % 97}") for i in ids)
+        if table == 'nutrition':
+            return ((i, f"{rng.randrange(1, 365)} days", f"{rng.randrange(1, 500)} g",
+                     round(rng.uniform(10, 800), 1), round(rng.uniform(0.1, 40), 1), round(rng.uniform(0.1, 40), 1),
+                     round(rng.uniform(0.1, 60), 1), round(rng.uniform(0.1, 90), 1)) for i in ids)
+        if table == 'product':
+            return ((i, f"Product {i}", f"Brand {rng.randrange(1, 200)}", rng.choice(CATEGORIES),
+                     round(rng.uniform(0.2, 40), 2), rng.randrange(1, counts['supplier'] + 1), i) for i in ids)
+        if table == 'warehouse':
+            return ((i, f"Warehouse {i}", f"{rng.randrange(1, 9999)} Depot Rd, Region {i}") for i in ids)
+        if table == 'location':
+            return ((i, f"Store {i}", rng.choice(LOCATION_TYPES), f"{rng.randrange(1, 9999)} Main St, Town {i}",
+                     f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}") for i in ids)
+        if table == 'user':
+            return ((i, f"User {i}", f"user{i}@example.com", rng.choice(USER_TYPES),
+                     f"{rng.randrange(1, 9999)} Elm St", f"555-{rng.randrange(1000000):07d}") for i in ids)
+        if table == 'warehouse_inventory':
+            return ((i, (i - 1) // WAREHOUSE_INVENTORIES + 1, self.random_date())
+                    for i in range(1, counts['warehouse'] * WAREHOUSE_INVENTORIES + 1))
+        if table == 'location_inventory':
+            return ((i, (i - 1) // LOCATION_INVENTORIES + 1, self.random_date())
+                    for i in range(1, counts['location'] * LOCATION_INVENTORIES + 1))
+        if table == 'purchase':
+            return ((i, rng.randrange(1, counts['supplier'] + 1), rng.randrange(1, counts['warehouse'] + 1),
+                     self.random_date()) for i in ids)
+        if table == 'movement':
+            return ((i, rng.randrange(1, counts['warehouse'] + 1),
+                     self.pick(counts['location'], self.location_weights)[0], self.random_date()) for i in ids)
+        if table == 'sales':
+            return ((i, self.pick(counts['location'], self.location_weights)[0],
+                     self.pick(counts['user'], self.user_weights)[0], self.random_date()) for i in ids)
+        if table == 'product_purchased':
+            return ((product_id, purchase_id, rng.randrange(50, 1000))
+                    for purchase_id in range(1, counts['purchase'] + 1)
+                    for product_id in self.distinct_products(PURCHASE_LINES))
+        if table == 'movement_product':
+            return ((product_id, movement_id, rng.randrange(5, 200))
+                    for movement_id in range(1, counts['movement'] + 1)
+                    for product_id in self.distinct_products(MOVEMENT_LINES))
+        if table == 'sales_product':
+            return ((product_id, sales_id, rng.randrange(1, 6))
+                    for sales_id in range(1, counts['sales'] + 1)
+                    for product_id in self.distinct_products(SALES_LINES))
+        if table == 'warehouse_product':
+            return ((product_id, inventory_id, rng.randrange(0, 5000))
+                    for inventory_id in range(1, counts['warehouse'] * WAREHOUSE_INVENTORIES + 1)
+                    for product_id in self.stocked_products(0.6))
+        if table == 'location_product':
+            return ((product_id, inventory_id, rng.randrange(0, 500))
+                    for inventory_id in range(1, counts['location'] * LOCATION_INVENTORIES + 1)
+                    for product_id in self.stocked_products(0.3))
+        raise ValueError(f"No generator for table {table}")
+
+    def generate(self, progress=print):
+        """
+        Create the schema and load every table
+
+        Returns:
+            dict: Rows inserted per table
+        """
+        inventory = InventoryManagement(self.db_name)
+        conn, cursor = inventory.conn, inventory.cursor
+
+        cursor.execute("SELECT COUNT(*) FROM product")
+        if cursor.fetchone()[0]:
+            inventory.close()
+            raise ValueError(f"{self.db_name} already has data, generate into a new file")
+
+        # A failed load is simply regenerated, so skip the fsyncs
+        cursor.execute("PRAGMA synchronous = OFF")
+
+        inserted = {}
+        for table in LOAD_ORDER:
+            start = time.perf_counter()
+            cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+            placeholders = ", ".join("?" for _ in cursor.description)
+
+            inserted[table] = 0
+            for batch in batched(self.rows(table)):
+                cursor.executemany(f"INSERT INTO {table} VALUES ({placeholders})", batch)
+                inserted[table] += len(batch)
+            conn.commit()
+            progress(f"{table}: {inserted[table]} rows in {time.perf_counter() - start:.1f}s")
+
+        # sales_product was loaded directly, not through the sale path that maintains sales_daily
+        # and the inventory ledger
+        inventory.rebuild_sales_daily(commit=False)
+        inventory.seed_inventory_ledger(commit=False)
+        cursor.execute("ANALYZE")
+        conn.commit()
+        inventory.close()
+        return inserted
+
+
+def generate(db_name, scale=1.0, seed=42, progress=print):
+    return DataGenerator(db_name, scale, seed).generate(progress)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic SpeedyEats database")
+    parser.add_argument("--db", default="speedyeats-sf1.db", help="new database file to create")
+    parser.add_argument("--scale", type=float, default=1.0, help="scale factor, 1 is about 300k sales lines")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        print(f"Error: {args.db} already exists.")
+    else:
+        try:
+            started = time.perf_counter()
+            counts = generate(args.db, args.scale, args.seed)
+            print(f"Generated {sum(counts.values())} rows into {args.db} in {time.perf_counter() - started:.1f}s")
+        except (ValueError, sqlite3.Error) as e:
+            print(f"An error occurred: {e}")
@@ -1,19 +1,873 @@
 import sqlite3
+import collections
 import datetime
+import heapq
+import itertools
+import json
+import math
+import os
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+# Item table, inventory table, inventory key and owner key for each stock scope
+INVENTORY_SCOPES = {
+    'warehouse': ('warehouse_product', 'warehouse_inventory', 'warehouse_inventory_id', 'warehouse_id'),
+    'location': ('location_product', 'location_inventory', 'location_inventory_id', 'location_id'),
+}
+
+# Per-(product, owner) stock totals kept in step with each scope's item table
+STOCK_ROLLUPS = {
+    'warehouse': 'warehouse_stock',
+    'location': 'location_stock',
+}
+
+# Reorder point of a product per warehouse or location, watched by the stock_alert triggers
+REORDER_POINTS = {
+    'warehouse': 'warehouse_reorder_point',
+    'location': 'location_reorder_point',
+}
+
+# Draw-down order of the inventory rows for each allocation policy
+ALLOCATION_POLICIES = {
+    'largest': 'quantity DESC, inventory_id',
+    'fifo': 'last_updated, inventory_id',
+    'explicit': 'priority, inventory_id',
+}
+
+# Primary key columns of the junction tables, every other table is keyed by {table}_id
+JUNCTION_KEYS = {
+    "product_purchased": ["product_id", "purchase_id"],
+    "warehouse_product": ["product_id", "warehouse_inventory_id"],
+    "movement_product": ["product_id", "movement_id"],
+    "location_product": ["product_id", "location_inventory_id"],
+    "sales_product": ["product_id", "sales_id"],
+}
+
+# Junction tables are displayed joined to the names of the rows they link
+JOIN_VIEWS = {
+    "product_purchased": ('''
+        SELECT
+            pp.product_id,
+            p.product_name,
+            pp.purchase_id,
+            datetime(pu.purchase_date, 'unixepoch') AS purchase_date,
+            s.name AS supplier_name,
+            w.name AS warehouse_name,
+            pp.quantity
+        FROM product_purchased pp
+        JOIN product p ON pp.product_id = p.product_id
+        JOIN purchase pu ON pp.purchase_id = pu.purchase_id
+        JOIN supplier s ON pu.supplier_id = s.supplier_id
+        JOIN warehouse w ON pu.warehouse_id = w.warehouse_id
+        ''', ["Product ID", "Product Name", "Purchase ID", "Purchase Date", "Supplier Name", "Warehouse Name", "Quantity"]),
+
+    "movement_product": ('''
+        SELECT
+            mp.product_id,
+            p.product_name,
+            mp.movement_id,
+            date(m.movement_date, 'unixepoch') AS movement_date,
+            w.name AS warehouse_name,
+            l.name AS location_name,
+            mp.quantity
+        FROM movement_product mp
+        JOIN product p ON mp.product_id = p.product_id
+        JOIN movement m ON mp.movement_id = m.movement_id
+        JOIN warehouse w ON m.warehouse_id = w.warehouse_id
+        JOIN location l ON m.location_id = l.location_id
+        ''', ["Product ID", "Product Name", "Movement ID", "Movement Date", "Warehouse Name", "Location Name", "Quantity"]),
+
+    "sales_product": ('''
+        SELECT
+            sp.product_id,
+            p.product_name,
+            sp.sales_id,
+            date(s.sales_date, 'unixepoch') AS sales_date,
+            u.name AS customer_name,
+            l.name AS location_name,
+            sp.quantity
+        FROM sales_product sp
+        JOIN product p ON sp.product_id = p.product_id
+        JOIN sales s ON sp.sales_id = s.sales_id
+        JOIN user u ON s.user_id = u.user_id
+        JOIN location l ON s.location_id = l.location_id
+        ''', ["Product ID", "Product Name", "Sales ID", "Sales Date", "Customer Name", "Location Name", "Quantity"]),
+
+    "warehouse_product": ('''
+        SELECT
+            wp.product_id,
+            p.product_name,
+            wi.warehouse_inventory_id,
+            w.warehouse_id,
+            w.name AS warehouse_name,
+            wp.quantity
+        FROM warehouse_product wp
+        JOIN product p ON wp.product_id = p.product_id
+        JOIN warehouse_inventory wi ON wp.warehouse_inventory_id = wi.warehouse_inventory_id
+        JOIN warehouse w ON wi.warehouse_id = w.warehouse_id
+        ''', ["Product ID", "Product Name", "Warehouse Inventory ID", "Warehouse ID", "Warehouse Name", "Quantity"]),
+
+    "location_product": ('''
+        SELECT
+            lp.product_id,
+            p.product_name,
+            li.location_inventory_id,
+            l.location_id,
+            l.name AS location_name,
+            lp.quantity
+        FROM location_product lp
+        JOIN product p ON lp.product_id = p.product_id
+        JOIN location_inventory li ON lp.location_inventory_id = li.location_inventory_id
+        JOIN location l ON li.location_id = l.location_id
+        ''', ["Product ID", "Product Name", "Location Inventory ID", "Location ID", "Location Name", "Quantity"]),
+}
+
+# Records shown per page by display_record
+DISPLAY_PAGE_SIZE = 50
+
+# Junction rows that move stock are inserted through their adjust_inventory_for_* method
+ADJUSTMENT_TABLES = {
+    "product_purchased": ("adjust_inventory_for_product_purchased", "purchase_id"),
+    "movement_product": ("adjust_inventory_for_movement", "movement_id"),
+    "sales_product": ("adjust_inventory_for_sales", "sales_id"),
+}
+
+# Fact tables export_records streams, and the table whose date filters each one's rows
+EXPORT_TABLES = {
+    "purchase": "purchase",
+    "product_purchased": "purchase",
+    "movement": "movement",
+    "movement_product": "movement",
+    "sales": "sales",
+    "sales_product": "sales",
+}
+
+# Date column of each table, stored as integer epoch seconds (UTC), and its display format
+DATE_COLUMNS = {
+    "purchase": ("purchase_date", "%Y-%m-%d %H:%M:%S"),
+    "warehouse_inventory": ("last_updated", "%Y-%m-%d %H:%M:%S"),
+    "movement": ("movement_date", "%Y-%m-%d"),
+    "location_inventory": ("last_updated", "%Y-%m-%d %H:%M:%S"),
+    "sales": ("sales_date", "%Y-%m-%d"),
+}
+
+def to_epoch(value):
+    # Epoch seconds for a date column, text is read as 'YYYY-MM-DD[ HH:MM:SS]' in UTC
+    if not isinstance(value, str):
+        return value
+    for date_format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            moment = datetime.datetime.strptime(value.strip(), date_format)
+        except ValueError:
+            continue
+        return int(moment.replace(tzinfo=datetime.timezone.utc).timestamp())
+    raise ValueError(f"Invalid date: {value}")
+
+
+def is_locked_error(error):
+    # SQLITE_BUSY or SQLITE_LOCKED, "database is locked" and its variants
+    return getattr(error, 'sqlite_errorcode', 0) & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def format_epoch(value, date_format="%Y-%m-%d %H:%M:%S"):
+    # Display text of a date column value, UTC like SQLite's 'unixepoch'
+    if not isinstance(value, int):
+        return value
+    return datetime.datetime.fromtimestamp(value, datetime.timezone.utc).strftime(date_format)
+
+
+# Indexes on foreign key child columns that are not the leading column of a primary key
+FOREIGN_KEY_INDEXES = [
+    ('idx_purchase_supplier', 'purchase', 'supplier_id'),
+    ('idx_purchase_warehouse', 'purchase', 'warehouse_id'),
+    ('idx_product_supplier', 'product', 'supplier_id'),
+    ('idx_product_nutrition', 'product', 'nutrition_id'),
+    ('idx_warehouse_inventory_warehouse', 'warehouse_inventory', 'warehouse_id'),
+    ('idx_movement_warehouse', 'movement', 'warehouse_id'),
+    ('idx_movement_location', 'movement', 'location_id'),
+    ('idx_location_inventory_location', 'location_inventory', 'location_id'),
+    ('idx_sales_location', 'sales', 'location_id'),
+    ('idx_sales_user', 'sales', 'user_id'),
+    ('idx_product_purchased_purchase', 'product_purchased', 'purchase_id'),
+    ('idx_warehouse_product_inventory', 'warehouse_product', 'warehouse_inventory_id'),
+    ('idx_movement_product_movement', 'movement_product', 'movement_id'),
+    ('idx_location_product_inventory', 'location_product', 'location_inventory_id'),
+    ('idx_sales_product_sales', 'sales_product', 'sales_id'),
+]
+
+# Date range indexes, for reports bounded by date per warehouse or location
+DATE_INDEXES = [
+    ('idx_purchase_date_warehouse', 'purchase', 'purchase_date, warehouse_id'),
+    ('idx_movement_date_warehouse', 'movement', 'movement_date, warehouse_id'),
+    ('idx_movement_date_location', 'movement', 'movement_date, location_id'),
+    ('idx_sales_date_location', 'sales', 'sales_date, location_id'),
+]
+
+# Schema migrations in order, PRAGMA user_version holds how many have been applied.
+# Append new steps, never reorder or edit ones that have shipped.
+MIGRATIONS = [
+    "create_tables",                    # 1
+    "create_indexes",                   # 2
+    "create_stock_rollups",             # 3
+    "create_sales_daily",               # 4
+    "split_rollup_update_triggers",     # 5
+    "create_stock_alerts",              # 6
+    "encode_dates_as_epoch",            # 7
+    "create_sales_archive",             # 8
+    "add_reorder_targets",              # 9
+    "create_inventory_ledger",          # 10
+    "date_ledger_checkpoints",          # 11
+    "create_dimension_versions",        # 12
+    "store_checkpoint_changes",         # 13
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Day of a sale (alias s) as stored in sales_daily
+SALES_DAY = "date(s.sales_date, 'unixepoch')"
+
+# Tables moved to the per-month archive files, parents first, with their columns in order
+ARCHIVE_TABLES = {
+    "sales": "sales_id INTEGER PRIMARY KEY, location_id INTEGER, user_id INTEGER, sales_date INTEGER",
+    "sales_product": "product_id INTEGER, sales_id INTEGER, quantity INTEGER, PRIMARY KEY(product_id, sales_id)",
+}
+ARCHIVE_INDEXES = [
+    ('idx_sales_date_location', 'sales', 'sales_date, location_id'),
+    ('idx_sales_product_sales', 'sales_product', 'sales_id'),
+]
+
+# SQLite attaches at most 10 databases by default, archives are read this many at a time
+ARCHIVE_ATTACH_LIMIT = 8
+
+# Bits of an ID below the shard number. Shard n numbers its purchases, movements,
+# sales and inventories from n << SHARD_ID_BITS, so such an ID names its shard.
+SHARD_ID_BITS = 40
+
+# Tables every shard holds in full, parents first
+SHARD_CATALOGUE_TABLES = ['supplier', 'nutrition', 'product', 'warehouse', 'location', 'user']
+
+# Tables whose rows belong to one warehouse or location: (scope, owner column)
+SHARD_OWNERS = {
+    'purchase': ('warehouse', 'warehouse_id'),
+    'warehouse_inventory': ('warehouse', 'warehouse_id'),
+    'movement': ('warehouse', 'warehouse_id'),
+    'location_inventory': ('location', 'location_id'),
+    'sales': ('location', 'location_id'),
+}
+
+# The ID column of each sharded table that names its shard
+SHARD_ID_COLUMNS = {
+    'purchase': 'purchase_id',
+    'warehouse_inventory': 'warehouse_inventory_id',
+    'movement': 'movement_id',
+    'location_inventory': 'location_inventory_id',
+    'sales': 'sales_id',
+    'product_purchased': 'purchase_id',
+    'warehouse_product': 'warehouse_inventory_id',
+    'movement_product': 'movement_id',
+    'location_product': 'location_inventory_id',
+    'sales_product': 'sales_id',
+}
+
+# Slowly changing tables kept in DimensionCache, and how many rows it holds
+DIMENSION_TABLES = ('product', 'supplier', 'nutrition', 'warehouse', 'location')
+DIMENSION_CACHE_SIZE = 10000
+
+# Sources of inventory_ledger entries
+LEDGER_SOURCES = {
+    'opening': "Stock on hand when the ledger was started that its history does not explain",
+    'purchase': "Products purchased into a warehouse",
+    'movement': "Products moved from a warehouse to a location, one entry on each side",
+    'sale': "Products sold at a location",
+    'edit': "A warehouse_product or location_product record inserted, changed or deleted by hand",
+}
+
+# Ledger entries appended after the newest checkpoint before the next is taken
+LEDGER_CHECKPOINT_ENTRIES = 10000
+
+# Column names per database file and table, loaded once per process
+COLUMN_CACHE = {}
+
+# Error codes of a failed AdjustmentResult
+ADJUSTMENT_ERRORS = {
+    'not_found': "The purchase, movement or sale does not exist",
+    'invalid_quantity': "A quantity is not a positive number",
+    'empty_basket': "A sale has no lines",
+    'no_stock': "A product is not stocked at the warehouse or location",
+    'insufficient_stock': "A product is stocked but not in the requested quantity",
+    'conflict': "A constraint failed, for example the line was already recorded",
+    'cross_shard': "A movement goes from a warehouse in one region to a location in another",
+    'busy': "The database stayed locked by other writers through every retry",
+    'database_error': "SQLite raised an error",
+}
+
+# Attempts of an adjustment when the database is locked, and the base of the
+# jittered exponential delay between them in seconds
+ADJUSTMENT_ATTEMPTS = 5
+ADJUSTMENT_RETRY_DELAY = 0.02
+
+
+class AdjustmentResult:
+    """
+    Outcome of an inventory adjustment, truthy when it was applied
+
+    Attributes:
+        ok (bool): Whether the adjustment was applied
+        error (str): Key of ADJUSTMENT_ERRORS when not applied, else None
+        detail (str): One line describing the outcome, for display
+        plan (list): (product_id, inventory_id, quantity) reductions drawn by
+            the allocation engine, empty for purchases
+        quantities (dict): (scope, owner_id, product_id) -> quantity on hand
+            after the adjustment
+        shortages (list): (product_id, requested, available) for stock errors
+    """
+
+    __slots__ = ('ok', 'error', 'detail', 'plan', 'quantities', 'shortages')
+
+    def __init__(self, ok, error=None, detail='', plan=None, quantities=None, shortages=None):
+        self.ok = ok
+        self.error = error
+        self.detail = detail
+        self.plan = plan or []
+        self.quantities = quantities or {}
+        self.shortages = shortages or []
+
+    @classmethod
+    def failure(cls, error, detail, shortages=None):
+        return cls(False, error, detail, shortages=shortages)
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        if self.ok:
+            return f"AdjustmentResult(ok, {self.detail!r})"
+        return f"AdjustmentResult({self.error}, {self.detail!r})"
+
+    def as_dict(self):
+        # JSON friendly form, quantities become a list since their keys are tuples
+        return {
+            'ok': self.ok,
+            'error': self.error,
+            'detail': self.detail,
+            'plan': [list(step) for step in self.plan],
+            'quantities': [
+                {'scope': scope, 'owner_id': owner_id, 'product_id': product_id, 'quantity': quantity}
+                for (scope, owner_id, product_id), quantity in self.quantities.items()
+            ],
+            'shortages': [list(shortage) for shortage in self.shortages],
+        }
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with logarithmic buckets and constant memory
+
+    Bucket bounds grow by 10%, so reported percentiles are within about 10%
+    of the exact value however many samples are recorded.
+    """
+
+    GROWTH = 1.1
+    FLOOR = 1e-6
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        index = int(math.log(max(seconds, self.FLOOR) / self.FLOOR, self.GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the given fraction of samples, in seconds
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.FLOOR * self.GROWTH ** (index + 1), self.max)
+        return self.max
+
+    def summary(self):
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 3)
+
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "p50_ms": ms(self.percentile(0.50)),
+            "p95_ms": ms(self.percentile(0.95)),
+            "p99_ms": ms(self.percentile(0.99)),
+            "max_ms": ms(self.max),
+        }
+
+
+class QueryStats:
+    """
+    Per-statement counters collected by InstrumentedCursor
+
+    Statements are grouped by shape: the SQL text with whitespace collapsed,
+    which identifies a statement because every value is bound as a parameter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.statements = {}
+            self.traced = {}
+
+    @staticmethod
+    def shape(sql):
+        return " ".join(sql.split())
+
+    def _entry(self, shape):
+        entry = self.statements.get(shape)
+        if entry is None:
+            entry = self.statements[shape] = {"rows": 0, "latency": LatencyHistogram()}
+        return entry
+
+    def record(self, shape, seconds, rows):
+        with self._lock:
+            entry = self._entry(shape)
+            entry["rows"] += rows
+            entry["latency"].record(seconds)
+
+    def add_rows(self, shape, rows):
+        with self._lock:
+            self._entry(shape)["rows"] += rows
+
+    def trace(self, statement):
+        # set_trace_callback hook. SQLite reports statements with their bound
+        # values expanded, and once more for every trigger they fire.
+        shape = re.sub(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b", "?", self.shape(statement))
+        with self._lock:
+            self.traced[shape] = self.traced.get(shape, 0) + 1
+
+    def report(self):
+        with self._lock:
+            statements = sorted(self.statements.items(), key=lambda item: -item[1]["latency"].total)
+            return {
+                "statements": [
+                    dict(sql=shape, rows=entry["rows"], total_ms=round(entry["latency"].total * 1000, 3),
+                         **entry["latency"].summary())
+                    for shape, entry in statements
+                ],
+                "traced": dict(sorted(self.traced.items(), key=lambda item: -item[1])),
+            }
+
+
+class InstrumentedCursor:
+    # sqlite3.Cursor wrapper that times every execute and counts rows
+    def __init__(self, cursor, connection, stats):
+        self._cursor = cursor
+        self.connection = connection
+        self._stats = stats
+        self._shape = None
+
+    def _timed(self, method, sql, *args):
+        self._shape = self._stats.shape(sql)
+        start = time.perf_counter()
+        try:
+            getattr(self._cursor, method)(sql, *args)
+        finally:
+            rows = max(self._cursor.rowcount, 0)
+            self._stats.record(self._shape, time.perf_counter() - start, rows)
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._timed("execute", sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed("executemany", sql, seq_of_parameters)
+
+    def _fetched(self, rows):
+        if self._shape is not None:
+            self._stats.add_rows(self._shape, len(rows))
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._fetched([row])
+        return row
+
+    def fetchmany(self, size=None):
+        return self._fetched(self._cursor.fetchmany(size or self._cursor.arraysize))
+
+    def fetchall(self):
+        return self._fetched(self._cursor.fetchall())
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    # sqlite3.Connection wrapper whose cursors are instrumented, commits are timed too
+    def __init__(self, conn, stats):
+        self._conn = conn
+        self._stats = stats
+
+    def cursor(self):
+        return InstrumentedCursor(self._conn.cursor(), self, self._stats)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        self._conn.commit()
+        self._stats.record("COMMIT", time.perf_counter() - start, 0)
+
+    def rollback(self):
+        start = time.perf_counter()
+        self._conn.rollback()
+        self._stats.record("ROLLBACK", time.perf_counter() - start, 0)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def instrument_connection(conn, stats, trace=False):
+    if trace:
+        conn.set_trace_callback(stats.trace)
+    return InstrumentedConnection(conn, stats)
+
+
+class DimensionCache:
+    """
+    Read-through LRU cache of rows of the slowly changing DIMENSION_TABLES
+
+    Rows are looked up by primary key and kept, least recently used first
+    out, up to capacity rows over all tables. Writes through this process
+    call invalidate. Writes by other connections are noticed through
+    PRAGMA data_version, which changes whenever another connection commits:
+    the dimension_version counters, bumped by triggers on every dimension
+    table, then tell which tables changed, and only those are dropped.
+    """
+
+    def __init__(self, capacity=DIMENSION_CACHE_SIZE):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._rows = collections.OrderedDict()
+        self._data_versions = {}
+        self._table_versions = {}
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, cursor, table, key):
+        # One row as a dict, None if there is none
+        return self.get_many(cursor, table, [key]).get(key)
+
+    def get_many(self, cursor, table, keys):
+        """
+        Rows of one table by primary key, reading the missing ones in one query
+
+        Args:
+            cursor: Cursor to check freshness and read through
+            table (str): One of DIMENSION_TABLES
+            keys (list): Primary key values
+
+        Returns:
+            dict: key -> row as a dict, keys without a row are left out
+        """
+        self._check_fresh(cursor)
+        found, missing = {}, []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                row = self._rows.get((table, key))
+                if row is None:
+                    missing.append(key)
+                else:
+                    self._rows.move_to_end((table, key))
+                    found[key] = row
+            self.stats['hits'] += len(found)
+            self.stats['misses'] += len(missing)
+        if not missing:
+            return found
+
+        cursor.execute(f"SELECT * FROM {table} WHERE {table}_id IN (SELECT value FROM json_each(?))",
+                       (json.dumps(missing),))
+        columns = [description[0] for description in cursor.description]
+        rows = {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+        with self._lock:
+            for key, row in rows.items():
+                self._rows[table, key] = row
+            while len(self._rows) > self.capacity:
+                self._rows.popitem(last=False)
+                self.stats['evictions'] += 1
+        found.update(rows)
+        return found
+
+    def invalidate(self, table, key=None):
+        # Drop one cached row, or every row of the table when key is None
+        if table not in DIMENSION_TABLES:
+            return
+        with self._lock:
+            if key is not None:
+                dropped = [(table, key)] if self._rows.pop((table, key), None) is not None else []
+            else:
+                dropped = [cached for cached in self._rows if cached[0] == table]
+                for cached in dropped:
+                    del self._rows[cached]
+            self.stats['invalidations'] += len(dropped)
+
+    def clear(self):
+        with self._lock:
+            self.stats['invalidations'] += len(self._rows)
+            self._rows.clear()
+
+    def _check_fresh(self, cursor):
+        # Drop the tables another connection changed since this connection last looked
+        connection = cursor.connection
+        data_version = cursor.execute("PRAGMA data_version").fetchone()[0]
+        if self._data_versions.get(id(connection)) == data_version:
+            return
+        cursor.execute("SELECT table_name, version FROM dimension_version")
+        versions = dict(cursor.fetchall())
+        with self._lock:
+            self._data_versions[id(connection)] = data_version
+            changed = [table for table in DIMENSION_TABLES
+                       if self._table_versions.get(table) != versions.get(table)]
+            self._table_versions = versions
+        for table in changed:
+            self.invalidate(table)
+
+    def cache_stats(self):
+        with self._lock:
+            stats = dict(self.stats, rows=len(self._rows), capacity=self.capacity)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else None
+        return stats
+
+
+class ConnectionPool:
+    """
+    Per-thread SQLite connections for several terminals sharing one database
+
+    The database is switched to WAL so readers do not block behind a writer.
+    Every thread gets its own write connection and its own read-only
+    connection, opened on first use and reused afterwards.
+    """
+
+    def __init__(self, db_name, busy_timeout=5000, query_stats=None, trace=False):
+        self.db_name = db_name
+        self.busy_timeout = busy_timeout
+        self.query_stats = query_stats
+        self.trace = trace
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self.stats = {
+            'writers_opened': 0, 'readers_opened': 0,
+            'writer_checkouts': 0, 'reader_checkouts': 0,
+        }
+
+        # journal_mode is stored in the database file, setting it once is enough
+        conn = sqlite3.connect(db_name, timeout=busy_timeout / 1000)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.close()
+
+    def _open(self, role):
+        conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout / 1000, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        conn.execute("PRAGMA foreign_keys = ON")
+        # NORMAL is durable across application crashes in WAL mode
+        conn.execute("PRAGMA synchronous = NORMAL")
+        if role == 'reader':
+            conn.execute("PRAGMA query_only = ON")
+        if self.query_stats is not None:
+            conn = instrument_connection(conn, self.query_stats, self.trace)
+
+        with self._lock:
+            self._connections.append(conn)
+            self.stats[f'{role}s_opened'] += 1
+        return conn, conn.cursor()
+
+    def _checkout(self, role):
+        entry = getattr(self._local, role, None)
+        if entry is None:
+            entry = self._open(role)
+            setattr(self._local, role, entry)
+        with self._lock:
+            self.stats[f'{role}_checkouts'] += 1
+        return entry
+
+    def writer(self):
+        return self._checkout('writer')[0]
+
+    def write_cursor(self):
+        return self._checkout('writer')[1]
+
+    def read_cursor(self):
+        # Inside an open write transaction, read through it to see its own changes
+        writer = getattr(self._local, 'writer', None)
+        if writer is not None and writer[0].in_transaction:
+            return writer[1]
+        return self._checkout('reader')[1]
+
+    def pool_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['open_connections'] = len(self._connections)
+        return stats
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
 
 
 class InventoryManagement:
-    def __init__(self, db_name='inventory-final2.db'):
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
-        self.cursor.execute("PRAGMA foreign_keys = ON")
-        self.create_tables()
+    def __init__(self, db_name='inventory-final2.db', pooled=False, busy_timeout=5000,
+                 instrument=False, trace=False):
+        """
+        Args:
+            db_name (str): Path of the SQLite database
+            pooled (bool): Use WAL and one connection per thread (see ConnectionPool)
+                instead of a single shared connection
+            busy_timeout (int): Milliseconds to wait for a lock in pooled mode
+            instrument (bool): Collect per-statement counts, rows and latency
+                histograms in self.query_stats
+            trace (bool): With instrument, also count every statement SQLite
+                runs, including those inside triggers
+        """
+        self.db_name = db_name
+        self.query_stats = QueryStats() if instrument else None
+        self.trace = trace
+
+        if pooled:
+            self.pool = ConnectionPool(db_name, busy_timeout, self.query_stats, trace)
+        else:
+            self.pool = None
+            self._conn = sqlite3.connect(db_name)
+            if self.query_stats is not None:
+                self._conn = instrument_connection(self._conn, self.query_stats, trace)
+            self._cursor = self._conn.cursor()
+            self._cursor.execute("PRAGMA foreign_keys = ON")
         self.tables = [
             'supplier', 'purchase', 'product', 'nutrition', 'warehouse', 
             'warehouse_inventory', 'movement', 'location', 'location_inventory', 
             'user', 'sales', 'product_purchased', 'warehouse_product', 
             'movement_product', 'location_product', 'sales_product'
         ]
+        self.dimensions = DimensionCache()
+        self.migrate()
+
+    @property
+    def conn(self):
+        if self.pool is None:
+            return self._conn
+        return self.pool.writer()
+
+    @property
+    def cursor(self):
+        if self.pool is None:
+            return self._cursor
+        return self.pool.write_cursor()
+
+    @property
+    def read_cursor(self):
+        if self.pool is None:
+            return self._cursor
+        return self.pool.read_cursor()
+
+    def pool_stats(self):
+        # Connection pool counters, None when not running in pooled mode
+        if self.pool is None:
+            return None
+        return self.pool.pool_stats()
+
+    def query_report(self):
+        # Collected statement statistics, None when not instrumented
+        if self.query_stats is None:
+            return None
+        return self.query_stats.report()
+
+    def dump_query_stats(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.query_report(), f, indent=2)
+
+    def print_query_stats(self, top=20):
+        report = self.query_report()
+        if report is None:
+            print("Query instrumentation is off. Start with InventoryManagement(instrument=True).")
+            return
+
+        headers = ["Count", "Rows", "Total ms", "p50 ms", "p95 ms", "p99 ms", "Statement"]
+        print(" | ".join(headers))
+        print("-" * len(" | ".join(headers)))
+        if not report["statements"]:
+            print("No records found.")
+        for entry in report["statements"][:top]:
+            print(" | ".join(str(entry[key]) for key in ["count", "rows", "total_ms", "p50_ms", "p95_ms", "p99_ms"])
+                  + " | " + entry["sql"][:100])
+
+    def close(self):
+        if self.pool is None:
+            self._conn.close()
+        else:
+            self.pool.close()
+
+    def schema_version(self):
+        self.cursor.execute("PRAGMA user_version")
+        return self.cursor.fetchone()[0]
+
+    def migrate(self):
+        """
+        Bring the database up to SCHEMA_VERSION
+
+        A current database costs a single PRAGMA user_version read. Otherwise
+        each pending step of MIGRATIONS runs in its own transaction together
+        with the user_version bump, so a crash or a second process running
+        the same migration never applies a step twice.
+
+        Returns:
+            int: Schema version of the database
+        """
+        version = self.schema_version()
+        if version > SCHEMA_VERSION:
+            raise sqlite3.DatabaseError(f"Database schema version {version} is newer than this program ({SCHEMA_VERSION})")
+        if version == SCHEMA_VERSION:
+            return version
+
+        # Table rebuilds need foreign keys off, which only takes effect outside a
+        # transaction. Steps that rebuild a table check its keys themselves.
+        self.cursor.execute("PRAGMA foreign_keys = OFF")
+        try:
+            for number in range(version + 1, SCHEMA_VERSION + 1):
+                self.cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    # Another process may have applied it while we waited for the lock
+                    if self.schema_version() < number:
+                        getattr(self, MIGRATIONS[number - 1])()
+                        self.cursor.execute(f"PRAGMA user_version = {number}")
+                    self.conn.commit()
+                except sqlite3.Error:
+                    self.conn.rollback()
+                    raise
+        finally:
+            self.cursor.execute("PRAGMA foreign_keys = ON")
+
+        COLUMN_CACHE.pop(self.db_name, None)
+        return SCHEMA_VERSION
 
     def create_tables(self):
         # Supplier Table
@@ -172,1028 +1026,3482 @@ class InventoryManagement:
             FOREIGN KEY(sales_id) REFERENCES sales(sales_id)
         )''')
 
-        self.conn.commit()
+    def create_indexes(self):
+        # Foreign key child indexes, used by FK checks on delete and by the inventory joins
+        for index_name, table, column in FOREIGN_KEY_INDEXES:
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column})")
 
-    # def adjust_inventory_for_product_purchased(self, product_id, purchase_id, quantity):
-    #     """
-    #     Adjust warehouse inventory when products are purchased
-        
-    #     Args:
-    #         product_id (int): ID of the product purchased
-    #         purchase_id (int): ID of the purchase
-    #         quantity (int): Quantity of product purchased
-        
-    #     Returns:
-    #         bool: True if adjustment successful, False otherwise
-    #     """
-    #     try:
-    #         # Find the warehouse associated with this purchase
-    #         self.cursor.execute("""
-    #             SELECT warehouse_id FROM purchase 
-    #             WHERE purchase_id = ?
-    #         """, (purchase_id,))
-    #         warehouse_result = self.cursor.fetchone()
-            
-    #         if not warehouse_result:
-    #             print("Error: No warehouse found for this purchase.")
-    #             return False
-            
-    #         warehouse_id = warehouse_result[0]
-            
-    #         # Find warehouse inventories for this warehouse
-    #         self.cursor.execute("""
-    #             SELECT warehouse_inventory_id FROM warehouse_inventory 
-    #             WHERE warehouse_id = ?
-    #         """, (warehouse_id,))
-    #         inventories = self.cursor.fetchall()
-            
-    #         if not inventories:
-    #             # Create a new warehouse inventory if none exists
-    #             self.cursor.execute("""
-    #                 INSERT INTO warehouse_inventory (warehouse_id, last_updated) 
-    #                 VALUES (?, datetime('now'))
-    #             """, (warehouse_id,))
-    #             warehouse_inventory_id = self.cursor.lastrowid
-    #         else:
-    #             # Use the first warehouse inventory
-    #             warehouse_inventory_id = inventories[0][0]
-            
-    #         # Insert into product_purchased
-    #         self.cursor.execute("""
-    #             INSERT INTO product_purchased (product_id, purchase_id, quantity) 
-    #             VALUES (?, ?, ?)
-    #         """, (product_id, purchase_id, quantity))
-            
-    #         # Update or insert into warehouse_product
-    #         self.cursor.execute("""
-    #             INSERT INTO warehouse_product (product_id, warehouse_inventory_id, quantity)
-    #             VALUES (?, ?, ?)
-    #             ON CONFLICT(product_id, warehouse_inventory_id) DO UPDATE SET
-    #             quantity = quantity + ?
-    #         """, (product_id, warehouse_inventory_id, quantity, quantity))
-            
-    #         self.conn.commit()
-    #         print(f"Successfully added {quantity} units of product {product_id} to warehouse inventory")
-    #         return True
-        
-    #     except sqlite3.Error as e:
-    #         self.conn.rollback()
-    #         print(f"An error occurred during product purchase: {e}")
-    #         return False
+    def create_stock_rollups(self):
+        """
+        Create the warehouse_stock and location_stock rollup tables
 
-    def adjust_inventory_for_movement(self, product_id, movement_id, quantity):
+        Each holds the total quantity of a product per warehouse or location.
+        Triggers on warehouse_product and location_product keep them current
+        for every write path, so availability is a primary key lookup.
         """
-        Adjust warehouse and location inventory when products are moved
-        
-        Args:
-            product_id (int): ID of the product being moved
-            movement_id (int): ID of the movement
-            quantity (int): Quantity of product moved
-        
-        Returns:
-            bool: True if adjustment successful, False otherwise
+        self.cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('warehouse_stock', 'location_stock')")
+        existing = self.cursor.fetchone()[0]
+
+        for scope, (item_table, inventory_table, inventory_key, owner_key) in INVENTORY_SCOPES.items():
+            rollup = STOCK_ROLLUPS[scope]
+            self.cursor.execute(f'''CREATE TABLE IF NOT EXISTS {rollup} (
+                product_id INTEGER,
+                {owner_key} INTEGER,
+                quantity INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY(product_id, {owner_key})
+            ) WITHOUT ROWID''')
+
+            add = self._rollup_add_sql
+
+            self.cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {item_table}_rollup_insert
+                AFTER INSERT ON {item_table}
+                BEGIN {add(scope, 'new', '')} END""")
+            self.cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {item_table}_rollup_update
+                AFTER UPDATE OF product_id, {inventory_key}, quantity ON {item_table}
+                BEGIN {add(scope, 'old', '-')} {add(scope, 'new', '')} END""")
+            self.cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {item_table}_rollup_delete
+                AFTER DELETE ON {item_table}
+                BEGIN {add(scope, 'old', '-')} END""")
+
+        if existing < len(STOCK_ROLLUPS):
+            self.rebuild_stock_rollups(commit=False)
+
+    def _rollup_add_sql(self, scope, row, sign):
+        # Trigger statement adding a signed quantity to the owner of an inventory row
+        _, inventory_table, inventory_key, owner_key = INVENTORY_SCOPES[scope]
+        return f"""
+                INSERT INTO {STOCK_ROLLUPS[scope]} (product_id, {owner_key}, quantity)
+                SELECT {row}.product_id, {owner_key}, {sign}{row}.quantity
+                FROM {inventory_table} WHERE {inventory_key} = {row}.{inventory_key}
+                ON CONFLICT(product_id, {owner_key}) DO UPDATE SET quantity = quantity + excluded.quantity;
+                """
+
+    def split_rollup_update_triggers(self):
+        """
+        Apply quantity-only changes to the rollups as a single difference
+
+        The original update trigger took the old row out and put the new one
+        back, so for a moment the total lacked the row entirely. That is
+        harmless for reads but would trip the stock alert triggers, so now
+        only a change of product or inventory does that.
+        """
+        for scope, (item_table, inventory_table, inventory_key, owner_key) in INVENTORY_SCOPES.items():
+            self.cursor.execute(f"DROP TRIGGER IF EXISTS {item_table}_rollup_update")
+            self.cursor.execute(f"""CREATE TRIGGER {item_table}_rollup_update
+                AFTER UPDATE OF quantity ON {item_table}
+                WHEN new.product_id = old.product_id AND new.{inventory_key} = old.{inventory_key}
+                BEGIN
+                UPDATE {STOCK_ROLLUPS[scope]} SET quantity = quantity + new.quantity - old.quantity
+                WHERE product_id = new.product_id
+                AND {owner_key} = (SELECT {owner_key} FROM {inventory_table} WHERE {inventory_key} = new.{inventory_key});
+                END""")
+            self.cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {item_table}_rollup_rekey
+                AFTER UPDATE OF product_id, {inventory_key} ON {item_table}
+                WHEN new.product_id != old.product_id OR new.{inventory_key} != old.{inventory_key}
+                BEGIN {self._rollup_add_sql(scope, 'old', '-')} {self._rollup_add_sql(scope, 'new', '')} END""")
+
+    def encode_dates_as_epoch(self):
+        """
+        Store purchase_date, movement_date, sales_date and last_updated as
+        integer epoch seconds (UTC) and index the dates
+
+        The columns were TEXT in mixed formats, and a TEXT column turns any
+        integer written to it back into text, so each table is rebuilt with
+        an INTEGER column and its rows converted on the way.
+        """
+        definitions = {
+            'purchase': '''
+                purchase_id INTEGER PRIMARY KEY,
+                supplier_id INTEGER,
+                warehouse_id INTEGER,
+                purchase_date INTEGER,
+                FOREIGN KEY(supplier_id) REFERENCES supplier(supplier_id),
+                FOREIGN KEY(warehouse_id) REFERENCES warehouse(warehouse_id)''',
+            'warehouse_inventory': '''
+                warehouse_inventory_id INTEGER PRIMARY KEY,
+                warehouse_id INTEGER,
+                last_updated INTEGER,
+                FOREIGN KEY(warehouse_id) REFERENCES warehouse(warehouse_id)''',
+            'movement': '''
+                movement_id INTEGER PRIMARY KEY,
+                warehouse_id INTEGER,
+                location_id INTEGER,
+                movement_date INTEGER,
+                FOREIGN KEY(warehouse_id) REFERENCES warehouse(warehouse_id),
+                FOREIGN KEY(location_id) REFERENCES location(location_id)''',
+            'location_inventory': '''
+                location_inventory_id INTEGER PRIMARY KEY,
+                location_id INTEGER,
+                last_updated INTEGER,
+                FOREIGN KEY(location_id) REFERENCES location(location_id)''',
+            'sales': '''
+                sales_id INTEGER PRIMARY KEY,
+                location_id INTEGER,
+                user_id INTEGER,
+                sales_date INTEGER,
+                FOREIGN KEY(location_id) REFERENCES location(location_id),
+                FOREIGN KEY(user_id) REFERENCES user(user_id)''',
+        }
+        for table, definition in definitions.items():
+            date_column = DATE_COLUMNS[table][0]
+            self.cursor.execute(f"SELECT name FROM pragma_table_info('{table}') ORDER BY cid")
+            columns = [
+                f"CASE WHEN typeof({column}) = 'integer' THEN {column} ELSE CAST(strftime('%s', {column}) AS INTEGER) END"
+                if column == date_column else column
+                for column, in self.cursor.fetchall()
+            ]
+            self._rebuild_table(table, definition, ", ".join(columns))
+
+        # Dropping the old tables dropped their indexes too
+        self.create_indexes()
+        for index_name, table, columns in DATE_INDEXES:
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({columns})")
+
+    def _rebuild_table(self, table, definition, select):
+        """
+        Replace a table by one with a new definition, copying its rows through select
+
+        Runs inside a migration, which has foreign key enforcement off. The
+        legacy rename leaves the trigger bodies that mention the table alone,
+        they resolve to the new table once it has the old name.
         """
+        self.cursor.execute(f"CREATE TABLE {table}_rebuild ({definition})")
+        self.cursor.execute(f"INSERT INTO {table}_rebuild SELECT {select} FROM {table}")
+        self.cursor.execute(f"DROP TABLE {table}")
+        self.cursor.execute("PRAGMA legacy_alter_table = ON")
         try:
-            # Find the warehouse and location for this movement
-            self.cursor.execute("""
-                SELECT warehouse_id, location_id FROM movement 
-                WHERE movement_id = ?
-            """, (movement_id,))
-            movement_result = self.cursor.fetchone()
-            
-            if not movement_result:
-                print("Error: No warehouse or location found for this movement.")
-                return False
-            
-            warehouse_id, location_id = movement_result
-            
-            # Reduce warehouse inventory
-            # Find warehouse inventories for this product in this warehouse
-            self.cursor.execute("""
-                SELECT warehouse_inventory_id, quantity 
-                FROM warehouse_product 
-                WHERE product_id = ? AND warehouse_inventory_id IN (
-                    SELECT warehouse_inventory_id 
-                    FROM warehouse_inventory 
-                    WHERE warehouse_id = ?
-                )
-                ORDER BY quantity DESC
-            """, (product_id, warehouse_id))
-            
-            warehouse_inventories = self.cursor.fetchall()
-            
-            if not warehouse_inventories:
-                print(f"Error: No warehouse inventory found for product {product_id}")
-                return False
-            
-            # Calculate total available quantity
-            total_available = sum(inv[1] for inv in warehouse_inventories)
-            
-            if quantity > total_available:
-                print(f"Error: Not enough inventory. Requested: {quantity}, Available: {total_available}")
-                return False
-            
-            # Reduce warehouse inventory
-            remaining_to_reduce = quantity
-            for inv_id, inv_quantity in warehouse_inventories:
-                reduce_amount = min(remaining_to_reduce, inv_quantity)
-                
-                self.cursor.execute("""
-                    UPDATE warehouse_product 
-                    SET quantity = quantity - ? 
-                    WHERE product_id = ? AND warehouse_inventory_id = ?
-                """, (reduce_amount, product_id, inv_id))
-                
-                remaining_to_reduce -= reduce_amount
-                
-                if remaining_to_reduce <= 0:
-                    break
-            
-            # Find or create location inventory
-            self.cursor.execute("""
-                SELECT location_inventory_id FROM location_inventory 
-                WHERE location_id = ?
-            """, (location_id,))
-            location_inventories = self.cursor.fetchall()
-            
-            if not location_inventories:
-                # Create a new location inventory if none exists
-                self.cursor.execute("""
-                    INSERT INTO location_inventory (location_id, last_updated) 
-                    VALUES (?, datetime('now'))
-                """, (location_id,))
-                location_inventory_id = self.cursor.lastrowid
-            else:
-                # Use the first location inventory
-                location_inventory_id = location_inventories[0][0]
-            
-            # Update or insert location product
-            self.cursor.execute("""
-                INSERT INTO location_product (product_id, location_inventory_id, quantity)
-                VALUES (?, ?, ?)
-                ON CONFLICT(product_id, location_inventory_id) DO UPDATE SET
-                quantity = quantity + ?
-            """, (product_id, location_inventory_id, quantity, quantity))
-            
-            # Insert movement product record
-            self.cursor.execute("""
-                INSERT INTO movement_product (product_id, movement_id, quantity) 
-                VALUES (?, ?, ?)
-            """, (product_id, movement_id, quantity))
-            
+            self.cursor.execute(f"ALTER TABLE {table}_rebuild RENAME TO {table}")
+        finally:
+            self.cursor.execute("PRAGMA legacy_alter_table = OFF")
+
+        self.cursor.execute(f"PRAGMA foreign_key_check({table})")
+        violation = self.cursor.fetchone()
+        if violation:
+            raise sqlite3.IntegrityError(f"Rebuilding {table} broke a foreign key: {violation}")
+
+    def rebuild_stock_rollups(self, commit=True):
+        # Recompute both rollup tables from the inventory tables
+        for scope, (item_table, inventory_table, inventory_key, owner_key) in INVENTORY_SCOPES.items():
+            rollup = STOCK_ROLLUPS[scope]
+            self.cursor.execute(f"DELETE FROM {rollup}")
+            self.cursor.execute(f"""
+                INSERT INTO {rollup} (product_id, {owner_key}, quantity)
+                SELECT it.product_id, inv.{owner_key}, SUM(it.quantity)
+                FROM {item_table} it
+                JOIN {inventory_table} inv ON inv.{inventory_key} = it.{inventory_key}
+                GROUP BY it.product_id, inv.{owner_key}
+            """)
+        if commit:
             self.conn.commit()
-            print(f"Successfully moved {quantity} units of product {product_id}")
-            return True
-        
-        except sqlite3.Error as e:
-            self.conn.rollback()
-            print(f"An error occurred during movement: {e}")
-            return False
 
-    def adjust_inventory_for_product_purchased(self, product_id, purchase_id, quantity):
+    def create_stock_alerts(self):
         """
-        Adjust warehouse inventory when products are purchased
-        
+        Create the reorder point tables and the stock_alert queue
+
+        Triggers on the stock rollups raise an alert when a product's total
+        at a warehouse or location drops to its reorder point or below, and
+        resolve it once stock is back above. Only the rows a write touches
+        are checked, the inventory is never scanned.
+        """
+        for scope, reorder_table in REORDER_POINTS.items():
+            owner_key = INVENTORY_SCOPES[scope][3]
+            self.cursor.execute(f'''CREATE TABLE IF NOT EXISTS {reorder_table} (
+                product_id INTEGER,
+                {owner_key} INTEGER,
+                reorder_point INTEGER NOT NULL CHECK(reorder_point >= 0),
+                PRIMARY KEY(product_id, {owner_key})
+            ) WITHOUT ROWID''')
+
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS stock_alert (
+            alert_id INTEGER PRIMARY KEY,
+            scope TEXT NOT NULL,
+            owner_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            reorder_point INTEGER NOT NULL,
+            raised_at TEXT NOT NULL,
+            resolved_at TEXT
+        )''')
+        # At most one open alert per product and owner, and the low-stock listing reads only this index
+        self.cursor.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_alert_open
+            ON stock_alert (scope, owner_id, product_id) WHERE resolved_at IS NULL''')
+
+        for scope, rollup in STOCK_ROLLUPS.items():
+            reorder_table, owner_key = REORDER_POINTS[scope], INVENTORY_SCOPES[scope][3]
+            raise_alert = f"""
+                INSERT INTO stock_alert (scope, owner_id, product_id, quantity, reorder_point, raised_at)
+                SELECT '{scope}', new.{owner_key}, new.product_id, new.quantity, rp.reorder_point, datetime('now')
+                FROM {reorder_table} rp
+                WHERE rp.product_id = new.product_id AND rp.{owner_key} = new.{owner_key}
+                AND new.quantity <= rp.reorder_point
+                AND NOT EXISTS (
+                    SELECT 1 FROM stock_alert
+                    WHERE scope = '{scope}' AND owner_id = new.{owner_key} AND product_id = new.product_id
+                    AND resolved_at IS NULL
+                );
+            """
+            self.cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {rollup}_alert_insert
+                AFTER INSERT ON {rollup}
+                BEGIN {raise_alert} END""")
+            self.cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {rollup}_alert_update
+                AFTER UPDATE OF quantity ON {rollup}
+                BEGIN
+                {raise_alert}
+                UPDATE stock_alert
+                SET quantity = new.quantity,
+                    resolved_at = CASE WHEN new.quantity > (
+                        SELECT reorder_point FROM {reorder_table}
+                        WHERE product_id = new.product_id AND {owner_key} = new.{owner_key}
+                    ) THEN datetime('now') END
+                WHERE scope = '{scope}' AND owner_id = new.{owner_key} AND product_id = new.product_id
+                AND resolved_at IS NULL;
+                END""")
+
+    def add_reorder_targets(self):
+        # Stock level to refill to once a product is at or below its reorder point, see plan_replenishment
+        for reorder_table in REORDER_POINTS.values():
+            self.cursor.execute(f"ALTER TABLE {reorder_table} ADD COLUMN target INTEGER CHECK(target >= reorder_point)")
+
+    def set_reorder_point(self, scope, owner_id, product_id, reorder_point, target=None):
+        """
+        Set the stock level at which a product needs reordering, and commit
+
+        An alert is raised straight away if stock is already at or below it,
+        and an open alert is resolved if stock is now above it.
+
         Args:
-            product_id (int): ID of the product purchased
-            purchase_id (int): ID of the purchase
-            quantity (int): Quantity of product purchased
-        
-        Returns:
-            bool: True if adjustment successful, False otherwise
+            scope (str): 'warehouse' or 'location'
+            owner_id (int): ID of the warehouse or location
+            product_id (int): ID of the product
+            reorder_point (int): Quantity at or below which to alert, None removes it
+            target (int): Quantity replenishment refills to, None for no replenishment
         """
+        reorder_table, owner_key = REORDER_POINTS[scope], INVENTORY_SCOPES[scope][3]
         try:
-            # Find the warehouse associated with this purchase
-            self.cursor.execute("""
-                SELECT warehouse_id FROM purchase 
-                WHERE purchase_id = ?
-            """, (purchase_id,))
-            warehouse_result = self.cursor.fetchone()
-            
-            if not warehouse_result:
-                print(f"Error: No warehouse found for purchase {purchase_id}")
-                return False
-            
-            warehouse_id = warehouse_result[0]
-            print(f"Found warehouse {warehouse_id} for purchase {purchase_id}")
-            
-            # Find or create warehouse inventory
-            self.cursor.execute("""
-                SELECT warehouse_inventory_id FROM warehouse_inventory 
-                WHERE warehouse_id = ?
-            """, (warehouse_id,))
-            inventories = self.cursor.fetchall()
-            print("inventories ", inventories)
-            if not inventories:
-                # Create a new warehouse inventory if none exists
-                self.cursor.execute("""
-                    INSERT INTO warehouse_inventory (warehouse_id, last_updated) 
-                    VALUES (?, datetime('now'))
-                """, (warehouse_id,))
-                warehouse_inventory_id = self.cursor.lastrowid
-                print(f"Created new warehouse inventory {warehouse_inventory_id}")
+            if reorder_point is None:
+                self.cursor.execute(f"DELETE FROM {reorder_table} WHERE product_id = ? AND {owner_key} = ?",
+                                    (product_id, owner_id))
             else:
-                # Use the first warehouse inventory
-                warehouse_inventory_id = inventories[0][0]
-                print(f"Using existing warehouse inventory {warehouse_inventory_id}")
-            
-            # Insert into product_purchased
-            self.cursor.execute("""
-                INSERT INTO product_purchased (product_id, purchase_id, quantity) 
-                VALUES (?, ?, ?)
-            """, (product_id, purchase_id, quantity))
-            print(f"Inserted product_purchased record for product {product_id}, purchase {purchase_id}, quantity {quantity}")
-            
-            # Check if a record exists
-            self.cursor.execute("""
-                SELECT quantity FROM warehouse_product 
-                WHERE product_id = ? AND warehouse_inventory_id = ?
-            """, (product_id, warehouse_inventory_id))
-            existing_record = self.cursor.fetchone()
-            
-            if existing_record:
-                # Update existing record
-                self.cursor.execute("""
-                    UPDATE warehouse_product 
-                    SET quantity = quantity + ? 
-                    WHERE product_id = ? AND warehouse_inventory_id = ?
-                """, (quantity, product_id, warehouse_inventory_id))
-                print(f"Updated existing warehouse_product record. Added {quantity} units")
-            else:
-                # Insert new record
+                self.cursor.execute(f"""
+                    INSERT INTO {reorder_table} (product_id, {owner_key}, reorder_point, target) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(product_id, {owner_key}) DO UPDATE SET
+                        reorder_point = excluded.reorder_point, target = excluded.target
+                """, (product_id, owner_id, reorder_point, target))
+
+            # Re-evaluate against the current total, which fires the rollup alert triggers
+            self.cursor.execute(f"""
+                INSERT INTO {STOCK_ROLLUPS[scope]} (product_id, {owner_key}, quantity) VALUES (?, ?, 0)
+                ON CONFLICT(product_id, {owner_key}) DO UPDATE SET quantity = quantity
+            """, (product_id, owner_id))
+            if reorder_point is None:
                 self.cursor.execute("""
-                    INSERT INTO warehouse_product (product_id, warehouse_inventory_id, quantity)
-                    VALUES (?, ?, ?)
-                """, (product_id, warehouse_inventory_id, quantity))
-                print(f"Inserted new warehouse_product record with {quantity} units")
-            
+                    UPDATE stock_alert SET resolved_at = datetime('now')
+                    WHERE scope = ? AND owner_id = ? AND product_id = ? AND resolved_at IS NULL
+                """, (scope, owner_id, product_id))
             self.conn.commit()
-            print(f"Successfully added {quantity} units of product {product_id} to warehouse inventory")
-            return True
-        
-        except sqlite3.Error as e:
+        except sqlite3.Error:
             self.conn.rollback()
-            print(f"An error occurred during product purchase: {e}")
-            return False
-    
-    def adjust_inventory_for_sales(self, product_id, sales_id, quantity):
+            raise
+
+    def low_stock(self, scope=None, owner_id=None):
         """
-        Adjust location and sales inventory when products are sold
-        
+        Open alerts, optionally for one warehouse or location
+
+        Returns:
+            list: (alert_id, scope, owner_id, product_id, quantity, reorder_point, raised_at)
+        """
+        conditions, params = ["resolved_at IS NULL"], []
+        if scope is not None:
+            conditions.append("scope = ?")
+            params.append(scope)
+            if owner_id is not None:
+                conditions.append("owner_id = ?")
+                params.append(owner_id)
+        self.read_cursor.execute(f"""
+            SELECT alert_id, scope, owner_id, product_id, quantity, reorder_point, raised_at
+            FROM stock_alert INDEXED BY idx_stock_alert_open
+            WHERE {' AND '.join(conditions)}
+            ORDER BY scope, owner_id, product_id
+        """, params)
+        return self.read_cursor.fetchall()
+
+    def alerts_after(self, alert_id=0, limit=100):
+        # Alerts raised after alert_id in order, for consumers reading stock_alert as a queue
+        self.read_cursor.execute("""
+            SELECT alert_id, scope, owner_id, product_id, quantity, reorder_point, raised_at, resolved_at
+            FROM stock_alert WHERE alert_id > ? ORDER BY alert_id LIMIT ?
+        """, (alert_id, limit))
+        return self.read_cursor.fetchall()
+
+    def create_inventory_ledger(self):
+        """
+        Create the append-only inventory_ledger and its checkpoints, and seed it
+
+        Every change to the stock of a product at a warehouse or location is
+        appended as a signed delta with its source (LEDGER_SOURCES), so the
+        stock at any point can be rebuilt from the ledger. Rows can only be
+        added, triggers reject UPDATE and DELETE. A checkpoint fixes the
+        balances up to one entry, so a rebuild only replays the entries after
+        the newest checkpoint (see store_checkpoint_changes for how they are
+        stored). The ledger is filled by date_ledger_checkpoints.
+        """
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS inventory_ledger (
+            entry_id INTEGER PRIMARY KEY,
+            recorded_at INTEGER NOT NULL,
+            scope TEXT NOT NULL,
+            owner_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            reference_id INTEGER
+        )''')
+        for action in ('UPDATE', 'DELETE'):
+            self.cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS inventory_ledger_no_{action.lower()}
+                BEFORE {action} ON inventory_ledger
+                BEGIN SELECT RAISE(ABORT, 'inventory_ledger is append-only'); END""")
+
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS ledger_checkpoint (
+            checkpoint_id INTEGER PRIMARY KEY,
+            entry_id INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )''')
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS ledger_checkpoint_balance (
+            checkpoint_id INTEGER,
+            scope TEXT,
+            owner_id INTEGER,
+            product_id INTEGER,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY(checkpoint_id, scope, owner_id, product_id),
+            FOREIGN KEY(checkpoint_id) REFERENCES ledger_checkpoint(checkpoint_id)
+        ) WITHOUT ROWID''')
+
+    def date_ledger_checkpoints(self):
+        """
+        Date the ledger checkpoints and index the ledger by owner and time,
+        for stock_as_of
+
+        A checkpoint's recorded_at is that of its last entry. The checkpoints
+        are rebuilt every LEDGER_CHECKPOINT_ENTRIES entries along the whole
+        history, so a query for any date starts from a nearby snapshot. An
+        empty ledger is seeded first.
+        """
+        self.cursor.execute("ALTER TABLE ledger_checkpoint ADD COLUMN recorded_at INTEGER")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_ledger_checkpoint_time ON ledger_checkpoint (recorded_at)")
+        self.cursor.execute("""CREATE INDEX IF NOT EXISTS idx_inventory_ledger_owner_time
+            ON inventory_ledger (scope, owner_id, recorded_at)""")
+        self.cursor.execute("SELECT EXISTS (SELECT 1 FROM inventory_ledger)")
+        if self.cursor.fetchone()[0]:
+            self.rebuild_ledger_checkpoints(commit=False)
+        else:
+            self.seed_inventory_ledger(commit=False)
+
+    def create_dimension_versions(self):
+        """
+        Create the dimension_version counters that DimensionCache checks
+
+        One row per table in DIMENSION_TABLES, bumped by triggers on every
+        insert, update and delete, so a cache in another process can tell
+        which tables changed without reading them.
+        """
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS dimension_version (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID''')
+        for table in DIMENSION_TABLES:
+            self.cursor.execute("INSERT OR IGNORE INTO dimension_version (table_name) VALUES (?)", (table,))
+            for action in ('INSERT', 'UPDATE', 'DELETE'):
+                self.cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_version_{action.lower()}
+                    AFTER {action} ON {table}
+                    BEGIN UPDATE dimension_version SET version = version + 1 WHERE table_name = '{table}'; END""")
+
+    def store_checkpoint_changes(self):
+        """
+        Store only the balances a checkpoint changed
+
+        Storing every balance at every checkpoint made the checkpoints
+        outgrow the ledger itself. Each checkpoint now only stores the
+        balances that changed since the previous one, zeros included, keyed
+        by (scope, owner_id, product_id, checkpoint_id): a balance as of a
+        checkpoint is its newest row at or before that checkpoint, one index
+        seek per balance. The existing checkpoints are rebuilt that way.
+        """
+        self.cursor.execute("DROP TABLE ledger_checkpoint_balance")
+        self.cursor.execute('''CREATE TABLE ledger_checkpoint_balance (
+            scope TEXT,
+            owner_id INTEGER,
+            product_id INTEGER,
+            checkpoint_id INTEGER,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY(scope, owner_id, product_id, checkpoint_id),
+            FOREIGN KEY(checkpoint_id) REFERENCES ledger_checkpoint(checkpoint_id)
+        ) WITHOUT ROWID''')
+        self.rebuild_ledger_checkpoints(commit=False)
+
+    def dimension(self, table, key):
+        # One row of a DIMENSION_TABLES table as a dict, through the cache
+        return self.dimensions.get(self.read_cursor, table, key)
+
+    def dimension_stats(self):
+        # Hit, miss, eviction and invalidation counters of the dimension cache
+        return self.dimensions.cache_stats()
+
+    def seed_inventory_ledger(self, commit=True):
+        """
+        Fill an empty ledger from the purchase, movement and sale history
+
+        History entries carry their purchase, movement or sale date. Stock the
+        history does not explain (loaded directly, edited by hand, or sold in
+        archived sales) is booked as one 'opening' entry per product and
+        owner at the earliest date, ahead of the history, so the ledger
+        balances equal the stock rollups. Checkpoints are taken along the
+        history, see rebuild_ledger_checkpoints.
+
+        Raises:
+            ValueError: If the ledger already has entries
+        """
+        self.cursor.execute("SELECT EXISTS (SELECT 1 FROM inventory_ledger)")
+        if self.cursor.fetchone()[0]:
+            raise ValueError("The inventory ledger already has entries")
+
+        self.cursor.execute("DROP TABLE IF EXISTS temp.ledger_history")
+        self.cursor.execute("""
+            CREATE TEMP TABLE ledger_history AS
+            SELECT pu.purchase_date AS recorded_at, 'warehouse' AS scope, pu.warehouse_id AS owner_id,
+                   pp.product_id, pp.quantity AS delta, 'purchase' AS source, pu.purchase_id AS reference_id
+            FROM product_purchased pp JOIN purchase pu ON pu.purchase_id = pp.purchase_id
+            UNION ALL
+            SELECT m.movement_date, 'warehouse', m.warehouse_id, mp.product_id, -mp.quantity, 'movement', m.movement_id
+            FROM movement_product mp JOIN movement m ON m.movement_id = mp.movement_id
+            UNION ALL
+            SELECT m.movement_date, 'location', m.location_id, mp.product_id, mp.quantity, 'movement', m.movement_id
+            FROM movement_product mp JOIN movement m ON m.movement_id = mp.movement_id
+            UNION ALL
+            SELECT s.sales_date, 'location', s.location_id, sp.product_id, -sp.quantity, 'sale', s.sales_id
+            FROM sales_product sp JOIN sales s ON s.sales_id = sp.sales_id
+        """)
+        self.cursor.execute("""
+            SELECT IFNULL(MIN(recorded_at), CAST(strftime('%s', 'now') AS INTEGER)) FROM temp.ledger_history
+        """)
+        opening = self.cursor.fetchone()[0]
+
+        rollups = " UNION ALL ".join(
+            f"SELECT '{scope}' AS scope, {INVENTORY_SCOPES[scope][3]} AS owner_id, product_id, quantity FROM {rollup}"
+            for scope, rollup in STOCK_ROLLUPS.items())
+        self.cursor.execute(f"""
+            INSERT INTO inventory_ledger (recorded_at, scope, owner_id, product_id, delta, source)
+            SELECT ?, scope, owner_id, product_id, SUM(quantity), 'opening'
+            FROM ({rollups}
+                  UNION ALL
+                  SELECT scope, owner_id, product_id, -delta FROM temp.ledger_history)
+            GROUP BY scope, owner_id, product_id
+            HAVING SUM(quantity) != 0
+            ORDER BY scope, owner_id, product_id
+        """, (opening,))
+        self.cursor.execute("""
+            INSERT INTO inventory_ledger (recorded_at, scope, owner_id, product_id, delta, source, reference_id)
+            SELECT IFNULL(recorded_at, ?), scope, owner_id, product_id, delta, source, reference_id
+            FROM temp.ledger_history
+            ORDER BY IFNULL(recorded_at, ?), source, reference_id, scope
+        """, (opening, opening))
+        self.cursor.execute("DROP TABLE temp.ledger_history")
+        self.rebuild_ledger_checkpoints(commit=commit)
+
+    def _record_ledger(self, scope, owner_id, lines, source, reference_id=None):
+        # Append (product_id, delta) lines for one warehouse or location, without committing.
+        # recorded_at never goes back along entry_id, even if the clock does, which stock_as_of relies on.
+        self.cursor.executemany("""
+            INSERT INTO inventory_ledger (recorded_at, scope, owner_id, product_id, delta, source, reference_id)
+            SELECT MAX(CAST(strftime('%s', 'now') AS INTEGER),
+                       IFNULL((SELECT recorded_at FROM inventory_ledger ORDER BY entry_id DESC LIMIT 1), 0)),
+                   ?, ?, ?, ?, ?, ?
+        """, [(scope, owner_id, product_id, delta, source, reference_id) for product_id, delta in lines if delta])
+
+    def _item_stock(self, table, where, params):
+        """
+        Stock held by the warehouse_product or location_product rows a record
+        reaches, for ledgering a manual edit
+
         Args:
-            product_id (int): ID of the product being sold
-            sales_id (int): ID of the sale
-            quantity (int): Quantity of product sold
-        
+            table (str): An item or inventory table, any other table holds no stock
+            where (str): Condition on table selecting the record
+
+        Returns:
+            dict: (scope, owner_id, product_id) -> quantity
+        """
+        stock = {}
+        for scope, (item_table, inventory_table, inventory_key, owner_key) in INVENTORY_SCOPES.items():
+            if table not in (item_table, inventory_table):
+                continue
+            match = "t.rowid" if table == item_table else f"i.{inventory_key}"
+            column = "rowid" if table == item_table else inventory_key
+            self.cursor.execute(f"""
+                SELECT i.{owner_key}, t.product_id, SUM(t.quantity)
+                FROM {item_table} t JOIN {inventory_table} i ON i.{inventory_key} = t.{inventory_key}
+                WHERE {match} IN (SELECT {column} FROM {table} WHERE {where})
+                GROUP BY 1, 2
+            """, params)
+            for owner_id, product_id, quantity in self.cursor.fetchall():
+                stock[scope, owner_id, product_id] = quantity
+        return stock
+
+    def _record_ledger_edit(self, before, after):
+        # Ledger the difference between two _item_stock results as manual edits
+        for scope, owner_id, product_id in sorted(set(before) | set(after)):
+            delta = after.get((scope, owner_id, product_id), 0) - before.get((scope, owner_id, product_id), 0)
+            self._record_ledger(scope, owner_id, [(product_id, delta)], 'edit')
+
+    def checkpoint_ledger(self, commit=True, entry_id=None):
+        """
+        Checkpoint the ledger balances up to an entry, the newest by default
+
+        Only the balances the entries since the previous checkpoint changed
+        are stored, each the newest stored balance plus those entries, so a
+        checkpoint costs one pass over the tail and stores at most one row
+        per entry.
+
+        Args:
+            entry_id (int): Last entry to include, at or after the newest checkpoint
+
         Returns:
-            bool: True if adjustment successful, False otherwise
+            int: ID of the new checkpoint, or of the newest one if no entries were added since
         """
+        if not self.conn.in_transaction:
+            self.cursor.execute("BEGIN IMMEDIATE")
         try:
-            # Find the location for this sale
             self.cursor.execute("""
-                SELECT location_id FROM sales 
-                WHERE sales_id = ?
-            """, (sales_id,))
-            sales_result = self.cursor.fetchone()
-            
-            if not sales_result:
-                print("Error: No location found for this sale.")
-                return False
-            
-            location_id = sales_result[0]
-            
-            # Find location inventories for this product in this location
+                SELECT IFNULL(MAX(checkpoint_id), 0), IFNULL(MAX(entry_id), 0),
+                       (SELECT IFNULL(MAX(entry_id), 0) FROM inventory_ledger)
+                FROM ledger_checkpoint
+            """)
+            previous, previous_entry, last_entry = self.cursor.fetchone()
+            if entry_id is not None:
+                last_entry = min(max(entry_id, previous_entry), last_entry)
+            if previous and last_entry == previous_entry:
+                if commit:
+                    self.conn.commit()
+                return previous
+
             self.cursor.execute("""
-                SELECT location_inventory_id, quantity 
-                FROM location_product 
-                WHERE product_id = ? AND location_inventory_id IN (
-                    SELECT location_inventory_id 
-                    FROM location_inventory 
-                    WHERE location_id = ?
-                )
-                ORDER BY quantity DESC
-            """, (product_id, location_id))
-            
-            location_inventories = self.cursor.fetchall()
-            
-            if not location_inventories:
-                print(f"Error: No location inventory found for product {product_id}")
-                return False
-            
-            # Calculate total available quantity
-            total_available = sum(inv[1] for inv in location_inventories)
-            
-            if quantity > total_available:
-                print(f"Error: Not enough inventory. Requested: {quantity}, Available: {total_available}")
-                return False
-            
-            # Reduce location inventory
-            remaining_to_reduce = quantity
-            for inv_id, inv_quantity in location_inventories:
-                reduce_amount = min(remaining_to_reduce, inv_quantity)
-                
-                self.cursor.execute("""
-                    UPDATE location_product 
-                    SET quantity = quantity - ? 
-                    WHERE product_id = ? AND location_inventory_id = ?
-                """, (reduce_amount, product_id, inv_id))
-                
-                remaining_to_reduce -= reduce_amount
-                
-                if remaining_to_reduce <= 0:
-                    break
-            
-            # Insert sales product record
+                INSERT INTO ledger_checkpoint (entry_id, created_at, recorded_at)
+                VALUES (?1, CAST(strftime('%s', 'now') AS INTEGER),
+                        (SELECT recorded_at FROM inventory_ledger WHERE entry_id <= ?1 ORDER BY entry_id DESC LIMIT 1))
+            """, (last_entry,))
+            checkpoint_id = self.cursor.lastrowid
             self.cursor.execute("""
-                INSERT INTO sales_product (product_id, sales_id, quantity) 
-                VALUES (?, ?, ?)
-            """, (product_id, sales_id, quantity))
-            
-            self.conn.commit()
-            print(f"Successfully sold {quantity} units of product {product_id}")
-            return True
-        
-        except sqlite3.Error as e:
+                INSERT INTO ledger_checkpoint_balance (scope, owner_id, product_id, checkpoint_id, quantity)
+                SELECT c.scope, c.owner_id, c.product_id, ?, c.delta + IFNULL((
+                    SELECT b.quantity FROM ledger_checkpoint_balance b
+                    WHERE b.scope = c.scope AND b.owner_id = c.owner_id AND b.product_id = c.product_id
+                    ORDER BY b.checkpoint_id DESC LIMIT 1
+                ), 0)
+                FROM (SELECT scope, owner_id, product_id, SUM(delta) AS delta FROM inventory_ledger
+                      WHERE entry_id > ? AND entry_id <= ?
+                      GROUP BY scope, owner_id, product_id
+                      HAVING SUM(delta) != 0) c
+            """, (checkpoint_id, previous_entry, last_entry))
+            if commit:
+                self.conn.commit()
+            return checkpoint_id
+        except sqlite3.Error:
             self.conn.rollback()
-            print(f"An error occurred during sales: {e}")
-            return False
-
+            raise
 
+    def rebuild_ledger_checkpoints(self, commit=True):
+        # Replace the checkpoints by one every LEDGER_CHECKPOINT_ENTRIES entries plus one at the newest entry
+        self.cursor.execute("DELETE FROM ledger_checkpoint_balance")
+        self.cursor.execute("DELETE FROM ledger_checkpoint")
+        self.cursor.execute("SELECT IFNULL(MAX(entry_id), 0) FROM inventory_ledger")
+        for entry_id in range(LEDGER_CHECKPOINT_ENTRIES, self.cursor.fetchone()[0], LEDGER_CHECKPOINT_ENTRIES):
+            self.checkpoint_ledger(commit=False, entry_id=entry_id)
+        self.checkpoint_ledger(commit=commit)
 
-    def insert_record(self, table):
-        print(f"\nInserting record into {table}")
+    def _checkpoint_if_due(self):
+        # Take a checkpoint once LEDGER_CHECKPOINT_ENTRIES entries were appended after the newest one.
+        # Runs after a commit, so a failure is left for the next commit to retry.
         try:
-            if table == 'supplier':
-                name = input("Enter supplier name: ")
-                address = input("Enter supplier address: ")
-                self.cursor.execute("INSERT INTO supplier (name, address) VALUES (?, ?)", 
-                                    (name, address))
-                self.display_record("supplier") ###
+            self.cursor.execute("""
+                SELECT (SELECT IFNULL(MAX(entry_id), 0) FROM inventory_ledger)
+                     - (SELECT IFNULL(MAX(entry_id), 0) FROM ledger_checkpoint)
+            """)
+            if self.cursor.fetchone()[0] >= LEDGER_CHECKPOINT_ENTRIES:
+                self.checkpoint_ledger()
+        except sqlite3.Error:
+            pass
 
-            elif table == 'warehouse':
-                name = input("Enter warehouse name: ")
-                address = input("Enter warehouse address: ")
-                self.cursor.execute("INSERT INTO warehouse (name, address) VALUES (?, ?)", 
-                                    (name, address))
-                self.display_record("warehouse") ###
+    def ledger_balances(self, entry_id=None):
+        """
+        Rebuild stock from the ledger: the balances as of the newest
+        checkpoint at or before entry_id plus the entries after it
 
-            elif table == 'location':
-                name = input("Enter location name: ")
-                type_ = input("Enter location type: ")
-                address = input("Enter location address: ")
-                ip_address = input("Enter IP address: ")
-                self.cursor.execute("INSERT INTO location (name, type, address, ip_address) VALUES (?, ?, ?, ?)", 
-                                    (name, type_, address, ip_address))
-                self.display_record("location") ###
+        Args:
+            entry_id (int): Last entry to include, None for the whole ledger
 
-            elif table == 'nutrition':
-                shelf_life = input("Enter shelf life: ")
-                serving = input("Enter serving size: ")
-                calories = float(input("Enter calories: "))
-                protein = float(input("Enter protein: "))
-                fat = float(input("Enter fat: "))
-                sugar = float(input("Enter sugar: "))
-                carbs = float(input("Enter carbs: "))
-                self.cursor.execute("""INSERT INTO nutrition 
-                                    (shelf_life, serving, calories, protein, fat, sugar, carbs) 
-                                    VALUES (?, ?, ?, ?, ?, ?, ?)""", 
-                                    (shelf_life, serving, calories, protein, fat, sugar, carbs))
-                self.display_record("nutrition") ###
+        Returns:
+            dict: (scope, owner_id, product_id) -> quantity
+        """
+        cursor = self.read_cursor
+        cursor.execute("""
+            SELECT IFNULL(MAX(checkpoint_id), 0), IFNULL(MAX(entry_id), 0) FROM ledger_checkpoint
+            WHERE entry_id <= IFNULL(?1, entry_id)
+        """, (entry_id,))
+        checkpoint_id, checkpoint_entry = cursor.fetchone()
+        # The newest stored balance of each product and owner, SQLite takes the
+        # bare quantity from the row with MAX(checkpoint_id)
+        cursor.execute("""
+            SELECT scope, owner_id, product_id, SUM(quantity)
+            FROM (SELECT scope, owner_id, product_id, quantity
+                  FROM (SELECT scope, owner_id, product_id, quantity, MAX(checkpoint_id)
+                        FROM ledger_checkpoint_balance WHERE checkpoint_id <= ?1
+                        GROUP BY scope, owner_id, product_id)
+                  UNION ALL
+                  SELECT scope, owner_id, product_id, delta FROM inventory_ledger
+                  WHERE entry_id > ?2 AND entry_id <= IFNULL(?3, entry_id))
+            GROUP BY scope, owner_id, product_id
+        """, (checkpoint_id, checkpoint_entry, entry_id))
+        return {(scope, owner_id, product_id): quantity for scope, owner_id, product_id, quantity in cursor.fetchall()}
 
-            elif table == 'user':
-                name = input("Enter user name: ")
-                email = input("Enter user email: ")
-                type_ = input("Enter user type: ")
-                address = input("Enter user address: ")
-                phone_number = input("Enter phone number: ")
-                self.cursor.execute("""INSERT INTO user 
-                                    (name, email, type, address, phone_number) 
-                                    VALUES (?, ?, ?, ?, ?)""", 
-                                    (name, email, type_, address, phone_number))
-                self.display_record("user") ###
+    def stock_as_of(self, moment, scope, owner_id):
+        """
+        Stock a warehouse or location held at a moment, rebuilt from the ledger
 
-            elif table == 'purchase':
-                self.display_record("supplier") ###
-                supplier_id = int(input("Enter supplier ID: "))
-                self.display_record("warehouse") ###
-                warehouse_id = int(input("Enter warehouse ID: "))
-                
-                purchase_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.cursor.execute("""INSERT INTO purchase 
-                                    (supplier_id, warehouse_id, purchase_date) 
-                                    VALUES (?, ?, ?)""", 
-                                    (supplier_id, warehouse_id, purchase_date))
-                
-                self.display_record("purchase") ###
-                
-            elif table == 'product':
-                product_name = input("Enter product name: ")
-                brand = input("Enter brand: ")
-                category = input("Enter category: ")
-                cost_price = float(input("Enter cost price: "))
-                self.display_record("supplier") ###
-                supplier_id = int(input("Enter supplier ID: "))
-                self.display_record("nutrition") ###
-                nutrition_id = int(input("Enter nutrition ID: "))
-                self.cursor.execute("""INSERT INTO product
-                                    (product_name, brand, category, cost_price, supplier_id, nutrition_id) 
-                                    VALUES (?, ?, ?, ?, ?, ?)""", 
-                                    (product_name, brand, category, cost_price, supplier_id, nutrition_id))
-                self.display_record("product") ###
+        Starts from the newest checkpoint dated at or before the moment and
+        adds the owner's entries after it up to the moment, read through
+        idx_inventory_ledger_owner_time.
 
-            elif table == 'warehouse_inventory':
-                self.display_record("warehouse") ###
-                warehouse_id = int(input("Enter warehouse ID: "))
-                
-                last_updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.cursor.execute("""INSERT INTO warehouse_inventory 
-                                    (warehouse_id, last_updated) 
-                                    VALUES (?, ?)""", 
-                                    (warehouse_id, last_updated))
-                self.display_record("warehouse_inventory") ###
+        Args:
+            moment (int or str): Epoch seconds, or 'YYYY-MM-DD[ HH:MM:SS]' in UTC
+            scope (str): 'warehouse' or 'location'
+            owner_id (int): ID of the warehouse or location
 
-            elif table == 'movement':
-                self.display_record("warehouse") ###
-                warehouse_id = int(input("Enter warehouse ID: "))
-                self.display_record("location") ###
-                location_id = int(input("Enter location ID: "))
-                
-                movement_date = datetime.datetime.now().strftime("%Y-%m-%d")
-                self.cursor.execute("""INSERT INTO movement 
-                                    (warehouse_id, location_id, movement_date) 
-                                    VALUES (?, ?, ?)""", 
-                                    (warehouse_id, location_id, movement_date))
-                self.display_record("movement") ###
+        Returns:
+            list: (product_id, quantity) of every product held, as stock_levels
+        """
+        moment = to_epoch(moment)
+        cursor = self.read_cursor
+        cursor.execute("""
+            SELECT checkpoint_id, entry_id, recorded_at FROM ledger_checkpoint
+            WHERE recorded_at <= ? ORDER BY recorded_at DESC, checkpoint_id DESC LIMIT 1
+        """, (moment,))
+        # Before the first checkpoint every entry of the owner up to the moment is added
+        checkpoint_id, checkpoint_entry, checkpoint_time = cursor.fetchone() or (0, 0, -(1 << 63))
+        cursor.execute("""
+            SELECT product_id, SUM(quantity)
+            FROM (SELECT product_id, quantity
+                  FROM (SELECT product_id, quantity, MAX(checkpoint_id) FROM ledger_checkpoint_balance
+                        WHERE scope = ?2 AND owner_id = ?3 AND checkpoint_id <= ?1
+                        GROUP BY product_id)
+                  UNION ALL
+                  SELECT product_id, delta FROM inventory_ledger
+                  WHERE scope = ?2 AND owner_id = ?3 AND recorded_at BETWEEN ?4 AND ?5
+                  AND entry_id > ?6)
+            GROUP BY product_id
+            HAVING SUM(quantity) > 0
+            ORDER BY product_id
+        """, (checkpoint_id, scope, owner_id, checkpoint_time, moment, checkpoint_entry))
+        return cursor.fetchall()
 
-            elif table == 'location_inventory':
-                self.display_record("location") ###
-                location_id = int(input("Enter location ID: "))
-                
-                last_updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.cursor.execute("""INSERT INTO location_inventory 
-                                    (location_id, last_updated) 
-                                    VALUES (?, ?)""", 
-                                    (location_id, last_updated))
-                self.display_record("location_inventory") ###
+    def verify_ledger(self):
+        """
+        Compare the ledger balances with the stock rollups
 
-            elif table == 'sales':
-                self.display_record("location") ###
-                location_id = int(input("Enter location ID: "))
-                self.display_record("user") ###
-                user_id = int(input("Enter user ID: "))
-                
-                sales_date = datetime.datetime.now().strftime("%Y-%m-%d")
-                self.cursor.execute("""INSERT INTO sales 
-                                    (location_id, user_id, sales_date) 
-                                    VALUES (?, ?, ?)""", 
-                                    (location_id, user_id, sales_date))
-                self.display_record("sales") ###
-            else:
-                # Junction tables
+        Returns:
+            list: (scope, owner_id, product_id, ledger_quantity, stock_quantity)
+                for every product and owner where they differ, empty if none
+        """
+        balances = self.ledger_balances()
+        stock = {}
+        for scope, rollup in STOCK_ROLLUPS.items():
+            self.read_cursor.execute(f"SELECT {INVENTORY_SCOPES[scope][3]}, product_id, quantity FROM {rollup}")
+            for owner_id, product_id, quantity in self.read_cursor.fetchall():
+                stock[scope, owner_id, product_id] = quantity
+        return [key + (balances.get(key, 0), stock.get(key, 0)) for key in sorted(set(balances) | set(stock))
+                if balances.get(key, 0) != stock.get(key, 0)]
 
-                if table == 'warehouse_product':
-                    self.display_record("product") ###
-                    product_id = int(input("Enter product ID: "))
-                    self.display_record("warehouse_inventory") ###
-                    warehouse_inventory_id = int(input("Enter warehouse inventory ID: "))
-                    quantity = int(input("Enter quantity: "))
-                    self.cursor.execute("""INSERT INTO warehouse_product 
-                                        (product_id, warehouse_inventory_id, quantity) VALUES (?, ?, ?)""", 
-                                        (product_id, warehouse_inventory_id, quantity))
-                    
-                    self.display_record("warehouse_product") ###
+    def stock_available(self, scope, owner_id, product_ids):
+        """
+        Total quantity on hand of each product at a warehouse or location
 
-                elif table == 'product_purchased':
-                    self.display_record("product") ###
-                    product_id = int(input("Enter product ID: "))
-                    self.display_record("purchase") ###
-                    purchase_id = int(input("Enter purchase ID: "))
-                    quantity = int(input("Enter purchase quantity: "))
-                    
-                    success = self.adjust_inventory_for_product_purchased(product_id, purchase_id, quantity)
-                    
-                    if not success:
-                        print("Failed to process product purchased record.")
-                    else:
-                        self.display_record("product_purchased") ###
-    
-                elif table == 'movement_product':
-                    self.display_record("product") ###
-                    product_id = int(input("Enter product ID: "))
-                    self.display_record("movement") ###
-                    movement_id = int(input("Enter movement ID: "))
-                    quantity = int(input("Enter movement quantity: "))
-                    
-                    success = self.adjust_inventory_for_movement(product_id, movement_id, quantity)
-                    
-                    if not success:
-                        print("Failed to process movement product record.")
-                    else:
-                        self.display_record("movement_product") ###
-    
-                elif table == 'sales_product':
-                    self.display_record("product") ###
-                    product_id = int(input("Enter product ID: "))
-                    self.display_record("sales") ###
-                    sales_id = int(input("Enter sales ID: "))
-                    quantity = int(input("Enter sales quantity: "))
-                    
-                    success = self.adjust_inventory_for_sales(product_id, sales_id, quantity)
-                    
-                    if not success:
-                        print("Failed to process sales product record.")
-                    else:
-                        self.display_record("sales_product") ###
-                    
+        Args:
+            scope (str): 'warehouse' or 'location'
+            owner_id (int): ID of the warehouse or location
+            product_ids (list): Products to look up
+
+        Returns:
+            dict: product ID -> quantity, 0 for products never stocked there
+        """
+        owner_key = INVENTORY_SCOPES[scope][3]
+        self.cursor.execute(f"""
+            SELECT product_id, quantity FROM {STOCK_ROLLUPS[scope]}
+            WHERE {owner_key} = ? AND product_id IN (SELECT value FROM json_each(?))
+        """, (owner_id, json.dumps(list(product_ids))))
+        available = {product_id: 0 for product_id in product_ids}
+        available.update(self.cursor.fetchall())
+        return available
 
+    def stock_levels(self, scope, owner_id):
+        # Every product held by a warehouse or location, as (product_id, quantity)
+        owner_key = INVENTORY_SCOPES[scope][3]
+        self.read_cursor.execute(f"""
+            SELECT product_id, quantity FROM {STOCK_ROLLUPS[scope]}
+            WHERE {owner_key} = ? AND quantity > 0
+            ORDER BY product_id
+        """, (owner_id,))
+        return self.read_cursor.fetchall()
 
-                elif table == 'location_product':
-                    self.display_record("product") ###
-                    product_id = int(input("Enter product ID: "))
-                    self.display_record("location_inventory") ###
-                    location_inventory_id = int(input("Enter location inventory ID: "))
-                    quantity = int(input("Enter quantity: "))
-                    self.cursor.execute("""INSERT INTO location_product 
-                                        (product_id, location_inventory_id, quantity) VALUES (?, ?, ?)""", 
-                                        (product_id, location_inventory_id, quantity))
-                    self.display_record("location_product") ###
-                elif table == 'sales_product':
-                    self.display_record("product") ###
-                    product_id = int(input("Enter product ID: "))
-                    self.display_record("sales") ###
-                    sales_id = int(input("Enter sales ID: "))
-                    quantity = int(input("Enter sales quantity: "))
-                    self.cursor.execute("""INSERT INTO sales_product 
-                                        (product_id, sales_id, quantity) VALUES (?, ?, ?)""", 
-                                        (product_id, sales_id))
-                    self.display_record("sales_product") ###
+    def create_sales_daily(self):
+        """
+        Create the sales_daily aggregate and fill it from the existing sales
+
+        One row per day, location and product with the units sold and their
+        value at cost. The sale paths keep it current, so reports never scan
+        sales_product.
+        """
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS sales_daily (
+            day TEXT,
+            location_id INTEGER,
+            product_id INTEGER,
+            units INTEGER NOT NULL DEFAULT 0,
+            cost_value REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY(day, location_id, product_id)
+        ) WITHOUT ROWID''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_daily_location ON sales_daily (location_id, day)")
+        # sales_date was still text at this schema version
+        self.rebuild_sales_daily(commit=False, day="COALESCE(date(s.sales_date), s.sales_date)")
+
+    def rebuild_sales_daily(self, commit=True, day=SALES_DAY):
+        # Recompute sales_daily from the sales_product lines. Archived months
+        # only live on in sales_daily, so their days are kept as they are and
+        # only the days after the last archived month are recomputed.
+        since = self._archived_until()
+        self.cursor.execute("DELETE FROM sales_daily WHERE day >= date(?, 'unixepoch')", (since,))
+        self.cursor.execute(f"""
+            INSERT INTO sales_daily (day, location_id, product_id, units, cost_value)
+            SELECT {day}, s.location_id, sp.product_id, SUM(sp.quantity), SUM(sp.quantity * p.cost_price)
+            FROM sales_product sp
+            JOIN sales s ON s.sales_id = sp.sales_id
+            JOIN product p ON p.product_id = sp.product_id
+            WHERE ? = 0 OR s.sales_date >= ?
+            GROUP BY 1, 2, 3
+        """, (since, since))
+        if commit:
             self.conn.commit()
-            print("Record inserted successfully!")
 
-        except sqlite3.IntegrityError as e:
-            print(f"Error: Cannot insert {table} record. {e}")
-            print("This could be due to foreign key constraints.")
+    def _archived_until(self):
+        # Epoch seconds the archived months of sales run up to, 0 if none are archived
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sales_archive'")
+        if not self.cursor.fetchone():
+            return 0
+        self.cursor.execute("SELECT IFNULL(MAX(end_date), 0) FROM sales_archive")
+        return self.cursor.fetchone()[0]
 
-            
+    def _update_sales_daily(self, sales_id, lines, sign=1):
+        """
+        Add (sign=1) or remove (sign=-1) sale lines from sales_daily, without committing
 
+        This is done here rather than by a trigger on sales_product, so that
+        moving old lines out of sales_product does not remove them from the
+        reports.
 
-    def update_record(self, table):
-        print(f"\nUpdating record in {table}")
-        
-        self.display_record(table)
-        if table == "location_product":
-            record_id1 = int(input(f"Enter product ID to update: "))
-            record_id2 = int(input(f"Enter location_inventory ID to update: "))
+        Args:
+            sales_id (int): ID of the sale the lines belong to
+            lines (list): (product_id, quantity) pairs
+            sign (int): 1 when the lines were sold, -1 when they are removed
+        """
+        # Cost prices come from the dimension cache rather than a join with product
+        lines = list(lines)
+        products = self.dimensions.get_many(self.cursor, 'product', [product_id for product_id, _ in lines])
+        lines = [(product_id, quantity, products[product_id]['cost_price'])
+                 for product_id, quantity in lines if product_id in products]
+        self.cursor.execute(f"""
+            INSERT INTO sales_daily (day, location_id, product_id, units, cost_value)
+            SELECT {SALES_DAY}, s.location_id, json_extract(l.value, '$[0]'),
+                   ? * json_extract(l.value, '$[1]'), ? * json_extract(l.value, '$[1]') * json_extract(l.value, '$[2]')
+            FROM json_each(?) l
+            JOIN sales s ON s.sales_id = ?
+            WHERE true
+            ON CONFLICT(day, location_id, product_id) DO UPDATE SET
+                units = units + excluded.units,
+                cost_value = cost_value + excluded.cost_value
+        """, (sign, sign, json.dumps(lines), sales_id))
+        if sign < 0:
+            # Drop the days that no longer have any sales
+            self.cursor.execute(f"""
+                DELETE FROM sales_daily
+                WHERE units = 0 AND (location_id, day) IN (SELECT s.location_id, {SALES_DAY} FROM sales s WHERE s.sales_id = ?)
+            """, (sales_id,))
 
-        elif table == "warehouse_product":
-            record_id1 = int(input(f"Enter product ID to update: "))
-            record_id2 = int(input(f"Enter warehouse_inventory ID to update: "))
+    def top_products(self, location_id, start_day, end_day, limit=10):
+        """
+        Best selling products of a location between two days, inclusive
 
-        else:
-            id_column = f"{table}_id"
-            record_id = int(input(f"Enter {table} ID to update: "))
+        Returns:
+            list: (product_id, product_name, units, cost_value), most units first
+        """
+        self.read_cursor.execute("""
+            SELECT sd.product_id, p.product_name, SUM(sd.units) AS units, ROUND(SUM(sd.cost_value), 2)
+            FROM sales_daily sd
+            JOIN product p ON p.product_id = sd.product_id
+            WHERE sd.location_id = ? AND sd.day BETWEEN ? AND ?
+            GROUP BY sd.product_id
+            ORDER BY units DESC, sd.product_id
+            LIMIT ?
+        """, (location_id, start_day, end_day, limit))
+        return self.read_cursor.fetchall()
+
+    def weekly_sales(self, start_day, end_day, location_id=None):
+        """
+        Units and cost value per week, for one location or all of them
+
+        Returns:
+            list: (week_start, units, cost_value) with weeks starting on Monday
+        """
+        self.read_cursor.execute("""
+            SELECT date(day, '-6 days', 'weekday 1') AS week, SUM(units), ROUND(SUM(cost_value), 2)
+            FROM sales_daily
+            WHERE day BETWEEN ? AND ? AND (? IS NULL OR location_id = ?)
+            GROUP BY week
+            ORDER BY week
+        """, (start_day, end_day, location_id, location_id))
+        return self.read_cursor.fetchall()
+
+    def compare_locations(self, start_day, end_day):
+        """
+        Sales of every location between two days, inclusive
+
+        Returns:
+            list: (location_id, name, units, cost_value, share) where share is
+                the location's percentage of the total cost value
+        """
+        self.read_cursor.execute("""
+            SELECT sd.location_id, l.name, SUM(sd.units), ROUND(SUM(sd.cost_value), 2),
+                   ROUND(100.0 * SUM(sd.cost_value) / SUM(SUM(sd.cost_value)) OVER (), 1)
+            FROM sales_daily sd
+            JOIN location l ON l.location_id = sd.location_id
+            WHERE sd.day BETWEEN ? AND ?
+            GROUP BY sd.location_id
+            ORDER BY SUM(sd.cost_value) DESC
+        """, (start_day, end_day))
+        return self.read_cursor.fetchall()
+
+    def create_sales_archive(self):
+        """
+        Create the sales_archive registry of archived months
+
+        Each row names the file holding one month of sales and sales_product,
+        with its date range as [start_date, end_date) in epoch seconds, so
+        read paths know which files a date range needs.
+        """
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS sales_archive (
+            period TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            start_date INTEGER NOT NULL,
+            end_date INTEGER NOT NULL,
+            sales INTEGER NOT NULL DEFAULT 0,
+            lines INTEGER NOT NULL DEFAULT 0,
+            archived_at INTEGER
+        )''')
+
+    @staticmethod
+    def _month_start(month):
+        # Epoch seconds of the first day of a month counted as year * 12 + month - 1
+        return to_epoch(f"{month // 12:04d}-{month % 12 + 1:02d}-01")
+
+    def _archive_path(self, path):
+        # Registry paths are relative to the directory of the hot database
+        return os.path.join(os.path.dirname(os.path.abspath(self.db_name)), path)
+
+    def archive_sales(self, months_to_keep=12, archive_dir='', batch_size=5000):
+        """
+        Move sales older than the last months_to_keep months out of the hot database
+
+        Every closed month goes to its own file, '<db>-sales-YYYY-MM.db' in
+        archive_dir, which is attached and filled with batched INSERT ...
+        SELECT followed by DELETE, one transaction per batch, so writers are
+        only held up for one batch at a time. A month can be archived again
+        later, for example after backdated sales. sales_daily keeps the
+        archived days, the reports do not need the archives.
+
+        Args:
+            months_to_keep (int): Months before the current one that stay in the hot database
+            archive_dir (str): Directory of the archive files, relative to the database
+            batch_size (int): Sales moved per transaction
+
+        Returns:
+            list: (period, sales, lines) moved per month
+        """
+        today = datetime.datetime.now(datetime.timezone.utc)
+        cutoff = self._month_start(today.year * 12 + today.month - 1 - months_to_keep)
+        stem = os.path.splitext(os.path.basename(self.db_name))[0]
+
+        # The newest sale stays, so an emptied table does not hand out archived IDs again
+        self.cursor.execute("SELECT MAX(sales_id) FROM sales")
+        newest = self.cursor.fetchone()[0]
+        self.cursor.execute("""
+            SELECT DISTINCT strftime('%Y-%m', sales_date, 'unixepoch') FROM sales
+            WHERE sales_date < ? AND sales_id != ? ORDER BY 1
+        """, (cutoff, newest))
+        periods = [row[0] for row in self.cursor.fetchall()]
+        self.conn.commit()
+
+        moved = []
+        for period in periods:
+            year, month = map(int, period.split("-"))
+            start, end = self._month_start(year * 12 + month - 1), self._month_start(year * 12 + month)
+            path = os.path.join(archive_dir, f"{stem}-sales-{period}.db")
+            os.makedirs(os.path.dirname(self._archive_path(path)), exist_ok=True)
+
+            # ATTACH and DETACH are refused inside a transaction
+            self.cursor.execute("ATTACH DATABASE ? AS archive", (self._archive_path(path),))
+            try:
+                for table, definition in ARCHIVE_TABLES.items():
+                    self.cursor.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} ({definition})")
+                for index_name, table, columns in ARCHIVE_INDEXES:
+                    self.cursor.execute(f"CREATE INDEX IF NOT EXISTS archive.{index_name} ON {table} ({columns})")
+                self.conn.commit()
+
+                sales = lines = 0
+                while True:
+                    self.cursor.execute("""
+                        SELECT sales_id FROM sales
+                        WHERE sales_date >= ? AND sales_date < ? AND sales_id != ?
+                        ORDER BY sales_id LIMIT ?
+                    """, (start, end, newest, batch_size))
+                    batch = json.dumps([row[0] for row in self.cursor.fetchall()])
+                    if batch == "[]":
+                        break
+                    try:
+                        # OR REPLACE, a batch copied before a crash may be copied again
+                        for table in ARCHIVE_TABLES:
+                            self.cursor.execute(f"""
+                                INSERT OR REPLACE INTO archive.{table}
+                                SELECT * FROM main.{table} WHERE sales_id IN (SELECT value FROM json_each(?))
+                            """, (batch,))
+                        for table in reversed(list(ARCHIVE_TABLES)):
+                            self.cursor.execute(f"DELETE FROM main.{table} WHERE sales_id IN (SELECT value FROM json_each(?))",
+                                                (batch,))
+                            if table == 'sales':
+                                sales += self.cursor.rowcount
+                            else:
+                                lines += self.cursor.rowcount
+                        self.conn.commit()
+                    except sqlite3.Error:
+                        self.conn.rollback()
+                        raise
+
+                self.cursor.execute("""
+                    INSERT INTO sales_archive (period, path, start_date, end_date, sales, lines, archived_at)
+                    VALUES (?, ?, ?, ?, (SELECT COUNT(*) FROM archive.sales), (SELECT COUNT(*) FROM archive.sales_product),
+                            CAST(strftime('%s', 'now') AS INTEGER))
+                    ON CONFLICT(period) DO UPDATE SET
+                        path = excluded.path, sales = excluded.sales, lines = excluded.lines,
+                        archived_at = excluded.archived_at
+                """, (period, path, start, end))
+                self.conn.commit()
+            finally:
+                self.cursor.execute("DETACH DATABASE archive")
+            moved.append((period, sales, lines))
+        return moved
+
+    def iter_sales(self, start_day, end_day, location_id=None):
+        """
+        Stream the sale lines between two days, inclusive, from the hot
+        database and every archived month the range touches
+
+        The archives are attached to a connection of their own and read with
+        the hot tables in one UNION ALL, ARCHIVE_ATTACH_LIMIT files at a time.
+
+        Args:
+            start_day (str): First day, 'YYYY-MM-DD'
+            end_day (str): Last day, 'YYYY-MM-DD'
+            location_id (int): Optional location to restrict to
+
+        Yields:
+            tuple: (sales_id, location_id, user_id, sales_date, product_id, quantity)
+                in date order, except that hot sales dated inside an archived
+                month come after that month's archive
+        """
+        start, end = to_epoch(start_day), to_epoch(end_day) + 86400
+        self.read_cursor.execute("""
+            SELECT path FROM sales_archive WHERE start_date < ? AND end_date > ? ORDER BY start_date
+        """, (end, start))
+        paths = [self._archive_path(row[0]) for row in self.read_cursor.fetchall()]
+        paths = [path for path in paths if os.path.exists(path)]
+        groups = [paths[i:i + ARCHIVE_ATTACH_LIMIT] for i in range(0, len(paths), ARCHIVE_ATTACH_LIMIT)] or [[]]
+
+        conn = sqlite3.connect(self.db_name)
+        if self.query_stats is not None:
+            conn = instrument_connection(conn, self.query_stats, self.trace)
+        cursor = conn.cursor()
+        try:
+            for number, group in enumerate(groups, 1):
+                schemas = []
+                for i, path in enumerate(group):
+                    cursor.execute("ATTACH DATABASE ? AS ?", (path, f"archive{i}"))
+                    schemas.append(f"archive{i}")
+                # The hot tables go with the last group, after every archived month
+                if number == len(groups):
+                    schemas.append("main")
+
+                select = """
+                    SELECT s.sales_id, s.location_id, s.user_id, s.sales_date, sp.product_id, sp.quantity
+                    FROM {0}.sales s JOIN {0}.sales_product sp ON sp.sales_id = s.sales_id
+                    WHERE s.sales_date >= ? AND s.sales_date < ? AND (? IS NULL OR s.location_id = ?)
+                """
+                cursor.execute(" UNION ALL ".join(select.format(schema) for schema in schemas)
+                               + " ORDER BY 4, 1, 5", [start, end, location_id, location_id] * len(schemas))
+                while True:
+                    rows = cursor.fetchmany(500)
+                    if not rows:
+                        break
+                    yield from rows
+
+                for schema in schemas[:len(group)]:
+                    cursor.execute(f"DETACH DATABASE {schema}")
+        finally:
+            conn.close()
+
+    def archived_periods(self):
+        # Archived months in order: (period, path, sales, lines, archived_at)
+        self.read_cursor.execute("SELECT period, path, sales, lines, archived_at FROM sales_archive ORDER BY period")
+        return self.read_cursor.fetchall()
+
+    def backup(self, path, pages=1024, sleep=0.01, progress=None, max_restarts=3):
+        """
+        Copy the database to path with the SQLite online backup API
+
+        The copy is made pages at a time with a pause of sleep seconds in
+        between, so it never holds the disk for long. In WAL mode (pooled)
+        the source keeps one read snapshot open for the whole copy: writers
+        carry on as usual and the backup is consistent as of its start. In
+        rollback journal mode a snapshot would block writers until the end,
+        so the lock is only held during each step, and a write in between
+        restarts the copy. After max_restarts restarts the rest is copied in
+        a single step. The file is written under a temporary name, checked,
+        and renamed into place.
+
+        Args:
+            path (str): File to write, replaced if it exists
+            pages (int): Pages copied per step
+            sleep (float): Seconds to wait between steps, and before retrying a busy step
+            progress (callable): Called as progress(copied_pages, total_pages) after every step
+            max_restarts (int): Restarts allowed before copying in one step
+
+        Returns:
+            dict: path, pages, bytes, seconds, mb_per_sec and restarts
+        """
+        partial = path + ".partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+
+        source = sqlite3.connect(self.db_name, timeout=30, isolation_level=None)
+        target = sqlite3.connect(partial)
+        state = {'remaining': None, 'total': 0, 'restarts': 0}
+
+        def step(status, remaining, total):
+            # A step that went through without lowering the pages left started the copy over
+            if status == sqlite3.SQLITE_OK and state['remaining'] is not None and remaining >= state['remaining']:
+                state['restarts'] += 1
+                if state['restarts'] > max_restarts:
+                    raise InterruptedError("backup restarted too often")
+            state['remaining'], state['total'] = remaining, total
+            if progress is not None:
+                progress(total - remaining, total)
+            # The backup API itself only sleeps when the source is busy
+            if remaining:
+                time.sleep(sleep)
+
+        started = time.perf_counter()
+        try:
+            if source.execute("PRAGMA journal_mode").fetchone()[0] == 'wal':
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            try:
+                source.backup(target, pages=pages, progress=step, sleep=sleep)
+            except InterruptedError:
+                state['remaining'] = None
+                source.backup(target, pages=-1, progress=step)
+            if source.in_transaction:
+                source.execute("COMMIT")
+
+            check = target.execute("PRAGMA quick_check").fetchone()[0]
+            if check != 'ok':
+                raise sqlite3.DatabaseError(f"Backup failed its integrity check: {check}")
+            page_size = target.execute("PRAGMA page_size").fetchone()[0]
+        finally:
+            target.close()
+            source.close()
+        os.replace(partial, path)
+
+        seconds = time.perf_counter() - started
+        size = state['total'] * page_size
+        return {
+            'path': path,
+            'pages': state['total'],
+            'bytes': size,
+            'seconds': round(seconds, 3),
+            'mb_per_sec': round(size / 1e6 / seconds, 1) if seconds else 0.0,
+            'restarts': state['restarts'],
+        }
+
+    def preview_delete(self, table, record_id):
+        """
+        Report the rows that reference a record, without deleting anything
+
+        Args:
+            table (str): Name of the parent table
+            record_id (int): Primary key of the record
+
+        Returns:
+            list: (child_table, column, row_count, on_delete) for every referencing
+                foreign key that has rows. on_delete 'CASCADE' rows would be removed
+                with the record, any other action blocks the delete.
+        """
+        impact = []
+        for child_table in self.tables:
+            self.cursor.execute(f"PRAGMA foreign_key_list({child_table})")
+            for fk in self.cursor.fetchall():
+                # fk: (id, seq, parent, from, to, on_update, on_delete, match)
+                if fk[2] != table:
+                    continue
+                self.cursor.execute(f"SELECT COUNT(*) FROM {child_table} WHERE {fk[3]} = ?", (record_id,))
+                row_count = self.cursor.fetchone()[0]
+                if row_count:
+                    impact.append((child_table, fk[3], row_count, fk[6]))
+        return impact
+
+    # def adjust_inventory_for_product_purchased(self, product_id, purchase_id, quantity):
+    #     """
+    #     Adjust warehouse inventory when products are purchased
         
-        if table == 'supplier':
-            name = input("Enter new supplier name: ")
-            address = input("Enter new supplier address: ")
-            
-            if name:
-                self.cursor.execute(f"UPDATE {table} SET name = ? WHERE {id_column} = ?", (name, record_id))
-            if address:
-                self.cursor.execute(f"UPDATE {table} SET address = ? WHERE {id_column} = ?", (address, record_id))
+    #     Args:
+    #         product_id (int): ID of the product purchased
+    #         purchase_id (int): ID of the purchase
+    #         quantity (int): Quantity of product purchased
         
-        elif table == 'product':
-            fields = ['product_name', 'brand', 'category', 'cost_price', 'nutrition_id']
-            updates = {}
+    #     Returns:
+    #         bool: True if adjustment successful, False otherwise
+    #     """
+    #     try:
+    #         # Find the warehouse associated with this purchase
+    #         self.cursor.execute("""
+    #             SELECT warehouse_id FROM purchase 
+    #             WHERE purchase_id = ?
+    #         """, (purchase_id,))
+    #         warehouse_result = self.cursor.fetchone()
             
-            for field in fields:
-                if field == "nutrition_id":
-                    self.display_record("nutrition")
-                value = input(f"Enter new {field}: ")
-                if value:
-                    updates[field] = value
+    #         if not warehouse_result:
+    #             print("Error: No warehouse found for this purchase.")
+    #             return False
             
-            if updates:
-                set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
-                values = list(updates.values()) + [record_id]
-                self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
+    #         warehouse_id = warehouse_result[0]
+            
+    #         # Find warehouse inventories for this warehouse
+    #         self.cursor.execute("""
+    #             SELECT warehouse_inventory_id FROM warehouse_inventory 
+    #             WHERE warehouse_id = ?
+    #         """, (warehouse_id,))
+    #         inventories = self.cursor.fetchall()
+            
+    #         if not inventories:
+    #             # Create a new warehouse inventory if none exists
+    #             self.cursor.execute("""
+    #                 INSERT INTO warehouse_inventory (warehouse_id, last_updated) 
+    #                 VALUES (?, datetime('now'))
+    #             """, (warehouse_id,))
+    #             warehouse_inventory_id = self.cursor.lastrowid
+    #         else:
+    #             # Use the first warehouse inventory
+    #             warehouse_inventory_id = inventories[0][0]
+            
+    #         # Insert into product_purchased
+    #         self.cursor.execute("""
+    #             INSERT INTO product_purchased (product_id, purchase_id, quantity) 
+    #             VALUES (?, ?, ?)
+    #         """, (product_id, purchase_id, quantity))
+            
+    #         # Update or insert into warehouse_product
+    #         self.cursor.execute("""
+    #             INSERT INTO warehouse_product (product_id, warehouse_inventory_id, quantity)
+    #             VALUES (?, ?, ?)
+    #             ON CONFLICT(product_id, warehouse_inventory_id) DO UPDATE SET
+    #             quantity = quantity + ?
+    #         """, (product_id, warehouse_inventory_id, quantity, quantity))
+            
+    #         self.conn.commit()
+    #         print(f"Successfully added {quantity} units of product {product_id} to warehouse inventory")
+    #         return True
+        
+    #     except sqlite3.Error as e:
+    #         self.conn.rollback()
+    #         print(f"An error occurred during product purchase: {e}")
+    #         return False
+
+    def plan_allocation(self, scope, owner_id, lines, policy='largest'):
+        """
+        Compute the draw-down plan for a set of products in one query
+
+        Args:
+            scope (str): 'warehouse' or 'location'
+            owner_id (int): ID of the warehouse or location to draw from
+            lines (list): (product_id, quantity) pairs to allocate
+            policy (str or list): 'largest', 'fifo', or a list of inventory IDs
+                to draw from in that order
+
+        Returns:
+            tuple: (plan, available) where plan is a list of
+                (product_id, inventory_id, quantity) reductions and available
+                maps each product ID to its total quantity on hand
+        """
+        item_table, inventory_table, inventory_key, owner_key = INVENTORY_SCOPES[scope]
+
+        if isinstance(policy, str):
+            priority = []
+        else:
+            # A repeated ID would join its rows twice and count their stock twice
+            priority, policy = list(dict.fromkeys(policy)), 'explicit'
+        order = ALLOCATION_POLICIES[policy]
+
+        self.cursor.execute(f"""
+            WITH request(product_id, quantity) AS (
+                SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]')
+                FROM json_each(?)
+            ),
+            stock AS (
+                SELECT
+                    it.product_id,
+                    it.{inventory_key} AS inventory_id,
+                    it.quantity,
+                    inv.last_updated,
+                    pri.key AS priority
+                FROM request r
+                JOIN {item_table} it ON it.product_id = r.product_id
+                JOIN {inventory_table} inv ON inv.{inventory_key} = it.{inventory_key}
+                LEFT JOIN json_each(?) pri ON pri.value = it.{inventory_key}
+                WHERE inv.{owner_key} = ? AND it.quantity > 0
+                AND (? = 0 OR pri.key IS NOT NULL)
+            ),
+            drawdown AS (
+                SELECT
+                    product_id,
+                    inventory_id,
+                    quantity,
+                    SUM(quantity) OVER (PARTITION BY product_id) AS available,
+                    SUM(quantity) OVER (
+                        PARTITION BY product_id ORDER BY {order}
+                        ROWS UNBOUNDED PRECEDING
+                    ) - quantity AS drawn_before
+                FROM stock
+            )
+            SELECT d.product_id, d.inventory_id, MIN(d.quantity, r.quantity - d.drawn_before), d.available
+            FROM drawdown d
+            JOIN request r ON r.product_id = d.product_id
+            WHERE d.drawn_before < r.quantity
+        """, (json.dumps(lines), json.dumps(priority), owner_id, len(priority)))
+
+        plan = []
+        available = {product_id: 0 for product_id, _ in lines}
+        for product_id, inventory_id, take, total in self.cursor.fetchall():
+            plan.append((product_id, inventory_id, take))
+            available[product_id] = total
+        return plan, available
+
+    def _apply_allocation(self, scope, plan):
+        # Apply every reduction of the plan with a single UPDATE. A row is only
+        # drawn down if it still holds what the plan takes, so a plan read
+        # before another writer's commit cannot oversell. Returns False if
+        # any reduction did not apply.
+        item_table, _, inventory_key, _ = INVENTORY_SCOPES[scope]
+        self.cursor.execute(f"""
+            UPDATE {item_table}
+            SET quantity = {item_table}.quantity - json_extract(p.value, '$[2]')
+            FROM json_each(?) p
+            WHERE {item_table}.product_id = json_extract(p.value, '$[0]')
+            AND {item_table}.{inventory_key} = json_extract(p.value, '$[1]')
+            AND {item_table}.quantity >= json_extract(p.value, '$[2]')
+        """, (json.dumps(plan),))
+        return self.cursor.rowcount == len(plan)
+
+    def _allocate_stock(self, scope, owner_id, lines, policy='largest'):
+        """
+        Check and draw down stock for every line, without committing
+
+        Returns:
+            AdjustmentResult: Carrying the applied plan, or the shortages if
+                any line is short (nothing is applied)
+        """
+        # Reject short lines through the rollup before planning anything
+        available = self.stock_available(scope, owner_id, [product_id for product_id, _ in lines])
+        shortages = [(product_id, quantity, available[product_id]) for product_id, quantity in lines
+                     if quantity > available[product_id]]
+        if shortages:
+            return self._shortage(scope, shortages)
+
+        # An explicit policy only draws from the listed inventories, which can
+        # hold less than the rollup total, so the plan itself must cover every line
+        plan, available = self.plan_allocation(scope, owner_id, lines, policy)
+        planned = dict.fromkeys(available, 0)
+        for product_id, _, take in plan:
+            planned[product_id] += take
+        shortages = [(product_id, quantity, available[product_id]) for product_id, quantity in lines
+                     if quantity > planned[product_id]]
+        if shortages:
+            return self._shortage(scope, shortages)
+
+        if not self._apply_allocation(scope, plan):
+            # Only reachable if the stock changed since it was read, the caller rolls back
+            return AdjustmentResult.failure(
+                'insufficient_stock', f"The {scope} inventory changed while it was being drawn down")
+        return AdjustmentResult(True, plan=plan)
+
+    def _shortage(self, scope, shortages):
+        # Failure for (product_id, requested, available) lines that cannot be covered
+        product_id, quantity, on_hand = shortages[0]
+        if not on_hand:
+            return AdjustmentResult.failure(
+                'no_stock', f"No {scope} inventory found for product {product_id}", shortages)
+        return AdjustmentResult.failure(
+            'insufficient_stock',
+            f"Not enough inventory for product {product_id}. Requested: {quantity}, Available: {on_hand}",
+            shortages)
+
+    def _stock_after(self, scope, owner_id, product_ids):
+        # New quantities on hand, keyed as in AdjustmentResult.quantities
+        available = self.stock_available(scope, owner_id, product_ids)
+        return {(scope, owner_id, product_id): quantity for product_id, quantity in available.items()}
+
+    def _run_adjustment(self, adjustment, label, *args):
+        """
+        Run an _adjust_* method in its own transaction, committing if it applied
+
+        The _adjust_* methods never commit, so they can also run inside a
+        larger transaction (see WriteQueue). Here each one gets its own,
+        begun with BEGIN IMMEDIATE so the write lock is held before any
+        stock is read: no other writer can change the stock between the
+        check and the draw-down, and the transaction can never fail halfway
+        by having to upgrade a read snapshot. While the database is locked
+        past the busy timeout the whole adjustment is retried, up to
+        ADJUSTMENT_ATTEMPTS times with a jittered exponential delay.
+
+        Returns:
+            AdjustmentResult: Outcome of the last attempt
+        """
+        for attempt in range(1, ADJUSTMENT_ATTEMPTS + 1):
+            try:
+                if not self.conn.in_transaction:
+                    self.cursor.execute("BEGIN IMMEDIATE")
+                result = adjustment(*args)
+                if result:
+                    self.conn.commit()
+                    self._checkpoint_if_due()
+                else:
+                    self.conn.rollback()
+                return result
+
+            except sqlite3.IntegrityError as e:
+                self.conn.rollback()
+                return AdjustmentResult.failure('conflict', f"An error occurred during {label}: {e}")
+            except sqlite3.OperationalError as e:
+                self.conn.rollback()
+                if not is_locked_error(e):
+                    return AdjustmentResult.failure('database_error', f"An error occurred during {label}: {e}")
+                if attempt == ADJUSTMENT_ATTEMPTS:
+                    return AdjustmentResult.failure(
+                        'busy', f"The database stayed locked during {label} after {attempt} attempts: {e}")
+                time.sleep(random.uniform(0, ADJUSTMENT_RETRY_DELAY * 2 ** attempt))
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                return AdjustmentResult.failure('database_error', f"An error occurred during {label}: {e}")
+            except Exception:
+                # A bad argument (say a non-integer quantity) must not leave the write lock held
+                self.conn.rollback()
+                raise
+
+    def adjust_inventory_for_movement(self, product_id, movement_id, quantity, policy='largest'):
+        """
+        Adjust warehouse and location inventory when products are moved
+
+        Args:
+            product_id (int): ID of the product being moved
+            movement_id (int): ID of the movement
+            quantity (int): Quantity of product moved
+            policy (str or list): Draw-down policy, see plan_allocation
+
+        Returns:
+            AdjustmentResult: Truthy if the adjustment was applied
+        """
+        return self._run_adjustment(self._adjust_inventory_for_movement, "movement", product_id, movement_id, quantity, policy)
+
+    def _adjust_inventory_for_movement(self, product_id, movement_id, quantity, policy='largest'):
+        if quantity <= 0:
+            return AdjustmentResult.failure('invalid_quantity', f"Invalid quantity {quantity} for product {product_id}")
+
+        # Find the warehouse and location for this movement
+        self.cursor.execute("""
+            SELECT warehouse_id, location_id FROM movement
+            WHERE movement_id = ?
+        """, (movement_id,))
+        movement_result = self.cursor.fetchone()
+
+        if not movement_result:
+            return AdjustmentResult.failure('not_found', f"No warehouse or location found for movement {movement_id}")
+
+        warehouse_id, location_id = movement_result
+
+        # Reduce warehouse inventory
+        allocation = self._allocate_stock('warehouse', warehouse_id, [(product_id, quantity)], policy)
+        if not allocation:
+            return allocation
+
+        # Find or create location inventory
+        self.cursor.execute("""
+            SELECT location_inventory_id FROM location_inventory
+            WHERE location_id = ?
+        """, (location_id,))
+        location_inventories = self.cursor.fetchall()
+
+        if not location_inventories:
+            # Create a new location inventory if none exists
+            self.cursor.execute("""
+                INSERT INTO location_inventory (location_id, last_updated)
+                VALUES (?, CAST(strftime('%s', 'now') AS INTEGER))
+            """, (location_id,))
+            location_inventory_id = self.cursor.lastrowid
+        else:
+            # Use the first location inventory
+            location_inventory_id = location_inventories[0][0]
+
+        # Update or insert location product
+        self.cursor.execute("""
+            INSERT INTO location_product (product_id, location_inventory_id, quantity)
+            VALUES (?, ?, ?)
+            ON CONFLICT(product_id, location_inventory_id) DO UPDATE SET
+            quantity = quantity + ?
+        """, (product_id, location_inventory_id, quantity, quantity))
+
+        # Insert movement product record
+        self.cursor.execute("""
+            INSERT INTO movement_product (product_id, movement_id, quantity)
+            VALUES (?, ?, ?)
+        """, (product_id, movement_id, quantity))
+        self._record_ledger('warehouse', warehouse_id, [(product_id, -quantity)], 'movement', movement_id)
+        self._record_ledger('location', location_id, [(product_id, quantity)], 'movement', movement_id)
+
+        quantities = self._stock_after('warehouse', warehouse_id, [product_id])
+        quantities.update(self._stock_after('location', location_id, [product_id]))
+        return AdjustmentResult(True, detail=f"Successfully moved {quantity} units of product {product_id}",
+                                plan=allocation.plan, quantities=quantities)
+
+    def adjust_inventory_for_product_purchased(self, product_id, purchase_id, quantity):
+        """
+        Adjust warehouse inventory when products are purchased
+
+        Args:
+            product_id (int): ID of the product purchased
+            purchase_id (int): ID of the purchase
+            quantity (int): Quantity of product purchased
+
+        Returns:
+            AdjustmentResult: Truthy if the adjustment was applied
+        """
+        return self._run_adjustment(self._adjust_inventory_for_product_purchased, "product purchase", product_id, purchase_id, quantity)
+
+    def _adjust_inventory_for_product_purchased(self, product_id, purchase_id, quantity):
+        if quantity <= 0:
+            return AdjustmentResult.failure('invalid_quantity', f"Invalid quantity {quantity} for product {product_id}")
+
+        # Find the warehouse associated with this purchase
+        self.cursor.execute("""
+            SELECT warehouse_id FROM purchase
+            WHERE purchase_id = ?
+        """, (purchase_id,))
+        warehouse_result = self.cursor.fetchone()
+
+        if not warehouse_result:
+            return AdjustmentResult.failure('not_found', f"No warehouse found for purchase {purchase_id}")
+
+        warehouse_id = warehouse_result[0]
+
+        # Find or create warehouse inventory
+        self.cursor.execute("""
+            SELECT warehouse_inventory_id FROM warehouse_inventory
+            WHERE warehouse_id = ?
+        """, (warehouse_id,))
+        inventories = self.cursor.fetchall()
+        if not inventories:
+            # Create a new warehouse inventory if none exists
+            self.cursor.execute("""
+                INSERT INTO warehouse_inventory (warehouse_id, last_updated)
+                VALUES (?, CAST(strftime('%s', 'now') AS INTEGER))
+            """, (warehouse_id,))
+            warehouse_inventory_id = self.cursor.lastrowid
+        else:
+            # Use the first warehouse inventory
+            warehouse_inventory_id = inventories[0][0]
+
+        # Insert into product_purchased
+        self.cursor.execute("""
+            INSERT INTO product_purchased (product_id, purchase_id, quantity)
+            VALUES (?, ?, ?)
+        """, (product_id, purchase_id, quantity))
+
+        # Check if a record exists
+        self.cursor.execute("""
+            SELECT quantity FROM warehouse_product
+            WHERE product_id = ? AND warehouse_inventory_id = ?
+        """, (product_id, warehouse_inventory_id))
+        existing_record = self.cursor.fetchone()
+
+        if existing_record:
+            # Update existing record
+            self.cursor.execute("""
+                UPDATE warehouse_product
+                SET quantity = quantity + ?
+                WHERE product_id = ? AND warehouse_inventory_id = ?
+            """, (quantity, product_id, warehouse_inventory_id))
+        else:
+            # Insert new record
+            self.cursor.execute("""
+                INSERT INTO warehouse_product (product_id, warehouse_inventory_id, quantity)
+                VALUES (?, ?, ?)
+            """, (product_id, warehouse_inventory_id, quantity))
+        self._record_ledger('warehouse', warehouse_id, [(product_id, quantity)], 'purchase', purchase_id)
+
+        return AdjustmentResult(
+            True, detail=f"Successfully added {quantity} units of product {product_id} to warehouse inventory",
+            quantities=self._stock_after('warehouse', warehouse_id, [product_id]))
+
+    def adjust_inventory_for_sales(self, product_id, sales_id, quantity, policy='largest'):
+        """
+        Adjust location and sales inventory when products are sold
+
+        Args:
+            product_id (int): ID of the product being sold
+            sales_id (int): ID of the sale
+            quantity (int): Quantity of product sold
+            policy (str or list): Draw-down policy, see plan_allocation
+
+        Returns:
+            AdjustmentResult: Truthy if the adjustment was applied
+        """
+        return self._run_adjustment(self._adjust_inventory_for_sales, "sales", product_id, sales_id, quantity, policy)
+
+    def _adjust_inventory_for_sales(self, product_id, sales_id, quantity, policy='largest'):
+        if quantity <= 0:
+            return AdjustmentResult.failure('invalid_quantity', f"Invalid quantity {quantity} for product {product_id}")
+
+        # Find the location for this sale
+        self.cursor.execute("""
+            SELECT location_id FROM sales
+            WHERE sales_id = ?
+        """, (sales_id,))
+        sales_result = self.cursor.fetchone()
+
+        if not sales_result:
+            return AdjustmentResult.failure('not_found', f"No location found for sale {sales_id}")
+
+        location_id = sales_result[0]
+
+        # Reduce location inventory
+        allocation = self._allocate_stock('location', location_id, [(product_id, quantity)], policy)
+        if not allocation:
+            return allocation
+
+        # Insert sales product record
+        self.cursor.execute("""
+            INSERT INTO sales_product (product_id, sales_id, quantity)
+            VALUES (?, ?, ?)
+        """, (product_id, sales_id, quantity))
+        self._update_sales_daily(sales_id, [(product_id, quantity)])
+        self._record_ledger('location', location_id, [(product_id, -quantity)], 'sale', sales_id)
+
+        return AdjustmentResult(True, detail=f"Successfully sold {quantity} units of product {product_id}",
+                                plan=allocation.plan,
+                                quantities=self._stock_after('location', location_id, [product_id]))
+
+    def adjust_inventory_for_basket(self, sales_id, lines, policy='largest'):
+        """
+        Adjust location inventory for every line of a sale in one transaction
+
+        Args:
+            sales_id (int): ID of the sale
+            lines (list): (product_id, quantity) pairs in the basket
+            policy (str or list): Draw-down policy, see plan_allocation
+
+        Returns:
+            AdjustmentResult: Truthy if every line was applied (otherwise nothing is)
+        """
+        return self._run_adjustment(self._adjust_inventory_for_basket, "sales", sales_id, lines, policy)
+
+    def _adjust_inventory_for_basket(self, sales_id, lines, policy='largest'):
+        # Merge repeated products, sales_product holds one row per product and sale
+        basket = {}
+        for product_id, quantity in lines:
+            if quantity <= 0:
+                return AdjustmentResult.failure('invalid_quantity', f"Invalid quantity {quantity} for product {product_id}")
+            basket[product_id] = basket.get(product_id, 0) + quantity
+
+        if not basket:
+            return AdjustmentResult.failure('empty_basket', "Basket is empty.")
+
+        # Find the location for this sale
+        self.cursor.execute("""
+            SELECT location_id FROM sales
+            WHERE sales_id = ?
+        """, (sales_id,))
+        sales_result = self.cursor.fetchone()
+
+        if not sales_result:
+            return AdjustmentResult.failure('not_found', f"No location found for sale {sales_id}")
+
+        location_id = sales_result[0]
+
+        # Check and reduce the location inventory for all lines at once
+        allocation = self._allocate_stock('location', location_id, list(basket.items()), policy)
+        if not allocation:
+            return allocation
+
+        self.cursor.executemany("""
+            INSERT INTO sales_product (product_id, sales_id, quantity)
+            VALUES (?, ?, ?)
+        """, [(product_id, sales_id, quantity) for product_id, quantity in basket.items()])
+        self._update_sales_daily(sales_id, basket.items())
+        self._record_ledger('location', location_id, [(product_id, -quantity) for product_id, quantity in basket.items()],
+                            'sale', sales_id)
+
+        return AdjustmentResult(
+            True, detail=f"Successfully sold {sum(basket.values())} units across {len(basket)} products",
+            plan=allocation.plan, quantities=self._stock_after('location', location_id, list(basket)))
+
+    def plan_replenishment(self, location_ids=None):
+        """
+        Work out the movements that refill every location to its targets
+
+        A product is refilled once a location's stock of it is at or below its
+        reorder point and the reorder point has a target. The whole plan is
+        one set-based query: running totals of what the locations need
+        (emptiest first) and of what the warehouses hold (fullest first) are
+        laid side by side per product, and each overlap of a need with a
+        warehouse's stock becomes a line. When warehouse stock runs short the
+        emptiest locations are served first.
+
+        Args:
+            location_ids (list): Locations to plan for, None for all
+
+        Returns:
+            list: (location_id, warehouse_id, product_id, quantity, on_hand, target)
+                ordered by location, warehouse and product
+        """
+        locations = None if location_ids is None else json.dumps(list(location_ids))
+        self.read_cursor.execute("""
+            WITH need AS (
+                SELECT rp.location_id, rp.product_id, IFNULL(ls.quantity, 0) AS on_hand, rp.target,
+                       rp.target - IFNULL(ls.quantity, 0) AS quantity
+                FROM location_reorder_point rp
+                LEFT JOIN location_stock ls ON ls.product_id = rp.product_id AND ls.location_id = rp.location_id
+                WHERE rp.target IS NOT NULL AND IFNULL(ls.quantity, 0) <= rp.reorder_point
+                AND rp.target > IFNULL(ls.quantity, 0)
+                AND (?1 IS NULL OR rp.location_id IN (SELECT value FROM json_each(?1)))
+            ),
+            demand AS (
+                SELECT *, SUM(quantity) OVER (PARTITION BY product_id
+                                              ORDER BY 1.0 * on_hand / target, location_id) AS upto
+                FROM need
+            ),
+            supply AS (
+                SELECT warehouse_id, product_id, quantity,
+                       SUM(quantity) OVER (PARTITION BY product_id ORDER BY quantity DESC, warehouse_id) AS upto
+                FROM warehouse_stock
+                WHERE quantity > 0 AND product_id IN (SELECT product_id FROM need)
+            )
+            SELECT d.location_id, s.warehouse_id, d.product_id,
+                   MIN(d.upto, s.upto) - MAX(d.upto - d.quantity, s.upto - s.quantity), d.on_hand, d.target
+            FROM demand d
+            JOIN supply s ON s.product_id = d.product_id
+                AND s.upto - s.quantity < d.upto AND d.upto - d.quantity < s.upto
+            ORDER BY d.location_id, s.warehouse_id, d.product_id
+        """, (locations,))
+        return self.read_cursor.fetchall()
+
+    def replenish(self, location_ids=None, policy='largest'):
+        """
+        Refill locations to their targets in one transaction
+
+        Runs plan_replenishment and records one movement per warehouse and
+        location pair, with its movement_product lines and the warehouse and
+        location inventory adjustments. Either the whole plan is applied or
+        none of it.
+
+        Args:
+            location_ids (list): Locations to refill, None for all
+            policy (str or list): Draw-down policy for the warehouses, see plan_allocation
+
+        Returns:
+            AdjustmentResult: Truthy if the plan was applied, plan holds the
+                warehouse reductions and quantities the new stock levels
+        """
+        return self._run_adjustment(self._replenish, "replenishment", location_ids, policy)
+
+    def _replenish(self, location_ids=None, policy='largest'):
+        # The plan is read inside the write transaction, so it cannot go stale before it is applied
+        movements = {}
+        for location_id, warehouse_id, product_id, quantity, _, _ in self.plan_replenishment(location_ids):
+            movements.setdefault((warehouse_id, location_id), []).append((product_id, quantity))
+        if not movements:
+            return AdjustmentResult(True, detail="Nothing to replenish.")
+
+        reductions, quantities = [], {}
+        for (warehouse_id, location_id), lines in movements.items():
+            allocation = self._allocate_stock('warehouse', warehouse_id, lines, policy)
+            if not allocation:
+                return allocation
+            reductions += allocation.plan
+
+            self.cursor.execute("""
+                INSERT INTO movement (warehouse_id, location_id, movement_date)
+                VALUES (?, ?, CAST(strftime('%s', 'now') AS INTEGER))
+            """, (warehouse_id, location_id))
+            movement_id = self.cursor.lastrowid
+
+            self.cursor.execute("SELECT MIN(location_inventory_id) FROM location_inventory WHERE location_id = ?",
+                                (location_id,))
+            location_inventory_id = self.cursor.fetchone()[0]
+            if location_inventory_id is None:
+                self.cursor.execute("""
+                    INSERT INTO location_inventory (location_id, last_updated)
+                    VALUES (?, CAST(strftime('%s', 'now') AS INTEGER))
+                """, (location_id,))
+                location_inventory_id = self.cursor.lastrowid
+
+            self.cursor.executemany("""
+                INSERT INTO location_product (product_id, location_inventory_id, quantity)
+                VALUES (?, ?, ?)
+                ON CONFLICT(product_id, location_inventory_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity
+            """, [(product_id, location_inventory_id, quantity) for product_id, quantity in lines])
+            self.cursor.executemany("""
+                INSERT INTO movement_product (product_id, movement_id, quantity)
+                VALUES (?, ?, ?)
+            """, [(product_id, movement_id, quantity) for product_id, quantity in lines])
+            self._record_ledger('warehouse', warehouse_id, [(product_id, -quantity) for product_id, quantity in lines],
+                                'movement', movement_id)
+            self._record_ledger('location', location_id, lines, 'movement', movement_id)
+
+            product_ids = [product_id for product_id, _ in lines]
+            quantities.update(self._stock_after('warehouse', warehouse_id, product_ids))
+            quantities.update(self._stock_after('location', location_id, product_ids))
+
+        line_count = sum(len(lines) for lines in movements.values())
+        units = sum(quantity for lines in movements.values() for _, quantity in lines)
+        return AdjustmentResult(
+            True, detail=f"Created {len(movements)} movements with {line_count} lines, {units} units in total",
+            plan=reductions, quantities=quantities)
+
+    def insert_record(self, table):
+        print(f"\nInserting record into {table}")
+        try:
+            if table == 'supplier':
+                name = input("Enter supplier name: ")
+                address = input("Enter supplier address: ")
+                self.cursor.execute("INSERT INTO supplier (name, address) VALUES (?, ?)", 
+                                    (name, address))
+                self.display_record("supplier") ###
+
+            elif table == 'warehouse':
+                name = input("Enter warehouse name: ")
+                address = input("Enter warehouse address: ")
+                self.cursor.execute("INSERT INTO warehouse (name, address) VALUES (?, ?)", 
+                                    (name, address))
+                self.display_record("warehouse") ###
+
+            elif table == 'location':
+                name = input("Enter location name: ")
+                type_ = input("Enter location type: ")
+                address = input("Enter location address: ")
+                ip_address = input("Enter IP address: ")
+                self.cursor.execute("INSERT INTO location (name, type, address, ip_address) VALUES (?, ?, ?, ?)", 
+                                    (name, type_, address, ip_address))
+                self.display_record("location") ###
+
+            elif table == 'nutrition':
+                shelf_life = input("Enter shelf life: ")
+                serving = input("Enter serving size: ")
+                calories = float(input("Enter calories: "))
+                protein = float(input("Enter protein: "))
+                fat = float(input("Enter fat: "))
+                sugar = float(input("Enter sugar: "))
+                carbs = float(input("Enter carbs: "))
+                self.cursor.execute("""INSERT INTO nutrition 
+                                    (shelf_life, serving, calories, protein, fat, sugar, carbs) 
+                                    VALUES (?, ?, ?, ?, ?, ?, ?)""", 
+                                    (shelf_life, serving, calories, protein, fat, sugar, carbs))
+                self.display_record("nutrition") ###
+
+            elif table == 'user':
+                name = input("Enter user name: ")
+                email = input("Enter user email: ")
+                type_ = input("Enter user type: ")
+                address = input("Enter user address: ")
+                phone_number = input("Enter phone number: ")
+                self.cursor.execute("""INSERT INTO user 
+                                    (name, email, type, address, phone_number) 
+                                    VALUES (?, ?, ?, ?, ?)""", 
+                                    (name, email, type_, address, phone_number))
+                self.display_record("user") ###
+
+            elif table == 'purchase':
+                self.display_record("supplier") ###
+                supplier_id = int(input("Enter supplier ID: "))
+                self.display_record("warehouse") ###
+                warehouse_id = int(input("Enter warehouse ID: "))
+                
+                purchase_date = int(time.time())
+                self.cursor.execute("""INSERT INTO purchase 
+                                    (supplier_id, warehouse_id, purchase_date) 
+                                    VALUES (?, ?, ?)""", 
+                                    (supplier_id, warehouse_id, purchase_date))
+                
+                self.display_record("purchase") ###
+                
+            elif table == 'product':
+                product_name = input("Enter product name: ")
+                brand = input("Enter brand: ")
+                category = input("Enter category: ")
+                cost_price = float(input("Enter cost price: "))
+                self.display_record("supplier") ###
+                supplier_id = int(input("Enter supplier ID: "))
+                self.display_record("nutrition") ###
+                nutrition_id = int(input("Enter nutrition ID: "))
+                self.cursor.execute("""INSERT INTO product
+                                    (product_name, brand, category, cost_price, supplier_id, nutrition_id) 
+                                    VALUES (?, ?, ?, ?, ?, ?)""", 
+                                    (product_name, brand, category, cost_price, supplier_id, nutrition_id))
+                self.display_record("product") ###
+
+            elif table == 'warehouse_inventory':
+                self.display_record("warehouse") ###
+                warehouse_id = int(input("Enter warehouse ID: "))
+                
+                last_updated = int(time.time())
+                self.cursor.execute("""INSERT INTO warehouse_inventory 
+                                    (warehouse_id, last_updated) 
+                                    VALUES (?, ?)""", 
+                                    (warehouse_id, last_updated))
+                self.display_record("warehouse_inventory") ###
+
+            elif table == 'movement':
+                self.display_record("warehouse") ###
+                warehouse_id = int(input("Enter warehouse ID: "))
+                self.display_record("location") ###
+                location_id = int(input("Enter location ID: "))
+                
+                movement_date = int(time.time())
+                self.cursor.execute("""INSERT INTO movement 
+                                    (warehouse_id, location_id, movement_date) 
+                                    VALUES (?, ?, ?)""", 
+                                    (warehouse_id, location_id, movement_date))
+                self.display_record("movement") ###
+
+            elif table == 'location_inventory':
+                self.display_record("location") ###
+                location_id = int(input("Enter location ID: "))
+                
+                last_updated = int(time.time())
+                self.cursor.execute("""INSERT INTO location_inventory 
+                                    (location_id, last_updated) 
+                                    VALUES (?, ?)""", 
+                                    (location_id, last_updated))
+                self.display_record("location_inventory") ###
+
+            elif table == 'sales':
+                self.display_record("location") ###
+                location_id = int(input("Enter location ID: "))
+                self.display_record("user") ###
+                user_id = int(input("Enter user ID: "))
+                
+                sales_date = int(time.time())
+                self.cursor.execute("""INSERT INTO sales 
+                                    (location_id, user_id, sales_date) 
+                                    VALUES (?, ?, ?)""", 
+                                    (location_id, user_id, sales_date))
+                self.display_record("sales") ###
+            else:
+                # Junction tables
+
+                if table == 'warehouse_product':
+                    self.display_record("product") ###
+                    product_id = int(input("Enter product ID: "))
+                    self.display_record("warehouse_inventory") ###
+                    warehouse_inventory_id = int(input("Enter warehouse inventory ID: "))
+                    quantity = int(input("Enter quantity: "))
+                    self.cursor.execute("""INSERT INTO warehouse_product 
+                                        (product_id, warehouse_inventory_id, quantity) VALUES (?, ?, ?)""", 
+                                        (product_id, warehouse_inventory_id, quantity))
+                    self._record_ledger_edit({}, self._item_stock(
+                        table, "product_id = ? AND warehouse_inventory_id = ?", (product_id, warehouse_inventory_id)))
+                    
+                    self.display_record("warehouse_product") ###
+
+                elif table == 'product_purchased':
+                    self.display_record("product") ###
+                    product_id = int(input("Enter product ID: "))
+                    self.display_record("purchase") ###
+                    purchase_id = int(input("Enter purchase ID: "))
+                    quantity = int(input("Enter purchase quantity: "))
+                    
+                    result = self.adjust_inventory_for_product_purchased(product_id, purchase_id, quantity)
+                    print(result.detail)
+                    
+                    if not result:
+                        print("Failed to process product purchased record.")
+                    else:
+                        self.display_record("product_purchased") ###
+    
+                elif table == 'movement_product':
+                    self.display_record("product") ###
+                    product_id = int(input("Enter product ID: "))
+                    self.display_record("movement") ###
+                    movement_id = int(input("Enter movement ID: "))
+                    quantity = int(input("Enter movement quantity: "))
+                    
+                    result = self.adjust_inventory_for_movement(product_id, movement_id, quantity)
+                    print(result.detail)
+                    
+                    if not result:
+                        print("Failed to process movement product record.")
+                    else:
+                        self.display_record("movement_product") ###
+    
+                elif table == 'sales_product':
+                    self.display_record("sales") ###
+                    sales_id = int(input("Enter sales ID: "))
+                    self.display_record("product") ###
+
+                    # Collect the whole basket so it is checked out in one transaction
+                    lines = []
+                    while True:
+                        product_id = input("Enter product ID (press enter to finish): ")
+                        if not product_id:
+                            break
+                        quantity = int(input("Enter sales quantity: "))
+                        lines.append((int(product_id), quantity))
+                    
+                    result = self.adjust_inventory_for_basket(sales_id, lines)
+                    print(result.detail)
+                    
+                    if not result:
+                        print("Failed to process sales product record.")
+                    else:
+                        self.display_record("sales_product") ###
+                    
+
+
+                elif table == 'location_product':
+                    self.display_record("product") ###
+                    product_id = int(input("Enter product ID: "))
+                    self.display_record("location_inventory") ###
+                    location_inventory_id = int(input("Enter location inventory ID: "))
+                    quantity = int(input("Enter quantity: "))
+                    self.cursor.execute("""INSERT INTO location_product 
+                                        (product_id, location_inventory_id, quantity) VALUES (?, ?, ?)""", 
+                                        (product_id, location_inventory_id, quantity))
+                    self._record_ledger_edit({}, self._item_stock(
+                        table, "product_id = ? AND location_inventory_id = ?", (product_id, location_inventory_id)))
+                    self.display_record("location_product") ###
+                elif table == 'sales_product':
+                    self.display_record("product") ###
+                    product_id = int(input("Enter product ID: "))
+                    self.display_record("sales") ###
+                    sales_id = int(input("Enter sales ID: "))
+                    quantity = int(input("Enter sales quantity: "))
+                    self.cursor.execute("""INSERT INTO sales_product 
+                                        (product_id, sales_id, quantity) VALUES (?, ?, ?)""", 
+                                        (product_id, sales_id))
+                    self.display_record("sales_product") ###
+            self.conn.commit()
+            self.dimensions.invalidate(table, self.cursor.lastrowid)
+            print("Record inserted successfully!")
+
+        except sqlite3.IntegrityError as e:
+            print(f"Error: Cannot insert {table} record. {e}")
+            print("This could be due to foreign key constraints.")
+
+            
+
+
+    def update_record(self, table):
+        print(f"\nUpdating record in {table}")
+        
+        self.display_record(table)
+        if table == "location_product":
+            record_id1 = int(input(f"Enter product ID to update: "))
+            record_id2 = int(input(f"Enter location_inventory ID to update: "))
+
+        elif table == "warehouse_product":
+            record_id1 = int(input(f"Enter product ID to update: "))
+            record_id2 = int(input(f"Enter warehouse_inventory ID to update: "))
+
+        else:
+            id_column = f"{table}_id"
+            record_id = int(input(f"Enter {table} ID to update: "))
+        
+        if table == 'supplier':
+            name = input("Enter new supplier name: ")
+            address = input("Enter new supplier address: ")
+            
+            if name:
+                self.cursor.execute(f"UPDATE {table} SET name = ? WHERE {id_column} = ?", (name, record_id))
+            if address:
+                self.cursor.execute(f"UPDATE {table} SET address = ? WHERE {id_column} = ?", (address, record_id))
+        
+        elif table == 'product':
+            fields = ['product_name', 'brand', 'category', 'cost_price', 'nutrition_id']
+            updates = {}
+            
+            for field in fields:
+                if field == "nutrition_id":
+                    self.display_record("nutrition")
+                value = input(f"Enter new {field}: ")
+                if value:
+                    updates[field] = value
+            
+            if updates:
+                set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
+                values = list(updates.values()) + [record_id]
+                self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
+
+        elif table == 'nutrition':
+
+            fields = ['shelf_life', 'serving', 'calories', 'protein', 'fat', 'sugar', 'carbs']
+            updates = {}
+            
+            for field in fields:
+                value = input(f"Enter new {field}: ")
+                if value:
+                    updates[field] = value
+            
+            if updates:
+                set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
+                values = list(updates.values()) + [record_id]
+                self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
+
+        elif table == 'warehouse':
+            
+            fields = ['name', 'address']
+            updates = {}
+            
+            for field in fields:
+                value = input(f"Enter new {field}: ")
+                if value:
+                    updates[field] = value
+            
+            if updates:
+                set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
+                values = list(updates.values()) + [record_id]
+                self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
+
+        elif table == 'user':
+            
+            fields = ['name', 'email', 'type', 'address', 'phone_number']
+            updates = {}
+            
+            for field in fields:
+                value = input(f"Enter new {field}: ")
+                if value:
+                    updates[field] = value
+            
+            if updates:
+                set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
+                values = list(updates.values()) + [record_id]
+                self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
+
+        elif table == 'location':
+            
+            fields = ['name', 'type', 'address', 'ip_address']
+            updates = {}
+            
+            for field in fields:
+                value = input(f"Enter new {field}: ")
+                if value:
+                    updates[field] = value
+            
+            if updates:
+                set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
+                values = list(updates.values()) + [record_id]
+                self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
+
+        elif table == "location_product":
+            quantity = input("Enter quantity update: ")
+            
+            # if quantity:
+            #     self.cursor.execute(f"UPDATE {table} SET quantity = ? WHERE location_inventory_id = ? AND product_id = ?", (quantity, record_id1, record_id2))
+
+            if quantity:
+                self.cursor.execute(
+                    "SELECT * FROM location_product WHERE location_inventory_id = ? AND product_id = ?", 
+                    (record_id2, record_id1)
+                )
+                if self.cursor.fetchone():
+                    where = "location_inventory_id = ? AND product_id = ?"
+                    stock = self._item_stock(table, where, (record_id2, record_id1))
+                    self.cursor.execute(
+                        f"UPDATE {table} SET quantity = ? WHERE location_inventory_id = ? AND product_id = ?", 
+                        (quantity, record_id2, record_id1)
+                    )
+                    self._record_ledger_edit(stock, self._item_stock(table, where, (record_id2, record_id1)))
+                    print("Quantity updated successfully.")
+                else:
+                    print("No matching record found for the given location_inventory_id and product_id.")
+
+        elif table == "warehouse_product":
+            quantity = input("Enter quantity update: ")
+            
+            if quantity:
+                where = "warehouse_inventory_id = ? AND product_id = ?"
+                stock = self._item_stock(table, where, (record_id2, record_id1))
+                self.cursor.execute(f"UPDATE {table} SET quantity = ? WHERE warehouse_inventory_id = ? AND product_id = ?", (quantity, record_id2, record_id1))
+                self._record_ledger_edit(stock, self._item_stock(table, where, (record_id2, record_id1)))
+        
+        # else:
+        #     # Dynamically handle updates for other tables
+        #     columns = [desc[0] for desc in self.cursor.execute(f"PRAGMA table_info({table})") if desc[0] != id_column]
+            
+        #     updates = {}
+        #     for column in columns:
+        #         value = input(f"Enter new {column} (press enter to skip): ")
+        #         if value:
+        #             updates[column] = value
+            
+        #     if updates:
+        #         set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
+        #         values = list(updates.values()) + [record_id]
+        #         self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
+        self.display_record(table)
+        self.conn.commit()
+        if table in DIMENSION_TABLES:
+            self.dimensions.invalidate(table, record_id)
+        print("Record updated successfully!")
+
+    def delete_record(self, table):
+        print(f"\nDeleting record from {table}")
+        if table in JUNCTION_KEYS:
+            id_column = JUNCTION_KEYS[table]
+            
+            try:
+                # Get the record ID to delete
+                self.display_record(table)
+                record_id1 = int(input(f"Enter {table} {id_column[0]} to delete: "))
+                record_id2 = int(input(f"Enter {table} {id_column[1]} ID to delete: "))
+                
+                # First, check if the record exists
+                self.cursor.execute(f"SELECT * FROM {table} WHERE {id_column[0]} = ? AND {id_column[1]} = ?", (record_id1, record_id2))
+                existing_record = self.cursor.fetchone()
+                
+                if not existing_record:
+                    print(f"No {table} record found with IDs {record_id1} and {record_id2}")
+                    return
+                
+                # Confirm deletion
+                confirm = input(f"Are you sure you want to delete {table} record with IDs {record_id1} and {record_id2}? (yes/no): ").lower()
+                
+                if confirm != 'yes':
+                    print("Deletion cancelled.")
+                    return
+                
+                # Attempt to delete the record
+                stock = self._item_stock(table, f"{id_column[0]} = ? AND {id_column[1]} = ?", (record_id1, record_id2))
+                self.cursor.execute(f"DELETE FROM {table} WHERE {id_column[0]} = ? AND {id_column[1]} = ?", (record_id1, record_id2))
+                
+                # Check if any rows were actually deleted
+                if self.cursor.rowcount > 0:
+                    self._record_ledger_edit(stock, {})
+                    if table == 'sales_product':
+                        self._update_sales_daily(record_id2, [(record_id1, existing_record[2])], -1)
+                    self.conn.commit()
+                    print(f"Successfully deleted record with IDs {record_id1} and {record_id2} from {table}")
+                    self.display_record(table)
+                else:
+                    print(f"No record found with IDs {record_id1} and {record_id2} in {table}")
+            
+            except sqlite3.IntegrityError:
+                print(f"Error: Cannot delete {table} record. It may be referenced by other tables.")
+                print("This could be due to foreign key constraints.")
+            
+            except ValueError:
+                print("Invalid ID. Please enter a valid numeric ID.")
+            
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                print(f"An error occurred while deleting the record: {e}")
+
+        else:
+        
+            
+            id_column = f"{table}_id"
+            
+            try:
+                self.display_record(table)
+                # Get the record ID to delete
+                record_id = int(input(f"Enter {table} ID to delete: "))
+                
+                # First, check if the record exists
+                self.cursor.execute(f"SELECT * FROM {table} WHERE {id_column} = ?", (record_id,))
+                existing_record = self.cursor.fetchone()
+                
+                if not existing_record:
+                    print(f"No {table} record found with ID {record_id}")
+                    return
+                
+                # Check what references this record before attempting the delete
+                impact = self.preview_delete(table, record_id)
+                blockers = [ref for ref in impact if ref[3] != 'CASCADE']
+                if blockers:
+                    print(f"Error: Cannot delete {table} record {record_id}. It is referenced by:")
+                    for child_table, column, row_count, _ in blockers:
+                        print(f"  {row_count} {child_table} record(s) through {column}")
+                    return
+                
+                for child_table, column, row_count, _ in impact:
+                    print(f"Deleting this record also deletes {row_count} {child_table} record(s).")
+                
+                # Confirm deletion
+                confirm = input(f"Are you sure you want to delete {table} record with ID {record_id}? (yes/no): ").lower()
+                
+                if confirm != 'yes':
+                    print("Deletion cancelled.")
+                    return
+                
+                # Attempt to delete the record
+                self.cursor.execute(f"DELETE FROM {table} WHERE {id_column} = ?", (record_id,))
+                
+                # Check if any rows were actually deleted
+                if self.cursor.rowcount > 0:
+                    self.conn.commit()
+                    self.dimensions.invalidate(table, record_id)
+                    print(f"Successfully deleted record with ID {record_id} from {table}")
+                    self.display_record(table)
+                else:
+                    print(f"No record found with ID {record_id} in {table}")
+            
+            except sqlite3.IntegrityError:
+                print(f"Error: Cannot delete {table} record. It may be referenced by other tables.")
+                print("This could be due to foreign key constraints.")
+            
+            except ValueError:
+                print("Invalid ID. Please enter a valid numeric ID.")
+            
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                print(f"An error occurred while deleting the record: {e}")
+
+
+    def display_record(self, table, filters=None, page_size=DISPLAY_PAGE_SIZE):
+        """
+        Print the records of a table one page at a time
+
+        Args:
+            table (str): Table to display
+            filters (dict): Optional column = value filters
+            page_size (int): Records per page, None streams every record
+        """
+        print(f"\nDisplaying records from {table}")
+
+        try:
+            if table in JOIN_VIEWS:
+                print(f"\nDisplaying joined records from {table}:")
+            headers = self.record_headers(table)
+
+            # Display headers
+            print(" | ".join(headers))
+            print("-" * len(" | ".join(headers)))
+
+            if page_size is None:
+                found = False
+                for record in self.iter_records(table, filters):
+                    found = True
+                    print(" | ".join(str(item) for item in self.format_record(table, record)))
+                if not found:
+                    print("No records found.")
+                return
+
+            # Page through the records by primary key
+            after, before = None, None
+            while True:
+                records, has_more = self.fetch_page(table, page_size, after, before, filters)
+
+                if not records:
+                    print("No records found.")
+                    return
+
+                for record in records:
+                    print(" | ".join(str(item) for item in self.format_record(table, record)))
+
+                has_next = has_more if before is None else True
+                has_prev = after is not None or (before is not None and has_more)
+                if not (has_next or has_prev):
+                    return
+
+                choice = input("Enter n for next page, p for previous page, or press enter to continue: ").lower()
+                if choice == 'n' and has_next:
+                    after, before = self.record_key(table, records[-1]), None
+                elif choice == 'p' and has_prev:
+                    after, before = None, self.record_key(table, records[0])
+                else:
+                    return
+
+        except sqlite3.Error as e:
+            print(f"An error occurred: {e}")
+
+    def format_record(self, table, record):
+        # Record with its epoch date column as text, join views format theirs in SQL
+        if table not in DATE_COLUMNS:
+            return record
+        date_column, date_format = DATE_COLUMNS[table]
+        position = self.record_columns(table).index(date_column)
+        return record[:position] + (format_epoch(record[position], date_format),) + record[position + 1:]
+
+    def record_headers(self, table):
+        # Display headers, column names for plain tables
+        self._check_table(table)
+        if table in JOIN_VIEWS:
+            return JOIN_VIEWS[table][1]
+        return self._table_columns(table)
+
+    def record_columns(self, table):
+        # Column names of the records returned for a table, usable as filters
+        if table not in JOIN_VIEWS:
+            return self._table_columns(table)
+        return list(self._column_metadata()['views'][table])
+
+    def record_key(self, table, record):
+        # Primary key of a record returned by fetch_page or iter_records
+        columns = self.record_columns(table)
+        return tuple(record[columns.index(column)] for column in self._key_columns(table))
+
+    def _select_records(self, table, filters=None, after=None, before=None):
+        # Keyset query over a table or its join view, ordered by primary key
+        self._check_table(table)
+        key_columns = self._key_columns(table)
+        source = JOIN_VIEWS[table][0] if table in JOIN_VIEWS else f"SELECT * FROM {table}"
+
+        conditions, params = [], []
+        if filters:
+            columns = self.record_columns(table)
+            for column, value in filters.items():
+                if column not in columns:
+                    raise ValueError(f"Unknown {table} column: {column}")
+                if table in DATE_COLUMNS and column == DATE_COLUMNS[table][0] and isinstance(value, str):
+                    # A date matches the whole day, a date and time that second
+                    start = to_epoch(value)
+                    conditions.append(f"{column} >= ? AND {column} < ?")
+                    params += [start, start + (86400 if len(value.strip()) <= 10 else 1)]
+                    continue
+                conditions.append(f"{column} = ?")
+                params.append(value)
+
+        keys = ", ".join(key_columns)
+        placeholders = ", ".join("?" for _ in key_columns)
+        for bound, operator in ((after, ">"), (before, "<")):
+            if bound is not None:
+                _, values = self._key_clause(table, bound)
+                conditions.append(f"({keys}) {operator} ({placeholders})")
+                params += values
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = " DESC" if before is not None else ""
+        order_by = ", ".join(f"{column}{direction}" for column in key_columns)
+        return f"SELECT * FROM ({source}) {where} ORDER BY {order_by}", params
+
+    def iter_records(self, table, filters=None, after=None, limit=None, chunk_size=500):
+        """
+        Stream the records of a table in primary key order, chunk_size rows at a time
+
+        Args:
+            table (str): Table to read, junction tables are joined as in display_record
+            filters (dict): Optional column = value filters
+            after (int or tuple): Only records with a greater primary key
+            limit (int): Maximum number of records
+            chunk_size (int): Rows fetched from SQLite per round trip
+
+        Yields:
+            tuple: One record
+        """
+        sql, params = self._select_records(table, filters, after)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        # A cursor of its own, so other queries can run while the caller iterates
+        cursor = self.read_cursor.connection.cursor()
+        try:
+            cursor.execute(sql, params)
+            while True:
+                records = cursor.fetchmany(chunk_size)
+                if not records:
+                    break
+                yield from records
+        finally:
+            cursor.close()
+
+    def fetch_page(self, table, page_size=DISPLAY_PAGE_SIZE, after=None, before=None, filters=None):
+        """
+        Fetch one page of records by keyset pagination
+
+        Pass the record_key of the last record as after for the next page, or
+        of the first record as before for the previous page.
+
+        Returns:
+            tuple: (records, has_more) where has_more tells whether records
+                exist past this page in the direction of travel
+        """
+        sql, params = self._select_records(table, filters, after, before)
+        cursor = self.read_cursor
+        cursor.execute(sql + " LIMIT ?", params + [page_size + 1])
+        records = cursor.fetchall()
+
+        has_more = len(records) > page_size
+        records = records[:page_size]
+        if before is not None:
+            records.reverse()
+        return records, has_more
+
+    def fetch_records(self, table, filters=None, after=None, limit=None):
+        """
+        Fetch the records of a table, joined to readable names for junction tables
+
+        Returns:
+            tuple: (headers, records)
+        """
+        return self.record_headers(table), list(self.iter_records(table, filters, after, limit))
+
+    def export_columns(self, table, joined=False):
+        # Column names of the records export_records yields
+        if joined:
+            return self.record_columns(table)
+        return self._table_columns(table)
+
+    def export_records(self, table, start=None, end=None, after_rowid=0, joined=False, chunk_size=1000):
+        """
+        Stream a fact table in rowid order, for exports and incremental feeds
+
+        Rows are read chunk_size at a time through a cursor of their own, so
+        memory stays flat whatever the table size. The table drives the
+        query (CROSS JOIN keeps SQLite from reordering it), so rows come out
+        in rowid order without a sort. A feed resumes by passing the last
+        rowid it received as after_rowid.
+
+        Args:
+            table (str): One of EXPORT_TABLES
+            start (int or str): Only rows dated at or after this moment
+            end (int or str): Only rows dated before this moment
+            after_rowid (int): Only rows with a greater rowid
+            joined (bool): Junction tables joined to readable names as in display_record
+            chunk_size (int): Rows fetched from SQLite per round trip
+
+        Yields:
+            tuple: (rowid, record) with the record's columns as in export_columns
+                and dates as 'YYYY-MM-DD HH:MM:SS' UTC text
+        """
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Not a fact table: {table}")
+        if joined and table not in JOIN_VIEWS:
+            raise ValueError(f"{table} has no joined view")
+        dated = EXPORT_TABLES[table]
+        date_column = DATE_COLUMNS[dated][0]
+
+        joins = []
+        dates = "t"
+        if dated != table and (joined or start is not None or end is not None):
+            # Line tables are dated by their purchase, movement or sale
+            joins.append(f"CROSS JOIN {dated} d ON d.{dated}_id = t.{dated}_id")
+            dates = "d"
+        if joined:
+            keys = " AND ".join(f"v.{column} = t.{column}" for column in self._key_columns(table))
+            joins.insert(0, f"CROSS JOIN ({JOIN_VIEWS[table][0]}) v ON {keys}")
+            # The views show some dates without the time, exports always carry it
+            select = ", ".join(f"datetime(d.{column}, 'unixepoch') AS {column}" if column == date_column
+                               else f"v.{column}" for column in self.record_columns(table))
+        else:
+            select = ", ".join(f"datetime(t.{column}, 'unixepoch') AS {column}" if column == date_column
+                               else f"t.{column}" for column in self._table_columns(table))
+
+        conditions, params = ["t.rowid > ?"], [after_rowid]
+        if start is not None:
+            conditions.append(f"{dates}.{date_column} >= ?")
+            params.append(to_epoch(start))
+        if end is not None:
+            conditions.append(f"{dates}.{date_column} < ?")
+            params.append(to_epoch(end))
+
+        cursor = self.read_cursor.connection.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT t.rowid, {select} FROM {table} t {' '.join(joins)}
+                WHERE {' AND '.join(conditions)}
+                ORDER BY t.rowid
+            """, params)
+            while True:
+                records = cursor.fetchmany(chunk_size)
+                if not records:
+                    break
+                for record in records:
+                    yield record[0], record[1:]
+        finally:
+            cursor.close()
+
+    def _check_table(self, table):
+        if table not in self.tables:
+            raise ValueError(f"Unknown table: {table}")
+
+    def _column_metadata(self):
+        # Columns of every table and join view, read from the schema once per process
+        metadata = COLUMN_CACHE.get(self.db_name)
+        if metadata is None:
+            cursor = self.read_cursor
+            cursor.execute("""
+                SELECT m.name, c.name FROM sqlite_master m, pragma_table_info(m.name) c
+                WHERE m.type = 'table' ORDER BY m.name, c.cid
+            """)
+            metadata = {'tables': {}, 'views': {}}
+            for table, column in cursor.fetchall():
+                metadata['tables'].setdefault(table, []).append(column)
+            for table, (query, _) in JOIN_VIEWS.items():
+                cursor.execute(f"SELECT * FROM ({query}) LIMIT 0")
+                metadata['views'][table] = [column[0] for column in cursor.description]
+            COLUMN_CACHE[self.db_name] = metadata
+        return metadata
+
+    def _table_columns(self, table):
+        return list(self._column_metadata()['tables'].get(table, []))
+
+    def _key_columns(self, table):
+        return JUNCTION_KEYS.get(table, [f"{table}_id"])
+
+    def _key_clause(self, table, key):
+        # WHERE clause and parameters matching one record by primary key
+        key_columns = self._key_columns(table)
+        key = list(key) if isinstance(key, (list, tuple)) else [key]
+        if len(key) != len(key_columns):
+            raise ValueError(f"{table} is keyed by {', '.join(key_columns)}")
+        return " AND ".join(f"{column} = ?" for column in key_columns), key
+
+    def _check_columns(self, table, values):
+        unknown = set(values) - set(self._table_columns(table))
+        if unknown:
+            raise ValueError(f"Unknown {table} columns: {', '.join(sorted(unknown))}")
+
+    def add_record(self, table, values):
+        """
+        Insert a record from column values and commit, without prompting
+
+        Product purchases, movements and sales go through the matching
+        adjust_inventory_for_* method so the inventory stays consistent.
+
+        Args:
+            table (str): Table to insert into
+            values (dict): Column values of the new record
+
+        Returns:
+            int or AdjustmentResult: Row ID of the new record, or the outcome
+                of the inventory adjustment for product_purchased,
+                movement_product and sales_product
+        """
+        self._check_table(table)
+        self._check_columns(table, values)
+
+        if table in ADJUSTMENT_TABLES:
+            method, parent_key = ADJUSTMENT_TABLES[table]
+            return getattr(self, method)(values["product_id"], values[parent_key], values["quantity"])
+
+        values = dict(values)
+        if table in DATE_COLUMNS:
+            date_column = DATE_COLUMNS[table][0]
+            values[date_column] = to_epoch(values.get(date_column, int(time.time())))
+
+        columns = ", ".join(values)
+        placeholders = ", ".join("?" for _ in values)
+        try:
+            self.cursor.execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", list(values.values()))
+            record_id = self.cursor.lastrowid
+            self._record_ledger_edit({}, self._item_stock(table, "rowid = ?", (record_id,)))
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        self.dimensions.invalidate(table, record_id)
+        return record_id
+
+    def edit_record(self, table, key, values):
+        """
+        Update columns of one record and commit, without prompting
+
+        Args:
+            table (str): Table to update
+            key (int or tuple): Primary key, (product_id, other_id) for junction tables
+            values (dict): Columns to change
+
+        Returns:
+            int: Number of records updated
+        """
+        self._check_table(table)
+        self._check_columns(table, values)
+        if not values:
+            return 0
+
+        if table in DATE_COLUMNS and DATE_COLUMNS[table][0] in values:
+            date_column = DATE_COLUMNS[table][0]
+            values = dict(values, **{date_column: to_epoch(values[date_column])})
+
+        where, params = self._key_clause(table, key)
+        new_params = [values.get(column, value) for column, value in zip(self._key_columns(table), params)]
+        set_clause = ", ".join(f"{column} = ?" for column in values)
+        sales_ids = self._affected_sales(table, where, params, values)
+        try:
+            # Take the sales out of sales_daily as they were and add them back as they are now
+            for sales_id, lines in self._sale_lines(sales_ids).items():
+                self._update_sales_daily(sales_id, lines, -1)
+            stock = self._item_stock(table, where, params)
+            self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {where}", list(values.values()) + params)
+            updated = self.cursor.rowcount
+            self._record_ledger_edit(stock, self._item_stock(table, where, new_params))
+            for sales_id, lines in self._sale_lines(sales_ids).items():
+                self._update_sales_daily(sales_id, lines)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        self.dimensions.invalidate(table, params[0])
+        return updated
+
+    def remove_record(self, table, key):
+        """
+        Delete one record and commit, without prompting
+
+        Args:
+            table (str): Table to delete from
+            key (int or tuple): Primary key, (product_id, other_id) for junction tables
+
+        Returns:
+            int: Number of records deleted
+
+        Raises:
+            sqlite3.IntegrityError: If other records still reference it
+        """
+        self._check_table(table)
+        where, params = self._key_clause(table, key)
+
+        if table not in JUNCTION_KEYS:
+            blockers = [ref for ref in self.preview_delete(table, params[0]) if ref[3] != 'CASCADE']
+            if blockers:
+                references = ", ".join(f"{row_count} {child_table}" for child_table, _, row_count, _ in blockers)
+                raise sqlite3.IntegrityError(f"{table} {params[0]} is referenced by {references}")
+
+        try:
+            stock = self._item_stock(table, where, params)
+            self.cursor.execute(f"DELETE FROM {table} WHERE {where} RETURNING *", params)
+            deleted = self.cursor.fetchall()
+            self._record_ledger_edit(stock, {})
+            if table == 'sales_product':
+                for product_id, sales_id, quantity in deleted:
+                    self._update_sales_daily(sales_id, [(product_id, quantity)], -1)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        self.dimensions.invalidate(table, params[0])
+        return len(deleted)
+
+    def _affected_sales(self, table, where, params, values):
+        # IDs of the sales whose sales_daily rows an edit of this record can change
+        if table not in ('sales', 'sales_product'):
+            return []
+        self.cursor.execute(f"SELECT sales_id FROM {table} WHERE {where}", params)
+        sales_ids = {row[0] for row in self.cursor.fetchall()}
+        if 'sales_id' in values:
+            sales_ids.add(values['sales_id'])
+        return sorted(sales_ids)
+
+    def _sale_lines(self, sales_ids):
+        # (product_id, quantity) lines of each sale, as sales_id -> list
+        lines = {}
+        if sales_ids:
+            self.cursor.execute("""
+                SELECT sales_id, product_id, quantity FROM sales_product
+                WHERE sales_id IN (SELECT value FROM json_each(?))
+            """, (json.dumps(sales_ids),))
+            for sales_id, product_id, quantity in self.cursor.fetchall():
+                lines.setdefault(sales_id, []).append((product_id, quantity))
+        return lines
+
+
+class WriteQueue:
+    """
+    Background writer that group-commits inventory operations
+
+    Producers on any thread call submit() and get a Future back. A single
+    writer thread drains the queue and runs the operations in one transaction
+    per max_batch operations or max_delay_ms, whichever comes first. Every
+    operation runs inside its own savepoint, so a failing one is rolled back
+    without affecting the rest of the batch. Futures resolve after the commit
+    with the operation's AdjustmentResult, falsy if it was rejected (for
+    example not enough stock, or 'conflict' on a constraint violation as
+    with the direct API), or with any other exception it raised. Only a
+    failure of the transaction itself fails the whole batch.
+    """
+
+    OPERATIONS = {
+        'purchase': '_adjust_inventory_for_product_purchased',
+        'movement': '_adjust_inventory_for_movement',
+        'sales': '_adjust_inventory_for_sales',
+        'basket': '_adjust_inventory_for_basket',
+    }
+
+    def __init__(self, inventory, max_batch=100, max_delay_ms=5):
+        if inventory.pool is None:
+            raise ValueError("WriteQueue needs an InventoryManagement created with pooled=True")
+        self.inventory = inventory
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.stats = {'batches': 0, 'operations': 0, 'failed': 0}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation, *args):
+        """
+        Queue an operation for the writer thread
+
+        Args:
+            operation (str): 'purchase', 'movement', 'sales' or 'basket'
+            *args: Arguments of the matching adjust_inventory_for_* method
+
+        Returns:
+            Future: Resolved with the outcome once the batch is committed
+        """
+        if operation not in self.OPERATIONS:
+            raise ValueError(f"Unknown operation: {operation}")
+        future = Future()
+        self._queue.put((operation, args, future))
+        return future
+
+    def close(self):
+        # Flush everything already queued, then stop the writer thread
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+
+    @staticmethod
+    def _retry_locked(step, *args):
+        # Run step, retried up to ADJUSTMENT_ATTEMPTS times with a jittered delay while the database is locked
+        for attempt in range(1, ADJUSTMENT_ATTEMPTS + 1):
+            try:
+                return step(*args)
+            except sqlite3.OperationalError as e:
+                if not is_locked_error(e) or attempt == ADJUSTMENT_ATTEMPTS:
+                    raise
+                time.sleep(random.uniform(0, ADJUSTMENT_RETRY_DELAY * 2 ** attempt))
+
+    def _commit_batch(self, batch):
+        conn = self.inventory.conn
+        cursor = self.inventory.cursor
+        outcomes = []
+
+        try:
+            # Take the write lock up front, as _run_adjustment does, and retry like it while locked
+            self._retry_locked(cursor.execute, "BEGIN IMMEDIATE")
+            for operation, args, future in batch:
+                cursor.execute("SAVEPOINT operation")
+                try:
+                    outcome = getattr(self.inventory, self.OPERATIONS[operation])(*args)
+                except sqlite3.IntegrityError as e:
+                    # The same result as the direct API gives, see _run_adjustment
+                    outcome = AdjustmentResult.failure('conflict', f"An error occurred during {operation}: {e}")
+                except Exception as e:
+                    # A bad operation (say a malformed line) only fails its own future
+                    outcome = e
+                if isinstance(outcome, Exception) or not outcome:
+                    cursor.execute("ROLLBACK TO operation")
+                cursor.execute("RELEASE operation")
+                outcomes.append((future, outcome))
+            # A failed COMMIT leaves the transaction open, so it can be retried as is
+            self._retry_locked(conn.commit)
+
+        except sqlite3.Error as e:
+            conn.rollback()
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.stats['batches'] += 1
+        self.stats['operations'] += len(batch)
+        for future, outcome in outcomes:
+            if isinstance(outcome, Exception):
+                self.stats['failed'] += 1
+                future.set_exception(outcome)
+            else:
+                self.stats['failed'] += not outcome
+                future.set_result(outcome)
+        # Only once every future is resolved, so nothing here can leave one waiting
+        self.inventory._checkpoint_if_due()
+
+
+class BackupScheduler:
+    """
+    Periodic backups of a database into a directory, with retention
+
+    A background thread calls InventoryManagement.backup every interval
+    seconds, writing '<db>-YYYYMMDD-HHMMSS.db' (UTC), and then deletes all
+    but the newest keep backups. The backup opens connections of its own,
+    so the scheduler works next to the CLI, the service or a WriteQueue.
+    """
+
+    def __init__(self, inventory, directory, interval=3600, keep=24, pages=1024, sleep=0.01):
+        self.inventory = inventory
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.pages = pages
+        self.sleep = sleep
+        self.prefix = os.path.splitext(os.path.basename(inventory.db_name))[0] + "-"
+        self.stats = {'backups': 0, 'failed': 0, 'removed': 0, 'last': None, 'last_error': None}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def backups(self):
+        # Existing backup files, oldest first (the timestamped names sort in time order)
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                      if name.startswith(self.prefix) and name.endswith(".db")
+                      and name[len(self.prefix):-3].replace("-", "").isdigit())
+
+    def run_once(self, progress=None):
+        """
+        Take one backup now and apply the retention
+
+        Returns:
+            dict: The backup's statistics, see InventoryManagement.backup
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d-%H%M%S")
+        result = self.inventory.backup(os.path.join(self.directory, f"{self.prefix}{stamp}.db"),
+                                       self.pages, self.sleep, progress)
+        self.stats['backups'] += 1
+        self.stats['last'] = result
+
+        for path in self.backups()[:-self.keep] if self.keep > 0 else []:
+            os.remove(path)
+            self.stats['removed'] += 1
+        return result
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        # Stop after the backup in progress, if any
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except (sqlite3.Error, OSError) as e:
+                self.stats['failed'] += 1
+                self.stats['last_error'] = str(e)
+
+
+class ShardRouter:
+    """
+    Regional shards of the inventory database behind the InventoryManagement API
+
+    Each region is a group of warehouses and locations with its own database
+    file, so regions never wait on each other's write lock. The catalogue
+    (SHARD_CATALOGUE_TABLES) is copied to every shard, and everything that
+    belongs to a warehouse or location lives only in its region's shard.
+    Shard n numbers its purchases, movements, sales and inventories from
+    n << SHARD_ID_BITS, so any of those IDs names the shard that holds it.
+
+    The router offers the InventoryManagement methods the service and the
+    reports use. Writes and single-owner reads go to the owning shard, reads
+    across regions run on every shard in parallel and are merged. Writes to
+    the catalogue are repeated on each shard, one transaction per shard.
+
+    The shard map, usually loaded with load_shard_map, looks like:
+        {"east": {"db_name": "inventory-east.db", "shard": 0, "warehouses": [1, 2], "locations": [1, 2, 3]},
+         "west": {"db_name": "inventory-west.db", "shard": 1, "warehouses": [3], "locations": [4, 5]}}
+    """
+
+    def __init__(self, shard_map, busy_timeout=5000, instrument=False):
+        self.shards = {}
+        self.numbers = {}
+        self.regions = {}
+        self.owners = {}
+        for region, shard in shard_map.items():
+            number = shard['shard']
+            if number in self.regions:
+                raise ValueError(f"Regions {self.regions[number]} and {region} are both shard {number}")
+            self.numbers[region], self.regions[number] = number, region
+            for scope in INVENTORY_SCOPES:
+                for owner_id in shard[f'{scope}s']:
+                    if (scope, owner_id) in self.owners:
+                        raise ValueError(f"{scope} {owner_id} is in regions {self.owners[scope, owner_id]} and {region}")
+                    self.owners[scope, owner_id] = region
+            self.shards[region] = InventoryManagement(shard['db_name'], pooled=True, busy_timeout=busy_timeout,
+                                                      instrument=instrument)
+
+        self.catalogue = next(iter(self.shards.values()))
+        self.tables = self.catalogue.tables
+        self.executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+
+    def close(self):
+        self.executor.shutdown()
+        for shard in self.shards.values():
+            shard.close()
+
+    def region_of(self, scope, owner_id):
+        if (scope, owner_id) not in self.owners:
+            raise ValueError(f"{scope} {owner_id} is not in any region")
+        return self.owners[scope, owner_id]
+
+    def region_of_id(self, record_id):
+        # Region holding a purchase, movement, sale or inventory by its ID, None if no shard has that number
+        return self.regions.get(record_id >> SHARD_ID_BITS)
+
+    def fan_out(self, method, *args):
+        """
+        Run an InventoryManagement method on every shard in parallel
+
+        Returns:
+            dict: region -> result, in shard map order
+        """
+        futures = {region: self.executor.submit(getattr(shard, method), *args)
+                   for region, shard in self.shards.items()}
+        return {region: future.result() for region, future in futures.items()}
+
+    def _region_of_record(self, table, values):
+        # Region of a record of a table outside the catalogue, from its owner column or its ID
+        if table in SHARD_OWNERS and SHARD_OWNERS[table][1] in values:
+            scope, owner_key = SHARD_OWNERS[table]
+            return self.region_of(scope, values[owner_key])
+        id_column = SHARD_ID_COLUMNS[table]
+        region = self.region_of_id(values[id_column]) if values.get(id_column) is not None else None
+        if region is None:
+            raise ValueError(f"No shard holds {id_column} {values.get(id_column)}")
+        return region
+
+    def _region_of_key(self, table, key):
+        key = list(key) if isinstance(key, (list, tuple)) else [key]
+        return self._region_of_record(table, dict(zip(self.catalogue._key_columns(table), key)))
+
+    # Inventory adjustments, on the shard that holds the purchase, movement or sale
+
+    def _adjust(self, method, record_id, *args):
+        region = self.region_of_id(record_id)
+        if region is None:
+            return AdjustmentResult.failure('not_found', f"No shard holds ID {record_id}")
+        return getattr(self.shards[region], method)(*args)
+
+    def adjust_inventory_for_product_purchased(self, product_id, purchase_id, quantity):
+        return self._adjust('adjust_inventory_for_product_purchased', purchase_id, product_id, purchase_id, quantity)
+
+    def adjust_inventory_for_movement(self, product_id, movement_id, quantity, policy='largest'):
+        region = self.region_of_id(movement_id)
+        if region is not None:
+            # Movements made before the split may still point at a location of another region
+            shard = self.shards[region]
+            shard.read_cursor.execute("SELECT location_id FROM movement WHERE movement_id = ?", (movement_id,))
+            row = shard.read_cursor.fetchone()
+            if row and self.owners.get(('location', row[0])) != region:
+                return AdjustmentResult.failure(
+                    'cross_shard', f"Movement {movement_id} goes to location {row[0]}, outside region {region}")
+        return self._adjust('adjust_inventory_for_movement', movement_id, product_id, movement_id, quantity, policy)
+
+    def adjust_inventory_for_sales(self, product_id, sales_id, quantity, policy='largest'):
+        return self._adjust('adjust_inventory_for_sales', sales_id, product_id, sales_id, quantity, policy)
+
+    def adjust_inventory_for_basket(self, sales_id, lines, policy='largest'):
+        return self._adjust('adjust_inventory_for_basket', sales_id, sales_id, lines, policy)
+
+    # Records
+
+    def record_headers(self, table):
+        return self.catalogue.record_headers(table)
+
+    def record_columns(self, table):
+        return self.catalogue.record_columns(table)
+
+    def record_key(self, table, record):
+        return self.catalogue.record_key(table, record)
+
+    def add_record(self, table, values):
+        """
+        Insert a record on the shards it belongs to, see InventoryManagement.add_record
+
+        Raises:
+            ValueError: If the record's warehouse or location is in no region,
+                or a movement goes from one region to another
+        """
+        self.catalogue._check_table(table)
+        if table in ADJUSTMENT_TABLES:
+            method, parent_key = ADJUSTMENT_TABLES[table]
+            return getattr(self, method)(values["product_id"], values[parent_key], values["quantity"])
+
+        if table in SHARD_CATALOGUE_TABLES:
+            # The first shard picks the ID, the others are given it
+            key_column = self.catalogue._key_columns(table)[0]
+            record_id = self.catalogue.add_record(table, values)
+            for shard in list(self.shards.values())[1:]:
+                shard.add_record(table, dict(values, **{key_column: record_id}))
+            return record_id
+
+        region = self._region_of_record(table, values)
+        if table == 'movement':
+            destination = self.region_of('location', values['location_id'])
+            if destination != region:
+                raise ValueError(f"Movement from warehouse {values['warehouse_id']} ({region}) to location "
+                                 f"{values['location_id']} ({destination}) crosses regions")
+
+        shard, values = self.shards[region], dict(values)
+        if table in SHARD_OWNERS:
+            id_column, base = SHARD_ID_COLUMNS[table], self.numbers[region] << SHARD_ID_BITS
+            if values.get(id_column) is not None and self.region_of_id(values[id_column]) != region:
+                raise ValueError(f"{id_column} {values[id_column]} is outside the IDs of region {region}")
+            if values.get(id_column) is None and base:
+                # SQLite numbers new rows after the largest ID, so only a shard's first row needs one
+                shard.read_cursor.execute(f"SELECT MAX({id_column}) FROM {table} WHERE {id_column} >= ?", (base,))
+                if shard.read_cursor.fetchone()[0] is None:
+                    values[id_column] = base + 1
+        return shard.add_record(table, values)
+
+    def edit_record(self, table, key, values):
+        # See InventoryManagement.edit_record, a record cannot be moved to another region
+        if table in SHARD_CATALOGUE_TABLES:
+            return [shard.edit_record(table, key, values) for shard in self.shards.values()][0]
+        region = self._region_of_key(table, key)
+        if table in SHARD_OWNERS and SHARD_OWNERS[table][1] in values:
+            if self._region_of_record(table, values) != region:
+                raise ValueError(f"{table} {key} cannot move out of region {region}")
+        return self.shards[region].edit_record(table, key, values)
+
+    def remove_record(self, table, key):
+        # See InventoryManagement.remove_record, catalogue records are checked on every shard first
+        if table not in SHARD_CATALOGUE_TABLES:
+            return self.shards[self._region_of_key(table, key)].remove_record(table, key)
+
+        for region, references in self.fan_out('preview_delete', table, key).items():
+            blockers = [ref for ref in references if ref[3] != 'CASCADE']
+            if blockers:
+                found = ", ".join(f"{row_count} {child_table}" for child_table, _, row_count, _ in blockers)
+                raise sqlite3.IntegrityError(f"{table} {key} is referenced by {found} in region {region}")
+        return [shard.remove_record(table, key) for shard in self.shards.values()][0]
 
-        elif table == 'nutrition':
+    def fetch_page(self, table, page_size=DISPLAY_PAGE_SIZE, after=None, before=None, filters=None):
+        # See InventoryManagement.fetch_page, the shards' pages are merged in key order
+        if table in SHARD_CATALOGUE_TABLES:
+            return self.catalogue.fetch_page(table, page_size, after, before, filters)
+        pages = self.fan_out('fetch_page', table, page_size, after, before, filters).values()
 
-            fields = ['shelf_life', 'serving', 'calories', 'protein', 'fat', 'sugar', 'carbs']
-            updates = {}
-            
-            for field in fields:
-                value = input(f"Enter new {field}: ")
-                if value:
-                    updates[field] = value
-            
-            if updates:
-                set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
-                values = list(updates.values()) + [record_id]
-                self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
+        records = sorted((record for page, _ in pages for record in page),
+                         key=lambda record: self.record_key(table, record), reverse=before is not None)
+        has_more = len(records) > page_size or any(more for _, more in pages)
+        records = records[:page_size]
+        if before is not None:
+            records.reverse()
+        return records, has_more
 
-        elif table == 'warehouse':
-            
-            fields = ['name', 'address']
-            updates = {}
-            
-            for field in fields:
-                value = input(f"Enter new {field}: ")
-                if value:
-                    updates[field] = value
-            
-            if updates:
-                set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
-                values = list(updates.values()) + [record_id]
-                self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
+    def iter_records(self, table, filters=None, after=None, limit=None, chunk_size=500):
+        # See InventoryManagement.iter_records, the shards' streams are merged in key order
+        if table in SHARD_CATALOGUE_TABLES:
+            yield from self.catalogue.iter_records(table, filters, after, limit, chunk_size)
+            return
+        streams = [shard.iter_records(table, filters, after, limit, chunk_size) for shard in self.shards.values()]
+        merged = heapq.merge(*streams, key=lambda record: self.record_key(table, record))
+        yield from itertools.islice(merged, limit)
 
-        elif table == 'user':
-            
-            fields = ['name', 'email', 'type', 'address', 'phone_number']
-            updates = {}
-            
-            for field in fields:
-                value = input(f"Enter new {field}: ")
-                if value:
-                    updates[field] = value
-            
-            if updates:
-                set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
-                values = list(updates.values()) + [record_id]
-                self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
+    def fetch_records(self, table, filters=None, after=None, limit=None):
+        return self.record_headers(table), list(self.iter_records(table, filters, after, limit))
 
-        elif table == 'location':
-            
-            fields = ['name', 'type', 'address', 'ip_address']
-            updates = {}
-            
-            for field in fields:
-                value = input(f"Enter new {field}: ")
-                if value:
-                    updates[field] = value
-            
-            if updates:
-                set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
-                values = list(updates.values()) + [record_id]
-                self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
+    # Stock and reports
 
-        elif table == "location_product":
-            quantity = input("Enter quantity update: ")
-            
-            # if quantity:
-            #     self.cursor.execute(f"UPDATE {table} SET quantity = ? WHERE location_inventory_id = ? AND product_id = ?", (quantity, record_id1, record_id2))
+    def stock_levels(self, scope, owner_id):
+        return self.shards[self.region_of(scope, owner_id)].stock_levels(scope, owner_id)
 
-            if quantity:
-                self.cursor.execute(
-                    "SELECT * FROM location_product WHERE location_inventory_id = ? AND product_id = ?", 
-                    (record_id2, record_id1)
-                )
-                if self.cursor.fetchone():
-                    self.cursor.execute(
-                        f"UPDATE {table} SET quantity = ? WHERE location_inventory_id = ? AND product_id = ?", 
-                        (quantity, record_id2, record_id1)
-                    )
-                    print("Quantity updated successfully.")
-                else:
-                    print("No matching record found for the given location_inventory_id and product_id.")
+    def stock_as_of(self, moment, scope, owner_id):
+        return self.shards[self.region_of(scope, owner_id)].stock_as_of(moment, scope, owner_id)
 
-        elif table == "warehouse_product":
-            quantity = input("Enter quantity update: ")
-            
-            if quantity:
-                self.cursor.execute(f"UPDATE {table} SET quantity = ? WHERE warehouse_inventory_id = ? AND product_id = ?", (quantity, record_id2, record_id1))
-        
-        # else:
-        #     # Dynamically handle updates for other tables
-        #     columns = [desc[0] for desc in self.cursor.execute(f"PRAGMA table_info({table})") if desc[0] != id_column]
-            
-        #     updates = {}
-        #     for column in columns:
-        #         value = input(f"Enter new {column} (press enter to skip): ")
-        #         if value:
-        #             updates[column] = value
-            
-        #     if updates:
-        #         set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
-        #         values = list(updates.values()) + [record_id]
-        #         self.cursor.execute(f"UPDATE {table} SET {set_clause} WHERE {id_column} = ?", values)
-        self.display_record(table)
-        self.conn.commit()
-        print("Record updated successfully!")
+    def set_reorder_point(self, scope, owner_id, product_id, reorder_point, target=None):
+        self.shards[self.region_of(scope, owner_id)].set_reorder_point(scope, owner_id, product_id, reorder_point,
+                                                                       target)
 
-    def delete_record(self, table):
-        print(f"\nDeleting record from {table}")
-        dict_ids = {"product_purchased":["product_id", "purchase_id"], "warehouse_product":["product_id", "warehouse_inventory_id"], 
-        "movement_product":["product_id", "movement_id"], "location_product":["product_id", "location_inventory_id"], 
-        "sales_product":["product_id", "sales_id"]}
-        if table == "product_purchased" or table == "warehouse_product" or table == 'movement_product' or table == 'location_product' or table == 'sales_product':
-            id_column = dict_ids[table]
-            
+    def plan_replenishment(self, location_ids=None):
+        # Every region refills its locations from its own warehouses
+        plans = self.fan_out('plan_replenishment', location_ids).values()
+        return sorted(row for plan in plans for row in plan)
+
+    def replenish(self, location_ids=None, policy='largest'):
+        # One transaction per region, returns region -> AdjustmentResult
+        return self.fan_out('replenish', location_ids, policy)
+
+    def low_stock(self, scope=None, owner_id=None):
+        # Open alerts as in InventoryManagement.low_stock, alert IDs are only unique within a region
+        if owner_id is not None:
+            return self.shards[self.region_of(scope, owner_id)].low_stock(scope, owner_id)
+        alerts = [alert for found in self.fan_out('low_stock', scope).values() for alert in found]
+        return sorted(alerts, key=lambda alert: alert[1:4])
+
+    def top_products(self, location_id, start_day, end_day, limit=10):
+        return self.shards[self.region_of('location', location_id)].top_products(location_id, start_day, end_day, limit)
+
+    def weekly_sales(self, start_day, end_day, location_id=None):
+        if location_id is not None:
+            return self.shards[self.region_of('location', location_id)].weekly_sales(start_day, end_day, location_id)
+        weeks = {}
+        for rows in self.fan_out('weekly_sales', start_day, end_day).values():
+            for week, units, cost_value in rows:
+                total = weeks.setdefault(week, [0, 0.0])
+                total[0] += units
+                total[1] += cost_value
+        return [(week, units, round(cost_value, 2)) for week, (units, cost_value) in sorted(weeks.items())]
+
+    def compare_locations(self, start_day, end_day):
+        # Shares are recomputed over every region
+        rows = [row for found in self.fan_out('compare_locations', start_day, end_day).values() for row in found]
+        total = sum(row[3] for row in rows)
+        return sorted([row[:4] + (round(100.0 * row[3] / total, 1) if total else None,) for row in rows],
+                      key=lambda row: row[3], reverse=True)
+
+    def iter_sales(self, start_day, end_day, location_id=None):
+        if location_id is not None:
+            yield from self.shards[self.region_of('location', location_id)].iter_sales(start_day, end_day, location_id)
+            return
+        streams = [shard.iter_sales(start_day, end_day) for shard in self.shards.values()]
+        yield from heapq.merge(*streams, key=lambda row: (row[3], row[0], row[4]))
+
+    def pool_stats(self):
+        return {region: shard.pool_stats() for region, shard in self.shards.items()}
+
+    def dimension_stats(self):
+        return {region: shard.dimension_stats() for region, shard in self.shards.items()}
+
+    def query_report(self):
+        reports = {region: shard.query_report() for region, shard in self.shards.items()}
+        return reports if any(reports.values()) else None
+
+
+def load_shard_map(path):
+    # Shard map of ShardRouter from a JSON file, database paths are relative to the file
+    with open(path) as f:
+        shard_map = json.load(f)
+    directory = os.path.dirname(os.path.abspath(path))
+    for shard in shard_map.values():
+        shard['db_name'] = os.path.join(directory, shard['db_name'])
+    return shard_map
+
+
+def split_database(source_db, shard_map):
+    """
+    Create the shard databases of a shard map from one inventory database
+
+    Every shard gets the whole catalogue, the reorder points of its own
+    warehouses and locations, and the purchases, movements, sales and
+    inventories that belong to them, renumbered into the shard's IDs.
+    Stock rollups, alerts and sales_daily are rebuilt on each shard.
+    Archived sales stay with the source database. The source is first
+    brought up to SCHEMA_VERSION, the version the shards are created at.
+    If the split fails, the shard files created so far are removed.
+
+    Raises:
+        ValueError: If a shard file already exists, or a warehouse or
+            location of the source is in no region
+    """
+    for shard in shard_map.values():
+        if os.path.exists(shard['db_name']):
+            raise ValueError(f"{shard['db_name']} already exists")
+
+    source = InventoryManagement(source_db)
+    try:
+        for scope, (_, _, _, owner_key) in INVENTORY_SCOPES.items():
+            assigned = {owner_id for region, shard in shard_map.items() for owner_id in shard[f'{scope}s']}
+            source.read_cursor.execute(f"SELECT {owner_key} FROM {scope}")
+            for owner_id, in source.read_cursor.fetchall():
+                if owner_id not in assigned:
+                    raise ValueError(f"{scope} {owner_id} is not in any region")
+    finally:
+        source.close()
+
+    # Which tables hold the IDs a child table refers to, to select a region's children
+    id_parents = {SHARD_ID_COLUMNS[table]: table for table in SHARD_OWNERS}
+    created = []
+    try:
+        for region, shard in shard_map.items():
+            created.append(shard['db_name'])
+            inventory = InventoryManagement(shard['db_name'])
+            base = shard['shard'] << SHARD_ID_BITS
+            owners = {scope: json.dumps(shard[f'{scope}s']) for scope in INVENTORY_SCOPES}
+            cursor = inventory.cursor
             try:
-                # Get the record ID to delete
-                self.display_record(table)
-                record_id1 = int(input(f"Enter {table} {id_column[0]} to delete: "))
-                record_id2 = int(input(f"Enter {table} {id_column[1]} ID to delete: "))
-                
-                # First, check if the record exists
-                self.cursor.execute(f"SELECT * FROM {table} WHERE {id_column[0]} = ? AND {id_column[1]} = ?", (record_id1, record_id2))
-                existing_record = self.cursor.fetchone()
-                
-                if not existing_record:
-                    print(f"No {table} record found with IDs {record_id1} and {record_id2}")
-                    return
-                
-                # Confirm deletion
-                confirm = input(f"Are you sure you want to delete {table} record with IDs {record_id1} and {record_id2}? (yes/no): ").lower()
-                
-                if confirm != 'yes':
-                    print("Deletion cancelled.")
-                    return
-                
-                # Attempt to delete the record
-                self.cursor.execute(f"DELETE FROM {table} WHERE {id_column[0]} = ? AND {id_column[1]} = ?", (record_id1, record_id2))
-                
-                # Check if any rows were actually deleted
-                if self.cursor.rowcount > 0:
-                    self.conn.commit()
-                    print(f"Successfully deleted record with IDs {record_id1} and {record_id2} from {table}")
-                    self.display_record(table)
-                else:
-                    print(f"No record found with IDs {record_id1} and {record_id2} in {table}")
-            
-            except sqlite3.IntegrityError:
-                print(f"Error: Cannot delete {table} record. It may be referenced by other tables.")
-                print("This could be due to foreign key constraints.")
-            
-            except ValueError:
-                print("Invalid ID. Please enter a valid numeric ID.")
-            
-            except sqlite3.Error as e:
-                self.conn.rollback()
-                print(f"An error occurred while deleting the record: {e}")
+                cursor.execute("PRAGMA foreign_keys = OFF")
+                cursor.execute("ATTACH DATABASE ? AS source", (source_db,))
+                tables = SHARD_CATALOGUE_TABLES + list(SHARD_OWNERS) + [table for table in SHARD_ID_COLUMNS
+                                                                        if table not in SHARD_OWNERS]
+                for table in tables:
+                    columns = inventory._table_columns(table)
+                    select = [f"{column} + {base}" if column == SHARD_ID_COLUMNS.get(table) else column
+                              for column in columns]
+                    where, params = "", []
+                    if table in SHARD_OWNERS:
+                        scope, owner_key = SHARD_OWNERS[table]
+                        where, params = f"WHERE {owner_key} IN (SELECT value FROM json_each(?))", [owners[scope]]
+                    elif table in SHARD_ID_COLUMNS:
+                        id_column = SHARD_ID_COLUMNS[table]
+                        parent = id_parents[id_column]
+                        scope, owner_key = SHARD_OWNERS[parent]
+                        where = f"""WHERE {id_column} IN (SELECT {id_column} FROM source.{parent}
+                                    WHERE {owner_key} IN (SELECT value FROM json_each(?)))"""
+                        params = [owners[scope]]
+                    cursor.execute(f"INSERT INTO {table} ({', '.join(columns)}) "
+                                   f"SELECT {', '.join(select)} FROM source.{table} {where}", params)
+
+                for scope, reorder_table in REORDER_POINTS.items():
+                    owner_key = INVENTORY_SCOPES[scope][3]
+                    cursor.execute(f"""INSERT INTO {reorder_table} SELECT * FROM source.{reorder_table}
+                                       WHERE {owner_key} IN (SELECT value FROM json_each(?))""", (owners[scope],))
+                inventory.conn.commit()
+                cursor.execute("DETACH DATABASE source")
 
+                cursor.execute("PRAGMA foreign_keys = ON")
+                cursor.execute("PRAGMA foreign_key_check")
+                violation = cursor.fetchone()
+                if violation:
+                    raise sqlite3.IntegrityError(f"Shard {region} has a broken foreign key: {violation}")
+                inventory.rebuild_stock_rollups(commit=False)
+                inventory.rebuild_sales_daily(commit=False)
+                inventory.seed_inventory_ledger(commit=False)
+                inventory.conn.commit()
+                cursor.execute("ANALYZE")
+            finally:
+                inventory.close()
+    except Exception:
+        # Leave no half-built shards behind, they would block the next run
+        for path in created:
+            for suffix in ("", "-journal", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        raise
+
+
+def tools_menu(inventory_system):
+    print("\nSelect Tool:")
+    tools = ['Show stock levels of a warehouse or location', 'Rebuild stock rollups',
+             'Show query statistics', 'Save query statistics as JSON',
+             'Top selling products of a location', 'Weekly sales trend', 'Compare locations',
+             'Rebuild daily sales aggregate', 'Set a reorder point', 'Show low stock alerts',
+             'Archive old sales', 'Show sales including archives', 'Back up the database',
+             'Replenish locations from warehouses', 'Checkpoint the inventory ledger',
+             'Verify the inventory ledger against stock', 'Show stock as of a date']
+    for i, tool in enumerate(tools, 1):
+        print(f"{i}. {tool}")
+    tool_choice = input("Enter tool number: ")
+
+    if tool_choice == '1':
+        scope = input("Enter warehouse or location: ").strip().lower()
+        if scope not in INVENTORY_SCOPES:
+            print("Invalid choice. Please enter warehouse or location.")
+            return
+        owner_id = int(input(f"Enter {scope} ID: "))
+        levels = inventory_system.stock_levels(scope, owner_id)
+        print("Product ID | Quantity")
+        print("---------------------")
+        if not levels:
+            print("No records found.")
+        for product_id, quantity in levels:
+            print(f"{product_id} | {quantity}")
+
+    elif tool_choice == '2':
+        inventory_system.rebuild_stock_rollups()
+        print("Stock rollups rebuilt.")
+
+    elif tool_choice == '3':
+        inventory_system.print_query_stats()
+
+    elif tool_choice == '4':
+        path = input("Enter file name (press enter for query-stats.json): ") or "query-stats.json"
+        inventory_system.dump_query_stats(path)
+        print(f"Query statistics saved to {path}")
+
+    elif tool_choice in ['5', '6', '7']:
+        location_id = None
+        if tool_choice == '5':
+            location_id = int(input("Enter location ID: "))
+        elif tool_choice == '6':
+            location_id = input("Enter location ID (press enter for all locations): ")
+            location_id = int(location_id) if location_id else None
+        start_day = input("Enter start date (YYYY-MM-DD): ")
+        end_day = input("Enter end date (YYYY-MM-DD): ")
+
+        if tool_choice == '5':
+            limit = int(input("Enter number of products (press enter for 10): ") or 10)
+            headers = ["Product ID", "Product Name", "Units", "Cost Value"]
+            rows = inventory_system.top_products(location_id, start_day, end_day, limit)
+        elif tool_choice == '6':
+            headers = ["Week Starting", "Units", "Cost Value"]
+            rows = inventory_system.weekly_sales(start_day, end_day, location_id)
         else:
-        
-            
-            id_column = f"{table}_id"
-            
-            try:
-                self.display_record(table)
-                # Get the record ID to delete
-                record_id = int(input(f"Enter {table} ID to delete: "))
-                
-                # First, check if the record exists
-                self.cursor.execute(f"SELECT * FROM {table} WHERE {id_column} = ?", (record_id,))
-                existing_record = self.cursor.fetchone()
-                
-                if not existing_record:
-                    print(f"No {table} record found with ID {record_id}")
-                    return
-                
-                # Confirm deletion
-                confirm = input(f"Are you sure you want to delete {table} record with ID {record_id}? (yes/no): ").lower()
-                
-                if confirm != 'yes':
-                    print("Deletion cancelled.")
-                    return
-                
-                # Attempt to delete the record
-                self.cursor.execute(f"DELETE FROM {table} WHERE {id_column} = ?", (record_id,))
-                
-                # Check if any rows were actually deleted
-                if self.cursor.rowcount > 0:
-                    self.conn.commit()
-                    print(f"Successfully deleted record with ID {record_id} from {table}")
-                    self.display_record(table)
-                else:
-                    print(f"No record found with ID {record_id} in {table}")
-            
-            except sqlite3.IntegrityError:
-                print(f"Error: Cannot delete {table} record. It may be referenced by other tables.")
-                print("This could be due to foreign key constraints.")
-            
-            except ValueError:
-                print("Invalid ID. Please enter a valid numeric ID.")
-            
-            except sqlite3.Error as e:
-                self.conn.rollback()
-                print(f"An error occurred while deleting the record: {e}")
+            headers = ["Location ID", "Location Name", "Units", "Cost Value", "Share %"]
+            rows = inventory_system.compare_locations(start_day, end_day)
 
+        print(" | ".join(headers))
+        print("-" * len(" | ".join(headers)))
+        if not rows:
+            print("No records found.")
+        for row in rows:
+            print(" | ".join(str(item) for item in row))
 
-    def display_record(self, table):
-        print(f"\nDisplaying records from {table}")
+    elif tool_choice == '8':
+        inventory_system.rebuild_sales_daily()
+        print("Daily sales aggregate rebuilt.")
 
-        if table == "product_purchased":
-            try:
-                # Step 2: Fetch and display joined records
-                print("\nDisplaying joined records from product_purchased:")
-                display_query = '''
-                SELECT 
-                    pp.product_id,
-                    p.product_name,
-                    pp.purchase_id,
-                    pu.purchase_date,
-                    s.name AS supplier_name,
-                    w.name AS warehouse_name,
-                    pp.quantity
-                FROM product_purchased pp
-                JOIN product p ON pp.product_id = p.product_id
-                JOIN purchase pu ON pp.purchase_id = pu.purchase_id
-                JOIN supplier s ON pu.supplier_id = s.supplier_id
-                JOIN warehouse w ON pu.warehouse_id = w.warehouse_id
-                '''
-                self.cursor.execute(display_query)
-                joined_records = self.cursor.fetchall()
-
-                # Step 3: Display headers
-                headers = ["Product ID", "Product Name", "Purchase ID", "Purchase Date", "Supplier Name", "Warehouse Name", "Quantity"]
-                print(" | ".join(headers))
-                print("-" * len(" | ".join(headers)))
-
-                # Step 4: Display records
-                if not joined_records:
-                    print("No records found.")
-                else:
-                    for record in joined_records:
-                        print(" | ".join(str(item) for item in record))
+    elif tool_choice in ['9', '10']:
+        scope = input("Enter warehouse or location: ").strip().lower()
+        if scope not in INVENTORY_SCOPES:
+            print("Invalid choice. Please enter warehouse or location.")
+            return
 
-            except sqlite3.Error as e:
-                print(f"An error occurred: {e}")
+        if tool_choice == '9':
+            owner_id = int(input(f"Enter {scope} ID: "))
+            product_id = int(input("Enter product ID: "))
+            reorder_point = input("Enter reorder point (press enter to remove it): ")
+            target = input("Enter replenishment target (press enter for none): ") if reorder_point else ""
+            inventory_system.set_reorder_point(scope, owner_id, product_id, int(reorder_point) if reorder_point else None,
+                                               int(target) if target else None)
+            print("Reorder point saved.")
+            return
 
-        elif table == "movement_product":
-            try:
-                # Step 2: Fetch and display joined records
-                print("\nDisplaying joined records from movement_product:")
-                display_query = '''
-                SELECT 
-                    mp.product_id,
-                    p.product_name,
-                    mp.movement_id,
-                    m.movement_date,
-                    w.name AS warehouse_name,
-                    l.name AS location_name,
-                    mp.quantity
-                FROM movement_product mp
-                JOIN product p ON mp.product_id = p.product_id
-                JOIN movement m ON mp.movement_id = m.movement_id
-                JOIN warehouse w ON m.warehouse_id = w.warehouse_id
-                JOIN location l ON m.location_id = l.location_id
-                '''
-                self.cursor.execute(display_query)
-                joined_records = self.cursor.fetchall()
-
-                # Step 3: Display headers
-                headers = ["Product ID", "Product Name", "Movement ID", "Movement Date", "Warehouse Name", "Location Name", "Quantity"]
-                print(" | ".join(headers))
-                print("-" * len(" | ".join(headers)))
-
-                # Step 4: Display records
-                if not joined_records:
-                    print("No records found.")
-                else:
-                    for record in joined_records:
-                        print(" | ".join(str(item) for item in record))
+        owner_id = input(f"Enter {scope} ID (press enter for all): ")
+        alerts = inventory_system.low_stock(scope, int(owner_id) if owner_id else None)
+        print("Alert ID | Scope | Owner ID | Product ID | Quantity | Reorder Point | Raised At")
+        print("-" * 79)
+        if not alerts:
+            print("No records found.")
+        for alert in alerts:
+            print(" | ".join(str(item) for item in alert))
 
-            except sqlite3.Error as e:
-                print(f"An error occurred: {e}")
+    elif tool_choice == '11':
+        months = int(input("Enter months to keep besides the current one (press enter for 12): ") or 12)
+        moved = inventory_system.archive_sales(months)
+        if not moved:
+            print("No sales to archive.")
+        for period, sales, lines in moved:
+            print(f"{period}: archived {sales} sales with {lines} lines")
 
-        elif table == "sales_product":
-            try:
-                # Step 2: Fetch and display joined records
-                print("\nDisplaying joined records from sales_product:")
-                display_query = '''
-                SELECT 
-                    sp.product_id,
-                    p.product_name,
-                    sp.sales_id,
-                    s.sales_date,
-                    u.name AS customer_name,
-                    l.name AS location_name,
-                    sp.quantity
-                FROM sales_product sp
-                JOIN product p ON sp.product_id = p.product_id
-                JOIN sales s ON sp.sales_id = s.sales_id
-                JOIN user u ON s.user_id = u.user_id
-                JOIN location l ON s.location_id = l.location_id
-                '''
-                self.cursor.execute(display_query)
-                joined_records = self.cursor.fetchall()
-
-                # Step 3: Display headers
-                headers = ["Product ID", "Product Name", "Sales ID", "Sales Date", "Customer Name", "Location Name", "Quantity"]
-                print(" | ".join(headers))
-                print("-" * len(" | ".join(headers)))
-
-                # Step 4: Display records
-                if not joined_records:
-                    print("No records found.")
-                else:
-                    for record in joined_records:
-                        print(" | ".join(str(item) for item in record))
+    elif tool_choice == '12':
+        start_day = input("Enter start date (YYYY-MM-DD): ")
+        end_day = input("Enter end date (YYYY-MM-DD): ")
+        location_id = input("Enter location ID (press enter for all locations): ")
+        print("Sales ID | Location ID | User ID | Sales Date | Product ID | Quantity")
+        print("-" * 69)
+        found = False
+        for sales_id, location, user_id, sales_date, product_id, quantity in inventory_system.iter_sales(
+                start_day, end_day, int(location_id) if location_id else None):
+            found = True
+            print(f"{sales_id} | {location} | {user_id} | {format_epoch(sales_date, '%Y-%m-%d')} | {product_id} | {quantity}")
+        if not found:
+            print("No records found.")
 
-            except sqlite3.Error as e:
-                print(f"An error occurred: {e}")
+    elif tool_choice == '13':
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d-%H%M%S")
+        default = f"{os.path.splitext(inventory_system.db_name)[0]}-{stamp}.db"
+        path = input(f"Enter backup file name (press enter for {default}): ") or default
 
-        elif table == "warehouse_product":
-            try:
-                # Step 2: Fetch and display joined records
-                print("\nDisplaying joined records from warehouse_product:")
-                display_query = '''
-                SELECT 
-                    wp.product_id, 
-                    p.product_name, 
-                    wi.warehouse_inventory_id, 
-                    w.warehouse_id, 
-                    w.name AS warehouse_name, 
-                    wp.quantity
-                FROM warehouse_product wp
-                JOIN product p ON wp.product_id = p.product_id
-                JOIN warehouse_inventory wi ON wp.warehouse_inventory_id = wi.warehouse_inventory_id
-                JOIN warehouse w ON wi.warehouse_id = w.warehouse_id
-                '''
-                self.cursor.execute(display_query)
-                joined_records = self.cursor.fetchall()
-
-                # Step 3: Display headers
-                headers = ["Product ID", "Product Name", "Warehouse Inventory ID", "Warehouse ID", "Warehouse Name", "Quantity"]
-                print(" | ".join(headers))
-                print("-" * len(" | ".join(headers)))
-
-                # Step 4: Display records
-                if not joined_records:
-                    print("No records found.")
-                else:
-                    for record in joined_records:
-                        print(" | ".join(str(item) for item in record))
+        def progress(copied, total):
+            print(f"\rCopied {copied}/{total} pages ({100 * copied // max(total, 1)}%)", end="")
 
-            except sqlite3.Error as e:
-                print(f"An error occurred: {e}")
+        try:
+            result = inventory_system.backup(path, progress=progress)
+        except (sqlite3.Error, OSError) as e:
+            print(f"\nBackup failed: {e}")
+            return
+        print(f"\nBacked up {result['bytes'] / 1e6:.1f} MB to {result['path']} in {result['seconds']} s "
+              f"({result['mb_per_sec']} MB/s, {result['restarts']} restarts)")
 
-        elif table == "location_product":
-            try:
-                # Fetch and display the joined results
-                print("\nDisplaying joined records from location_product:")
-                display_query = '''
-                SELECT 
-                    lp.product_id, 
-                    p.product_name, 
-                    li.location_inventory_id, 
-                    l.location_id, 
-                    l.name AS location_name, 
-                    lp.quantity
-                FROM location_product lp
-                JOIN product p ON lp.product_id = p.product_id
-                JOIN location_inventory li ON lp.location_inventory_id = li.location_inventory_id
-                JOIN location l ON li.location_id = l.location_id
-                '''
-                self.cursor.execute(display_query)
-                joined_records = self.cursor.fetchall()
-
-                # Display headers
-                headers = ["Product ID", "Product Name", "Location Inventory ID", "Location ID", "Location Name", "Quantity"]
-                print(" | ".join(headers))
-                print("-" * len(" | ".join(headers)))
-
-                # Display records
-                if not joined_records:
-                    print("No records found.")
-                else:
-                    for record in joined_records:
-                        print(" | ".join(str(item) for item in record))
+    elif tool_choice == '14':
+        location_ids = input("Enter location IDs separated by commas (press enter for all): ")
+        location_ids = [int(part) for part in location_ids.split(",")] if location_ids else None
+        plan = inventory_system.plan_replenishment(location_ids)
+        print("Location ID | Warehouse ID | Product ID | Quantity | On Hand | Target")
+        print("-" * 67)
+        if not plan:
+            print("No records found.")
+            return
+        for row in plan:
+            print(" | ".join(str(item) for item in row))
+        if input("Apply this plan? (y/n): ").strip().lower() == 'y':
+            print(inventory_system.replenish(location_ids).detail)
 
-            except sqlite3.Error as e:
-                print(f"An error occurred: {e}")
+    elif tool_choice == '15':
+        checkpoint_id = inventory_system.checkpoint_ledger()
+        print(f"Inventory ledger checkpoint {checkpoint_id} taken.")
 
-        else:        
-        
-            try:
-                # Fetch all columns dynamically
-                self.cursor.execute(f"PRAGMA table_info({table})")
-                columns = [column[1] for column in self.cursor.fetchall()]
-                
-                # Display column names
-                print(" | ".join(columns))
-                print("-" * (len(" | ".join(columns))))
-                
-                # Fetch and display all records
-                self.cursor.execute(f"SELECT * FROM {table}")
-                records = self.cursor.fetchall()
-                
-                if not records:
-                    print("No records found.")
-                    return
-                
-                for record in records:
-                    print(" | ".join(str(item) for item in record))
-            
-            except sqlite3.Error as e:
-                print(f"An error occurred: {e}")
+    elif tool_choice == '16':
+        mismatches = inventory_system.verify_ledger()
+        if not mismatches:
+            print("The inventory ledger matches the stock on hand.")
+            return
+        print("Scope | Owner ID | Product ID | Ledger | Stock")
+        print("---------------------------------------------")
+        for row in mismatches:
+            print(" | ".join(str(item) for item in row))
+
+    elif tool_choice == '17':
+        scope = input("Enter warehouse or location: ").strip().lower()
+        if scope not in INVENTORY_SCOPES:
+            print("Invalid choice. Please enter warehouse or location.")
+            return
+        owner_id = int(input(f"Enter {scope} ID: "))
+        moment = input("Enter date (YYYY-MM-DD for close of day, or YYYY-MM-DD HH:MM:SS): ").strip()
+        if len(moment) == 10:
+            moment = to_epoch(moment) + 86399
+        levels = inventory_system.stock_as_of(moment, scope, owner_id)
+        print(f"Stock as of {format_epoch(to_epoch(moment))} UTC")
+        print("Product ID | Quantity")
+        print("---------------------")
+        if not levels:
+            print("No records found.")
+        for product_id, quantity in levels:
+            print(f"{product_id} | {quantity}")
 
+    else:
+        print("Invalid tool selection!")
 
 
 def main():
-    inventory_system = InventoryManagement()
+    inventory_system = InventoryManagement(instrument=True)
 
     while True:
         print("\n--- Inventory Management System ---")
@@ -1201,13 +4509,21 @@ def main():
         print("2. Update Record")
         print("3. Delete Record")
         print("4. Display Records")
-        print("5. Exit")
+        print("5. Tools and Reports")
+        print("6. Exit")
         
-        choice = input("Enter your choice (1-5): ")
+        choice = input("Enter your choice (1-6): ")
         
-        if choice == '5':
+        if choice == '6':
             print("Exiting the system...")
             break
+
+        if choice == '5':
+            try:
+                tools_menu(inventory_system)
+            except ValueError:
+                print("Caught a ValueError: Invalid value provided.")
+            continue
         
         if choice in ['1', '3', '4']:
             print("\nSelect Table:")
@@ -1264,7 +4580,12 @@ def main():
                 elif choice == '3':
                     inventory_system.delete_record(selected_table)
                 elif choice == '4':
-                    inventory_system.display_record(selected_table)
+                    filters = {}
+                    filter_text = input("Filter as column=value (press enter to show all): ")
+                    if filter_text:
+                        column, _, value = filter_text.partition("=")
+                        filters[column.strip()] = value.strip()
+                    inventory_system.display_record(selected_table, filters)
 
             
             # except (ValueError, IndexError):
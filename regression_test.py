@@ -0,0 +1,652 @@
+"""
+Regression tests for the inventory library, run on copies of a database.
+
+Every test runs on its own copy of the database in a temporary directory, so
+the database itself is left unchanged. Each prints what it checks and what is
+expected, then PASSED or the problems found, like test.py. A test is a
+function of the copy's path and the temporary directory that returns the
+problems it found, listed in TESTS with its title and expected output.
+
+    python regression_test.py --db inventory-final2.db
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from main import InventoryManagement, ShardRouter, WriteQueue, split_database
+
+
+def copy_database(source, directory, name):
+    path = os.path.join(directory, name)
+    shutil.copyfile(source, path)
+    return path
+
+
+def new_sale(inventory, location_id):
+    # A fresh sale at the location, so its lines never clash with existing ones
+    cursor = inventory.cursor
+    cursor.execute("SELECT MIN(user_id) FROM user")
+    cursor.execute("INSERT INTO sales (location_id, user_id, sales_date) VALUES (?, ?, ?) RETURNING sales_id",
+                   (location_id, cursor.fetchone()[0], int(time.time())))
+    sales_id = cursor.fetchone()[0]
+    inventory.conn.commit()
+    return sales_id
+
+
+def new_parent(inventory, table, values):
+    # Insert a purchase, movement or sale row dated now and return its ID
+    columns = {'purchase': "supplier_id, warehouse_id", 'movement': "warehouse_id, location_id"}[table]
+    inventory.cursor.execute(f"INSERT INTO {table} ({columns}, {table}_date) VALUES (?, ?, ?) RETURNING {table}_id",
+                             (*values, int(time.time())))
+    parent_id = inventory.cursor.fetchone()[0]
+    inventory.conn.commit()
+    return parent_id
+
+
+def stocked_product(inventory):
+    # (location_id, product_id) of some product a location holds
+    inventory.read_cursor.execute("""
+        SELECT location_id, product_id FROM location_stock WHERE quantity > 0
+        ORDER BY quantity DESC, location_id, product_id LIMIT 1
+    """)
+    return inventory.read_cursor.fetchone()
+
+
+def check_basket_checkout(db_name, directory):
+    """
+    Check out a basket with one line the location cannot cover, then one
+    that repeats a product
+
+    Returns:
+        list: One message per problem found, empty if the first basket changed
+            nothing and the second was applied as one line
+    """
+    inventory = InventoryManagement(db_name)
+    try:
+        location_id, product_id = stocked_product(inventory)
+        inventory.read_cursor.execute("""
+            SELECT product_id, quantity FROM location_stock
+            WHERE location_id = ? AND product_id != ? AND quantity > 0 ORDER BY product_id LIMIT 1
+        """, (location_id, product_id))
+        found = inventory.read_cursor.fetchone()
+        if found is None:
+            return [f"location {location_id} holds a single product, nothing to test"]
+        short_id, short_held = found
+        before = inventory.stock_available('location', location_id, [product_id, short_id])
+        sales_id = new_sale(inventory, location_id)
+
+        problems = []
+        result = inventory.adjust_inventory_for_basket(sales_id, [(product_id, 1), (short_id, short_held + 1)])
+        if result or result.error != 'insufficient_stock':
+            problems.append(f"a basket short of product {short_id} returned ok={result.ok}, error={result.error}")
+        if inventory.stock_available('location', location_id, [product_id, short_id]) != before:
+            problems.append("the rejected basket changed the stock")
+        inventory.cursor.execute("SELECT COUNT(*) FROM sales_product WHERE sales_id = ?", (sales_id,))
+        if inventory.cursor.fetchone()[0]:
+            problems.append("the rejected basket left sale lines behind")
+
+        result = inventory.adjust_inventory_for_basket(sales_id, [(product_id, 1), (product_id, 2)])
+        if not result:
+            problems.append(f"a basket of 1 and 2 of product {product_id} failed: {result.detail}")
+        inventory.cursor.execute("SELECT product_id, quantity FROM sales_product WHERE sales_id = ?", (sales_id,))
+        lines = inventory.cursor.fetchall()
+        if lines != [(product_id, 3)]:
+            problems.append(f"the basket was stored as {lines}, expected one line of 3")
+        after = inventory.stock_available('location', location_id, [product_id])[product_id]
+        if after != before[product_id] - 3:
+            problems.append(f"product {product_id} went from {before[product_id]} to {after}, expected 3 less")
+        return problems
+    finally:
+        inventory.close()
+
+
+def check_repeated_policy_ids(db_name, directory):
+    """
+    Plan a draw-down from an explicit policy that lists one inventory twice
+
+    Returns:
+        list: One message per problem found, empty if the row was counted once
+    """
+    inventory = InventoryManagement(db_name)
+    try:
+        inventory.read_cursor.execute("""
+            SELECT li.location_id, lp.product_id, lp.location_inventory_id, lp.quantity
+            FROM location_product lp
+            JOIN location_inventory li ON li.location_inventory_id = lp.location_inventory_id
+            WHERE lp.quantity > 0 ORDER BY li.location_id, lp.product_id LIMIT 1
+        """)
+        location_id, product_id, location_inventory_id, held = inventory.read_cursor.fetchone()
+        plan, available = inventory.plan_allocation('location', location_id, [(product_id, held + 1)],
+                                                    [location_inventory_id, location_inventory_id])
+        problems = []
+        if available != {product_id: held}:
+            problems.append(f"inventory {location_inventory_id} holds {held} but {available} was available")
+        if plan != [(product_id, location_inventory_id, held)]:
+            problems.append(f"the plan was {plan}, expected all {held} from inventory {location_inventory_id}")
+        return problems
+    finally:
+        inventory.close()
+
+
+def check_write_queue_failures(db_name, directory):
+    """
+    Queue a basket line with a text quantity and a sale line that already
+    exists, then a good sale
+
+    Returns:
+        list: One message per problem found, empty if each failure stayed with
+            its own operation and the good sale was committed
+    """
+    inventory = InventoryManagement(db_name, pooled=True)
+    queue = WriteQueue(inventory)
+    try:
+        location_id, product_id = stocked_product(inventory)
+        sales_id, other_id = new_sale(inventory, location_id), new_sale(inventory, location_id)
+        problems = []
+
+        bad = queue.submit('basket', sales_id, [(product_id, 'x')])
+        try:
+            bad.result(timeout=10)
+            problems.append("the bad basket line did not fail")
+        except (TypeError, ValueError):
+            pass
+        except Exception as e:
+            problems.append(f"the bad basket line failed with {e!r} instead of its own error")
+
+        first = queue.submit('sales', product_id, sales_id, 1)
+        repeated = queue.submit('sales', product_id, sales_id, 1)
+        try:
+            if not first.result(timeout=10):
+                problems.append(f"the first sale line was rejected: {first.result().detail}")
+            result = repeated.result(timeout=10)
+            if result or result.error != 'conflict':
+                problems.append(f"the repeated sale line returned ok={result.ok}, error={result.error}")
+        except Exception as e:
+            problems.append(f"a queued sale line raised {e!r} instead of returning a result")
+
+        good = queue.submit('sales', product_id, other_id, 1)
+        try:
+            if not good.result(timeout=10):
+                problems.append("the sale after the failures was rejected")
+        except Exception as e:
+            problems.append(f"the sale after the failures failed: {e!r}")
+        return problems
+    finally:
+        queue.close()
+        inventory.close()
+
+
+def check_explicit_policy_shortage(db_name, directory):
+    """
+    Sell one more than an explicitly chosen inventory row holds, at a
+    location whose other rows could cover it
+
+    Returns:
+        list: One message per problem found, empty if the sale was rejected and nothing changed
+    """
+    inventory = InventoryManagement(db_name)
+    try:
+        inventory.read_cursor.execute("""
+            SELECT li.location_id, lp.product_id, lp.location_inventory_id, lp.quantity
+            FROM location_product lp
+            JOIN location_inventory li ON li.location_inventory_id = lp.location_inventory_id
+            JOIN location_stock ls ON ls.location_id = li.location_id AND ls.product_id = lp.product_id
+            WHERE lp.quantity > 0 AND ls.quantity > lp.quantity
+            ORDER BY li.location_id, lp.product_id LIMIT 1
+        """)
+        found = inventory.read_cursor.fetchone()
+        if found is None:
+            return ["no product is held by more than one inventory at a location, nothing to test"]
+        location_id, product_id, location_inventory_id, held = found
+        before = inventory.stock_available('location', location_id, [product_id])[product_id]
+        sales_id = new_sale(inventory, location_id)
+
+        problems = []
+        result = inventory.adjust_inventory_for_sales(product_id, sales_id, held + 1, [location_inventory_id])
+        if result or result.error != 'insufficient_stock':
+            problems.append(f"selling {held + 1} from inventory {location_inventory_id} holding {held} "
+                            f"returned ok={result.ok}, error={result.error}")
+        after = inventory.stock_available('location', location_id, [product_id])[product_id]
+        if after != before:
+            problems.append(f"location {location_id} product {product_id} went from {before} to {after}")
+        result = inventory.adjust_inventory_for_sales(product_id, sales_id, held, [location_inventory_id])
+        if not result:
+            problems.append(f"selling the {held} inventory {location_inventory_id} holds failed: {result.detail}")
+        mismatches = inventory.verify_ledger()
+        if mismatches:
+            problems.append(f"ledger differs from the stock: {mismatches[:3]}")
+        return problems
+    finally:
+        inventory.close()
+
+
+def check_invalid_quantities(db_name, directory):
+    """
+    Purchase, move and sell quantities of 0 and below
+
+    Returns:
+        list: One message per problem found, empty if each was rejected as
+            invalid_quantity without changing the stock
+    """
+    inventory = InventoryManagement(db_name)
+    try:
+        location_id, product_id = stocked_product(inventory)
+        sales_id = new_sale(inventory, location_id)
+        cursor = inventory.cursor
+        cursor.execute("SELECT MIN(purchase_id) FROM purchase")
+        purchase_id = cursor.fetchone()[0]
+        cursor.execute("SELECT MIN(movement_id) FROM movement")
+        movement_id = cursor.fetchone()[0]
+        before = inventory.ledger_balances()
+
+        problems = []
+        for quantity in (0, -3):
+            for name, adjust, parent_id in (('purchase', inventory.adjust_inventory_for_product_purchased, purchase_id),
+                                            ('movement', inventory.adjust_inventory_for_movement, movement_id),
+                                            ('sale', inventory.adjust_inventory_for_sales, sales_id)):
+                result = adjust(product_id, parent_id, quantity)
+                if result or result.error != 'invalid_quantity':
+                    problems.append(f"a {name} of {quantity} returned ok={result.ok}, error={result.error}")
+        if inventory.ledger_balances() != before:
+            problems.append("the rejected quantities changed the stock")
+        return problems
+    finally:
+        inventory.close()
+
+
+def sales_daily_rows(inventory):
+    # sales_daily as {(day, location_id, product_id): (units, cost_value)}, cost rounded to cents
+    inventory.read_cursor.execute("SELECT day, location_id, product_id, units, cost_value FROM sales_daily")
+    return {row[:3]: (row[3], round(row[4], 2)) for row in inventory.read_cursor.fetchall()}
+
+
+def check_sales_daily(db_name, directory):
+    """
+    Sell a line and a basket, then rebuild sales_daily from sales_product
+
+    Returns:
+        list: One message per problem found, empty if the sale paths kept
+            sales_daily equal to a rebuild and the reports show the sales
+    """
+    inventory = InventoryManagement(db_name)
+    try:
+        location_id, product_id = stocked_product(inventory)
+        day = time.strftime("%Y-%m-%d", time.gmtime())
+        before = inventory.top_products(location_id, day, day)
+        before = {row[0]: row[2] for row in before}.get(product_id, 0)
+
+        problems = []
+        if not inventory.adjust_inventory_for_sales(product_id, new_sale(inventory, location_id), 2):
+            problems.append(f"selling 2 of product {product_id} failed")
+        if not inventory.adjust_inventory_for_basket(new_sale(inventory, location_id), [(product_id, 3)]):
+            problems.append(f"a basket of 3 of product {product_id} failed")
+        after = {row[0]: row[2] for row in inventory.top_products(location_id, day, day)}.get(product_id, 0)
+        if after != before + 5:
+            problems.append(f"top_products shows {after} units of product {product_id} today, expected {before + 5}")
+
+        kept = sales_daily_rows(inventory)
+        inventory.rebuild_sales_daily()
+        rebuilt = sales_daily_rows(inventory)
+        differ = [key for key in set(kept) | set(rebuilt) if kept.get(key) != rebuilt.get(key)]
+        if differ:
+            problems.append(f"{len(differ)} sales_daily rows differ from a rebuild, e.g. {sorted(differ)[:3]}")
+        return problems
+    finally:
+        inventory.close()
+
+
+def check_rebuild_after_archive(db_name, directory):
+    """
+    Archive every closed month of sales, then rebuild the daily aggregate
+
+    Returns:
+        list: One message per problem found, empty if the store comparison
+            is the same before the archive and after the rebuild
+    """
+    inventory = InventoryManagement(db_name)
+    try:
+        before = inventory.compare_locations('0000-01-01', '9999-12-31')
+        moved = inventory.archive_sales(0, os.path.join(directory, "archive"))
+        if not moved:
+            return ["no sales were archived, nothing to test"]
+        inventory.rebuild_sales_daily()
+        after = inventory.compare_locations('0000-01-01', '9999-12-31')
+
+        problems = []
+        before = {row[0]: row for row in before}
+        after = {row[0]: row for row in after}
+        for location_id in sorted(set(before) | set(after)):
+            old, new = before.get(location_id), after.get(location_id)
+            if old is None or new is None or old[2] != new[2] or abs(old[3] - new[3]) > 0.01:
+                problems.append(f"location {location_id}: {old} before, {new} after")
+        return problems
+    finally:
+        inventory.close()
+
+
+def check_split_and_fan_out(db_name, directory):
+    """
+    Split the database into two regions, read across them through a
+    ShardRouter, then split again after a failed split
+
+    Returns:
+        list: One message per problem found, empty if the regions together
+            read the same as the source and a failed split left no files
+    """
+    # Read with a plain connection, the split itself must bring an old source up to date
+    conn = sqlite3.connect(db_name)
+    try:
+        owners = {scope: [row[0] for row in conn.execute(f"SELECT {scope}_id FROM {scope} ORDER BY {scope}_id")]
+                  for scope in ('warehouse', 'location')}
+    finally:
+        conn.close()
+
+    def shard_map(west_name):
+        halves = {scope: (ids[:(len(ids) + 1) // 2], ids[(len(ids) + 1) // 2:]) for scope, ids in owners.items()}
+        return {region: {'db_name': os.path.join(directory, name), 'shard': number,
+                         'warehouses': halves['warehouse'][number], 'locations': halves['location'][number]}
+                for number, (region, name) in enumerate((('east', "east.db"), ('west', west_name)))}
+
+    problems = []
+    # The west shard cannot be created, the east one must not be left behind
+    try:
+        split_database(db_name, shard_map(os.path.join("missing", "west.db")))
+        problems.append("a split into a missing directory did not fail")
+    except sqlite3.Error:
+        pass
+    if os.path.exists(os.path.join(directory, "east.db")):
+        problems.append("the failed split left east.db behind")
+
+    shards = shard_map("west.db")
+    split_database(db_name, shards)
+
+    source = InventoryManagement(db_name)
+    try:
+        stock = {(scope, owner_id): source.stock_levels(scope, owner_id)
+                 for scope in owners for owner_id in owners[scope]}
+        compared = {row[0]: row[2] for row in source.compare_locations('0000-01-01', '9999-12-31')}
+        source.read_cursor.execute("SELECT COUNT(*) FROM sales")
+        sales = source.read_cursor.fetchone()[0]
+    finally:
+        source.close()
+    router = ShardRouter(shards)
+    try:
+        for (scope, owner_id), levels in stock.items():
+            if router.stock_levels(scope, owner_id) != levels:
+                problems.append(f"{scope} {owner_id} holds different stock in its shard")
+        found = {row[0]: row[2] for row in router.compare_locations('0000-01-01', '9999-12-31')}
+        if found != compared:
+            problems.append(f"compare_locations across the shards gave {found}, the source {compared}")
+        found = sum(1 for _ in router.iter_records('sales'))
+        if found != sales:
+            problems.append(f"the shards hold {found} sales, the source {sales}")
+        for region, shard in router.shards.items():
+            mismatches = shard.verify_ledger()
+            if mismatches:
+                problems.append(f"the {region} ledger differs from its stock: {mismatches[:3]}")
+    finally:
+        router.close()
+    return problems
+
+
+def check_ledger_checkpoints(db_name, directory):
+    """
+    Purchase, move and sell, take a checkpoint, and try to change the ledger
+
+    Returns:
+        list: One message per problem found, empty if the ledger kept up with
+            the stock, the checkpoint stored only what changed and did not
+            change any balance, and the ledger refused the update
+    """
+    inventory = InventoryManagement(db_name)
+    try:
+        cursor = inventory.cursor
+        cursor.execute("""
+            SELECT ws.warehouse_id, ws.product_id FROM warehouse_stock ws
+            WHERE ws.quantity > 0 ORDER BY ws.quantity DESC LIMIT 1
+        """)
+        warehouse_id, product_id = cursor.fetchone()
+        cursor.execute("SELECT MIN(supplier_id) FROM supplier")
+        supplier_id = cursor.fetchone()[0]
+        cursor.execute("SELECT MIN(location_id) FROM location")
+        location_id = cursor.fetchone()[0]
+        first = inventory.checkpoint_ledger()
+
+        problems = []
+        for name, result in (
+                ('purchase', inventory.adjust_inventory_for_product_purchased(
+                    product_id, new_parent(inventory, 'purchase', (supplier_id, warehouse_id)), 5)),
+                ('movement', inventory.adjust_inventory_for_movement(
+                    product_id, new_parent(inventory, 'movement', (warehouse_id, location_id)), 3)),
+                ('sale', inventory.adjust_inventory_for_sales(product_id, new_sale(inventory, location_id), 1))):
+            if not result:
+                problems.append(f"the {name} of product {product_id} failed: {result.detail}")
+        mismatches = inventory.verify_ledger()
+        if mismatches:
+            problems.append(f"ledger differs from the stock: {mismatches[:3]}")
+
+        before = {key: quantity for key, quantity in inventory.ledger_balances().items() if quantity}
+        checkpoint_id = inventory.checkpoint_ledger()
+        after = {key: quantity for key, quantity in inventory.ledger_balances().items() if quantity}
+        if checkpoint_id == first:
+            problems.append("no checkpoint was taken after the new entries")
+        if after != before:
+            problems.append("the balances changed when the checkpoint was taken")
+        cursor.execute("SELECT COUNT(*) FROM ledger_checkpoint_balance WHERE checkpoint_id = ?", (checkpoint_id,))
+        stored = cursor.fetchone()[0]
+        if stored != 2:
+            problems.append(f"the checkpoint stored {stored} balances, expected the 2 that changed")
+
+        try:
+            cursor.execute("UPDATE inventory_ledger SET delta = delta + 1 WHERE entry_id = 1")
+            problems.append("the ledger accepted an UPDATE")
+        except sqlite3.Error:
+            pass
+        inventory.conn.rollback()
+        return problems
+    finally:
+        inventory.close()
+
+
+def replayed_stock(inventory, moment, scope, owner_id):
+    # Stock at a moment summed from every ledger entry, without checkpoints
+    inventory.read_cursor.execute("""
+        SELECT product_id, SUM(delta) FROM inventory_ledger
+        WHERE scope = ? AND owner_id = ? AND recorded_at <= ?
+        GROUP BY product_id HAVING SUM(delta) > 0 ORDER BY product_id
+    """, (scope, owner_id, moment))
+    return inventory.read_cursor.fetchall()
+
+
+def check_stock_as_of(db_name, directory):
+    """
+    Sell before and after a checkpoint, and ask for the stock at moments
+    before, between and after them
+
+    Returns:
+        list: One message per problem found, empty if stock_as_of always
+            matched a replay of the whole ledger and the stock at the time
+    """
+    inventory = InventoryManagement(db_name)
+    try:
+        location_id, product_id = stocked_product(inventory)
+        moments = []
+        inventory.read_cursor.execute("SELECT recorded_at FROM ledger_checkpoint ORDER BY checkpoint_id")
+        for recorded_at, in inventory.read_cursor.fetchall():
+            moments += [recorded_at - 1, recorded_at]
+
+        problems = []
+        expected = {}
+        for quantity in (2, 1):
+            # Entries are dated to the second, so the sales must fall in later seconds
+            moments.append(int(time.time()))
+            expected[moments[-1]] = inventory.stock_levels('location', location_id)
+            time.sleep(1.1)
+            if not inventory.adjust_inventory_for_sales(product_id, new_sale(inventory, location_id), quantity):
+                problems.append(f"selling {quantity} of product {product_id} failed")
+            inventory.checkpoint_ledger()
+        moments.append(int(time.time()))
+        expected[moments[-1]] = inventory.stock_levels('location', location_id)
+
+        for moment in moments:
+            found = inventory.stock_as_of(moment, 'location', location_id)
+            if found != replayed_stock(inventory, moment, 'location', location_id):
+                problems.append(f"stock_as_of({moment}) differs from a replay of the ledger")
+            if moment in expected and found != expected[moment]:
+                problems.append(f"stock_as_of({moment}) differs from the stock at that moment")
+        return problems
+    finally:
+        inventory.close()
+
+
+def check_lock_released(db_name, directory):
+    """
+    Check out a basket line with a text quantity, then take the write lock
+    from another connection without waiting
+
+    Returns:
+        list: One message per problem found, empty if the bad line raised and
+            left the write lock free
+    """
+    inventory = InventoryManagement(db_name, pooled=True)
+    try:
+        location_id, product_id = stocked_product(inventory)
+        sales_id = new_sale(inventory, location_id)
+        problems = []
+
+        try:
+            inventory.adjust_inventory_for_basket(sales_id, [(product_id, 'x')])
+            problems.append("the bad basket line did not raise")
+        except (TypeError, ValueError):
+            pass
+        if inventory.conn.in_transaction:
+            problems.append("the bad basket line left its transaction open")
+        other = sqlite3.connect(db_name, timeout=0)
+        try:
+            other.execute("BEGIN IMMEDIATE")
+            other.rollback()
+        except sqlite3.OperationalError as e:
+            problems.append(f"another writer could not take the write lock: {e}")
+        finally:
+            other.close()
+        return problems
+    finally:
+        inventory.close()
+
+
+def check_dimension_cache(db_name, directory):
+    """
+    Read a product through the dimension cache while this process and then
+    another process rename it
+
+    Returns:
+        list: One message per problem found, empty if the cache served the
+            repeated read and showed each new name on the next read
+    """
+    inventory = InventoryManagement(db_name)
+    try:
+        inventory.read_cursor.execute("SELECT MIN(product_id), MAX(product_id) FROM product")
+        product_id, other_id = inventory.read_cursor.fetchone()
+        problems = []
+
+        name = inventory.dimension('product', product_id)['product_name']
+        inventory.dimension('product', other_id)
+        hits = inventory.dimension_stats()['hits']
+        if inventory.dimension('product', product_id)['product_name'] != name:
+            problems.append("the cached product name changed without a write")
+        if inventory.dimension_stats()['hits'] != hits + 1:
+            problems.append("the repeated read was not served from the cache")
+
+        inventory.edit_record('product', product_id, {'product_name': "renamed here"})
+        found = inventory.dimension('product', product_id)['product_name']
+        if found != "renamed here":
+            problems.append(f"after a rename in this process the cache still gave {found!r}")
+
+        # A plain UPDATE in another process, only the triggers and data_version tell the cache
+        subprocess.run([sys.executable, "-c", (
+            "import sqlite3, sys; conn = sqlite3.connect(sys.argv[1]); "
+            "conn.execute(\"UPDATE product SET product_name = 'renamed elsewhere' WHERE product_id = ?\", "
+            "(int(sys.argv[2]),)); conn.commit()"), db_name, str(product_id)], check=True)
+        found = inventory.dimension('product', product_id)['product_name']
+        if found != "renamed elsewhere":
+            problems.append(f"after a rename in another process the cache still gave {found!r}")
+        inventory.read_cursor.execute("SELECT product_name FROM product WHERE product_id = ?", (other_id,))
+        other_name = inventory.read_cursor.fetchone()[0]
+        if inventory.dimension('product', other_id)['product_name'] != other_name:
+            problems.append(f"product {other_id} no longer matches the table")
+        return problems
+    finally:
+        inventory.close()
+
+
+# (title, expected output, test) in the order they run
+TESTS = [
+    ("CHECK OUT A BASKET WITH A SHORT LINE, THEN ONE REPEATING A PRODUCT",
+     "SHORT BASKET CHANGES NOTHING, REPEATED PRODUCT SOLD AS ONE LINE",
+     check_basket_checkout),
+    ("PLAN A DRAW-DOWN FROM AN EXPLICIT POLICY LISTING ONE INVENTORY TWICE",
+     "THE INVENTORY IS COUNTED ONCE",
+     check_repeated_policy_ids),
+    ("QUEUE A MALFORMED BASKET LINE AND A REPEATED SALE LINE, THEN A GOOD SALE",
+     "ERROR, THEN A CONFLICT RESULT, GOOD SALE STILL COMMITTED",
+     check_write_queue_failures),
+    ("SELL MORE THAN THE CHOSEN INVENTORY HOLDS WITH AN EXPLICIT POLICY",
+     "REJECTED AS INSUFFICIENT STOCK, STOCK AND LEDGER UNCHANGED",
+     check_explicit_policy_shortage),
+    ("PURCHASE, MOVE AND SELL QUANTITIES OF 0 AND -3",
+     "EACH REJECTED AS AN INVALID QUANTITY, STOCK UNCHANGED",
+     check_invalid_quantities),
+    ("SELL A LINE AND A BASKET, THEN REBUILD THE DAILY SALES AGGREGATE",
+     "SALES IN TODAY'S TOP PRODUCTS, AGGREGATE EQUAL TO THE REBUILD",
+     check_sales_daily),
+    ("ARCHIVE OLD SALES AND REBUILD THE DAILY SALES AGGREGATE",
+     "STORE COMPARISON UNCHANGED",
+     check_rebuild_after_archive),
+    ("SPLIT THE DATABASE INTO TWO REGIONS AND READ ACROSS THEM",
+     "SAME STOCK, SALES AND STORE COMPARISON AS THE SOURCE, NO FILES LEFT BY A FAILED SPLIT",
+     check_split_and_fan_out),
+    ("PURCHASE, MOVE AND SELL, CHECKPOINT THE LEDGER AND TRY TO UPDATE IT",
+     "LEDGER MATCHES THE STOCK, CHECKPOINT STORES ONLY THE CHANGED BALANCES, UPDATE REFUSED",
+     check_ledger_checkpoints),
+    ("SELL BEFORE AND AFTER A CHECKPOINT AND ASK FOR THE STOCK AS OF MOMENTS AROUND THEM",
+     "SAME AS A FULL REPLAY OF THE LEDGER AND AS THE STOCK AT THE TIME",
+     check_stock_as_of),
+    ("CHECK OUT A BASKET LINE WITH A TEXT QUANTITY, THEN TAKE THE WRITE LOCK ELSEWHERE",
+     "ERROR, WRITE LOCK RELEASED",
+     check_lock_released),
+    ("READ A PRODUCT THROUGH THE CACHE WHILE THIS PROCESS AND THEN ANOTHER RENAME IT",
+     "REPEATED READ FROM THE CACHE, EACH NEW NAME SEEN ON THE NEXT READ",
+     check_dimension_cache),
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the regression tests on copies of a database")
+    parser.add_argument("--db", default="inventory-final2.db", help="database to copy, left unchanged")
+    args = parser.parse_args()
+
+    failed = 0
+    for number, (title, expected, test) in enumerate(TESTS, 1):
+        print(f"TEST {number} - {title};\nEXPECTED OUTPUT - {expected}")
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                problems = test(copy_database(args.db, directory, "test.db"), directory)
+            except Exception as e:
+                problems = [f"raised {e!r}"]
+        if problems:
+            failed += 1
+            for problem in problems:
+                print(f"FAILED: {problem}")
+        else:
+            print("PASSED")
+        print()
+
+    print(f"{len(TESTS) - failed} of {len(TESTS)} tests passed")
+    if failed:
+        sys.exit(1)
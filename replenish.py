@@ -0,0 +1,38 @@
+"""
+Nightly replenishment: refill every location whose stock of a product is at
+or below its reorder point up to its target, from the warehouses, in one
+transaction. Targets are set with the "Set a reorder point" tool.
+
+    python replenish.py --db inventory-final2.db --dry-run
+    python replenish.py --db inventory-final2.db
+"""
+
+import argparse
+
+from main import InventoryManagement
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move stock from warehouses to locations below their reorder points")
+    parser.add_argument("--db", default="inventory-final2.db")
+    parser.add_argument("--locations", help="comma separated location IDs, all locations by default")
+    parser.add_argument("--policy", default="largest", help="warehouse draw-down policy")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without applying it")
+    args = parser.parse_args()
+    location_ids = [int(part) for part in args.locations.split(",")] if args.locations else None
+
+    inventory = InventoryManagement(args.db)
+    try:
+        if args.dry_run:
+            plan = inventory.plan_replenishment(location_ids)
+            print("Location ID | Warehouse ID | Product ID | Quantity | On Hand | Target")
+            for row in plan:
+                print(" | ".join(str(item) for item in row))
+            print(f"{len(plan)} lines, {sum(row[3] for row in plan)} units")
+        else:
+            result = inventory.replenish(location_ids, args.policy)
+            print(result.detail)
+            if not result:
+                raise SystemExit(1)
+    finally:
+        inventory.close()
@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# Archive closed months of sales, e.g. ./run-archive.sh --keep-months 12 --archive-dir archive
+python archive_sales.py "$@"
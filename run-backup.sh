@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# Back up the database, e.g. ./run-backup.sh --dir backups --interval 3600 --keep 24
+python backup.py "$@"
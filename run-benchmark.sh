@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# Run the benchmark, e.g. ./run-benchmark.sh --scales 0.01,0.1,1 --baseline benchmark-baseline.json
+python benchmark.py "$@"
@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# Export the fact tables, e.g. ./run-export.sh --format ndjson --gzip --state export-state.json
+python export.py "$@"
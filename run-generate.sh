@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# Generate a synthetic database, e.g. ./run-generate.sh --db speedyeats-sf10.db --scale 10
+python generate_data.py "$@"
@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# Run the regression tests on copies of the database, e.g. ./run-regression.sh --db speedyeats-sf10.db
+python regression_test.py "$@"
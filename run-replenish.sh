@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# Refill locations from the warehouses, e.g. ./run-replenish.sh --dry-run
+python replenish.py "$@"
@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# Run the HTTP/JSON service
+python server.py "$@"
\ No newline at end of file
@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# Split the database into regional shards, e.g. ./run-shard.sh --db inventory-final2.db --shards shards.json
+python shard.py "$@"
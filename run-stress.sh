@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# Stress the inventory adjustments with concurrent writers, e.g. ./run-stress.sh --workers 32
+python stress_test.py "$@"
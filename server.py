@@ -0,0 +1,282 @@
+"""
+Local HTTP/JSON service for the SpeedyEats inventory system.
+
+Routes:
+    GET    /tables/<table>                   list records, ?limit=&after=<key>&<column>=<value>
+    POST   /tables/<table>                   insert a record, body: column values
+    PUT    /tables/<table>/<id>[/<id2>]      update a record, body: column values
+    DELETE /tables/<table>/<id>[/<id2>]      delete a record
+    POST   /inventory/purchase               {"product_id", "purchase_id", "quantity"}
+    POST   /inventory/movement               {"product_id", "movement_id", "quantity", "policy"}
+    POST   /inventory/sales                  {"product_id", "sales_id", "quantity", "policy"}
+                                             or {"sales_id", "lines": [[product_id, quantity], ...]}
+    GET    /stock/<warehouse|location>/<id>  quantity per product from the stock rollups,
+                                             or ?as_of=<epoch seconds|YYYY-MM-DD[ HH:MM:SS]> from the ledger
+    GET    /metrics                          request counts and latency per route,
+                                             per-statement SQL latency with --instrument,
+                                             backup counters with --backup-dir, and
+                                             dimension cache hits and misses
+
+SQLite work runs on a bounded pool of worker threads, each with its own
+connection from InventoryManagement's pooled mode. With --shards the service
+serves regional shard databases through a ShardRouter instead of one file.
+"""
+
+import argparse
+import asyncio
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from main import (AdjustmentResult, BackupScheduler, InventoryManagement, LatencyHistogram, ShardRouter, load_shard_map,
+                  to_epoch)
+
+
+class LatencyStats:
+    # Request count, error count and latency histogram of one route
+    def __init__(self):
+        self.errors = 0
+        self.latency = LatencyHistogram()
+
+    def record(self, seconds, failed):
+        self.errors += failed
+        self.latency.record(seconds)
+
+    def summary(self):
+        return dict(self.latency.summary(), errors=self.errors)
+
+
+# Records per GET /tables/<table> response unless ?limit= is given
+DEFAULT_PAGE_SIZE = 100
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# HTTP status of a rejected inventory adjustment, by AdjustmentResult.error
+ADJUSTMENT_STATUS = {'not_found': 404, 'invalid_quantity': 400, 'empty_basket': 400, 'busy': 503,
+                     'database_error': 500}
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+def adjustment_status(result, success_status):
+    if result:
+        return success_status
+    return ADJUSTMENT_STATUS.get(result.error, 409)
+
+
+def list_page(inventory, table, limit, after, filters):
+    records, has_more = inventory.fetch_page(table, limit, after, None, filters)
+    return {
+        "headers": inventory.record_headers(table),
+        "records": records,
+        "next_after": inventory.record_key(table, records[-1]) if has_more else None,
+    }
+
+
+class InventoryService:
+    def __init__(self, db_name='inventory-final2.db', workers=8, max_pending=256, instrument=False, shard_map=None):
+        if shard_map:
+            self.inventory = ShardRouter(shard_map, instrument=instrument)
+        else:
+            self.inventory = InventoryManagement(db_name, pooled=True, instrument=instrument)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sqlite")
+        # Caps the requests waiting for a worker, the rest wait on the socket
+        self.pending = asyncio.Semaphore(max_pending)
+        self.metrics = {}
+        self.started = time.time()
+        self.backups = None
+
+    async def run_blocking(self, function, *args):
+        async with self.pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, function, *args)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                path, _, query = target.partition("?")
+                status, payload = await self.dispatch(method, path, parse_qs(query), body)
+                data = json.dumps(payload).encode()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                writer.write(
+                    f"{version} {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, query, body):
+        start = time.perf_counter()
+        route = f"{method} {path}"
+        try:
+            parts = [part for part in path.split("/") if part]
+            if parts and parts[0] == "tables" and len(parts) >= 2:
+                route = f"{method} /tables/{parts[1]}" + ("/<id>" if len(parts) > 2 else "")
+            values = json.loads(body) if body else {}
+            status, payload = await self.route(method, parts, query, values)
+
+        except HttpError as e:
+            status, payload = e.status, {"error": str(e)}
+        except (ValueError, KeyError, TypeError) as e:
+            status, payload = 400, {"error": str(e)}
+        except sqlite3.IntegrityError as e:
+            status, payload = 409, {"error": str(e)}
+        except sqlite3.Error as e:
+            status, payload = 500, {"error": str(e)}
+
+        stats = self.metrics.setdefault(route, LatencyStats())
+        stats.record(time.perf_counter() - start, status >= 400)
+        return status, payload
+
+    async def route(self, method, parts, query, values):
+        inventory = self.inventory
+
+        if parts == ["metrics"] and method == "GET":
+            return 200, {
+                "uptime_s": round(time.time() - self.started, 1),
+                "routes": {route: stats.summary() for route, stats in self.metrics.items()},
+                "pool": inventory.pool_stats(),
+                "queries": inventory.query_report(),
+                "dimension_cache": inventory.dimension_stats(),
+                "backups": self.backups.stats if self.backups else None,
+            }
+
+        if len(parts) >= 2 and parts[0] == "tables":
+            table, key = parts[1], [int(part) for part in parts[2:]]
+            if table not in inventory.tables:
+                raise HttpError(404, f"Unknown table: {table}")
+
+            if method == "GET" and not key:
+                # ?limit=N&after=<id>[,<id2>], any other parameter filters on a column
+                filters = {name: values[-1] for name, values in query.items() if name not in ("limit", "after")}
+                limit = int(query.get("limit", [DEFAULT_PAGE_SIZE])[-1])
+                after = [int(part) for part in query["after"][-1].split(",")] if "after" in query else None
+                return 200, await self.run_blocking(list_page, inventory, table, limit, after, filters)
+            if method == "POST" and not key:
+                result = await self.run_blocking(inventory.add_record, table, values)
+                if isinstance(result, AdjustmentResult):
+                    # Inventory adjustments report their outcome instead of a row ID
+                    return adjustment_status(result, 201), result.as_dict()
+                return 201, {"ok": True, "id": result}
+            if method == "PUT" and key:
+                updated = await self.run_blocking(inventory.edit_record, table, key, values)
+                return (200 if updated else 404), {"updated": updated}
+            if method == "DELETE" and key:
+                deleted = await self.run_blocking(inventory.remove_record, table, key)
+                return (200 if deleted else 404), {"deleted": deleted}
+            raise HttpError(405, f"{method} not supported on {'/'.join(parts)}")
+
+        if len(parts) == 3 and parts[0] == "stock" and method == "GET":
+            scope, owner_id = parts[1], int(parts[2])
+            if scope not in ("warehouse", "location"):
+                raise HttpError(404, f"Unknown stock scope: {scope}")
+            if "as_of" in query:
+                # Epoch seconds or a UTC date, rebuilt from the inventory ledger
+                moment = query["as_of"][-1]
+                moment = to_epoch(int(moment) if moment.isdigit() else moment)
+                levels = await self.run_blocking(inventory.stock_as_of, moment, scope, owner_id)
+                return 200, {"stock": dict(levels), "as_of": moment}
+            levels = await self.run_blocking(inventory.stock_levels, scope, owner_id)
+            return 200, {"stock": dict(levels)}
+
+        if len(parts) == 2 and parts[0] == "inventory" and method == "POST":
+            operation = parts[1]
+            if operation == "purchase":
+                result = await self.run_blocking(inventory.adjust_inventory_for_product_purchased,
+                                                 values["product_id"], values["purchase_id"], values["quantity"])
+            elif operation == "movement":
+                result = await self.run_blocking(inventory.adjust_inventory_for_movement,
+                                                 values["product_id"], values["movement_id"], values["quantity"],
+                                                 values.get("policy", "largest"))
+            elif operation == "sales" and "lines" in values:
+                result = await self.run_blocking(inventory.adjust_inventory_for_basket,
+                                                 values["sales_id"], [tuple(line) for line in values["lines"]],
+                                                 values.get("policy", "largest"))
+            elif operation == "sales":
+                result = await self.run_blocking(inventory.adjust_inventory_for_sales,
+                                                 values["product_id"], values["sales_id"], values["quantity"],
+                                                 values.get("policy", "largest"))
+            else:
+                raise HttpError(404, f"Unknown inventory operation: {operation}")
+            return adjustment_status(result, 200), result.as_dict()
+
+        raise HttpError(404, f"No route for {method} /{'/'.join(parts)}")
+
+
+async def serve(db_name, host, port, workers, instrument, backup_dir=None, backup_interval=3600, backup_keep=24,
+                shards=None):
+    service = InventoryService(db_name, workers, instrument=instrument,
+                               shard_map=load_shard_map(shards) if shards else None)
+    if shards:
+        db_name = f"shards of {shards}"
+    if backup_dir and shards:
+        raise SystemExit("--backup-dir backs up one database, run backup.py per shard instead")
+    if backup_dir:
+        service.backups = BackupScheduler(service.inventory, backup_dir, backup_interval, backup_keep).start()
+        print(f"Backing up to {backup_dir} every {backup_interval:g} s, keeping {backup_keep}")
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Serving {db_name} on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if service.backups:
+            service.backups.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP/JSON service for the inventory system")
+    parser.add_argument("--db", default="inventory-final2.db")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--instrument", action="store_true", help="report per-statement SQL latency in /metrics")
+    parser.add_argument("--backup-dir", help="take periodic online backups into this directory")
+    parser.add_argument("--backup-interval", type=float, default=3600, help="seconds between backups")
+    parser.add_argument("--backup-keep", type=int, default=24, help="number of backups to keep")
+    parser.add_argument("--shards", help="shard map JSON, serve regional shard databases instead of --db")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, args.workers, args.instrument,
+                          args.backup_dir, args.backup_interval, args.backup_keep, args.shards))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
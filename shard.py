@@ -0,0 +1,37 @@
+"""
+Split an inventory database into regional shards for ShardRouter.
+
+The shard map names each region's database file, its shard number and its
+warehouses and locations (paths are relative to the map file):
+
+    {"east": {"db_name": "inventory-east.db", "shard": 0, "warehouses": [1, 2], "locations": [1, 2, 3]},
+     "west": {"db_name": "inventory-west.db", "shard": 1, "warehouses": [3], "locations": [4, 5]}}
+
+    python shard.py --db inventory-final2.db --shards shards.json
+    python server.py --shards shards.json
+"""
+
+import argparse
+import time
+
+from main import ShardRouter, load_shard_map, split_database
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split an inventory database into regional shards")
+    parser.add_argument("--db", default="inventory-final2.db", help="database to split, migrated but otherwise left unchanged")
+    parser.add_argument("--shards", required=True, help="shard map JSON")
+    args = parser.parse_args()
+
+    shard_map = load_shard_map(args.shards)
+    started = time.perf_counter()
+    split_database(args.db, shard_map)
+    print(f"Split {args.db} into {len(shard_map)} shards in {time.perf_counter() - started:.1f} s")
+
+    router = ShardRouter(shard_map)
+    try:
+        for region, shard in router.shards.items():
+            shard.read_cursor.execute("SELECT COUNT(*) FROM sales")
+            print(f"  {region}: {shard_map[region]['db_name']}, {shard.read_cursor.fetchone()[0]} sales")
+    finally:
+        router.close()
@@ -0,0 +1,240 @@
+"""
+Contention stress test for the inventory adjustment paths.
+
+Many processes, each with its own connection, sell the same few products at
+one location while others move more of them in from a warehouse, asking for
+far more than is in stock. Afterwards the stock must add up exactly: what
+the location and warehouse hold now is what they held before, plus what was
+moved in and minus what was sold or moved out, no row is negative, and the
+rollups and inventory ledger agree with the item rows. Any oversell or lost
+update fails the run.
+
+    python stress_test.py --db inventory-final2.db --workers 32 --operations 200
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from main import INVENTORY_SCOPES, STOCK_ROLLUPS, InventoryManagement, LatencyHistogram
+
+
+def prepare(source, work):
+    # Every run starts from a fresh copy of the source database in WAL mode
+    for path in (work, work + "-wal", work + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.copyfile(source, work)
+    inventory = InventoryManagement(work, pooled=True)
+    inventory.close()
+
+
+def pick_target(db_name, products):
+    """
+    The warehouse, location and products to fight over: the location and
+    products with the most stock, and the warehouse holding most of them
+
+    Returns:
+        tuple: (warehouse_id, location_id, product_ids)
+    """
+    inventory = InventoryManagement(db_name, pooled=True)
+    try:
+        cursor = inventory.read_cursor
+        cursor.execute("""
+            SELECT location_id FROM location_stock GROUP BY location_id ORDER BY SUM(quantity) DESC LIMIT 1
+        """)
+        location_id = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT product_id FROM location_stock WHERE location_id = ? AND quantity > 0
+            ORDER BY quantity DESC, product_id LIMIT ?
+        """, (location_id, products))
+        product_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT warehouse_id FROM warehouse_stock
+            WHERE product_id IN (SELECT value FROM json_each(?))
+            GROUP BY warehouse_id ORDER BY SUM(quantity) DESC LIMIT 1
+        """, (json.dumps(product_ids),))
+        warehouse_id = cursor.fetchone()[0]
+        return warehouse_id, location_id, product_ids
+    finally:
+        inventory.close()
+
+
+def stock(inventory, warehouse_id, location_id, product_ids):
+    # (scope, product_id) -> quantity on hand from the rollups, check() compares them with the item rows
+    totals = {}
+    for scope, owner_id in (('warehouse', warehouse_id), ('location', location_id)):
+        for product_id, quantity in inventory.stock_levels(scope, owner_id):
+            if product_id in product_ids:
+                totals[scope, product_id] = quantity
+    return totals
+
+
+def worker(db_name, role, parents, product_ids, busy_timeout, seed):
+    """
+    Run one process's share of sales or movements
+
+    Returns:
+        list: (ok, error, product_id, quantity, seconds) per operation
+    """
+    rng = random.Random(seed)
+    inventory = InventoryManagement(db_name, pooled=True)
+    # Opening waits as usual, the short timeout only applies to the operations under test
+    inventory.conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+    outcomes = []
+    try:
+        for parent_id in parents:
+            product_id, quantity = rng.choice(product_ids), rng.randint(1, 5)
+            start = time.perf_counter()
+            if role == 'sales':
+                result = inventory.adjust_inventory_for_sales(product_id, parent_id, quantity)
+            else:
+                result = inventory.adjust_inventory_for_movement(product_id, parent_id, quantity)
+            outcomes.append((result.ok, result.error, product_id, quantity, time.perf_counter() - start))
+    finally:
+        inventory.close()
+    return outcomes
+
+
+def new_parents(db_name, role, warehouse_id, location_id, count):
+    # Insert the sales or movement rows the workers add lines to
+    inventory = InventoryManagement(db_name, pooled=True)
+    try:
+        cursor = inventory.cursor
+        now = int(time.time())
+        if role == 'sales':
+            cursor.execute("SELECT MIN(user_id) FROM user")
+            user_id = cursor.fetchone()[0]
+            rows = [(location_id, user_id, now)] * count
+            sql = "INSERT INTO sales (location_id, user_id, sales_date) VALUES (?, ?, ?) RETURNING sales_id"
+        else:
+            rows = [(warehouse_id, location_id, now)] * count
+            sql = ("INSERT INTO movement (warehouse_id, location_id, movement_date) VALUES (?, ?, ?) "
+                   "RETURNING movement_id")
+        ids = []
+        for row in rows:
+            cursor.execute(sql, row)
+            ids.append(cursor.fetchone()[0])
+        inventory.conn.commit()
+        return ids
+    finally:
+        inventory.close()
+
+
+def check(db_name, warehouse_id, location_id, product_ids, before, outcomes):
+    """
+    Compare the stock after the run with the stock before and the applied operations
+
+    Returns:
+        list: One message per problem found, empty if the stock adds up
+    """
+    expected = dict(before)
+    for role, ok, _, product_id, quantity, _ in outcomes:
+        if not ok:
+            continue
+        if role == 'sales':
+            expected['location', product_id] = expected.get(('location', product_id), 0) - quantity
+        else:
+            expected['warehouse', product_id] = expected.get(('warehouse', product_id), 0) - quantity
+            expected['location', product_id] = expected.get(('location', product_id), 0) + quantity
+
+    problems = []
+    inventory = InventoryManagement(db_name, pooled=True)
+    try:
+        after = stock(inventory, warehouse_id, location_id, product_ids)
+        for key in sorted(set(expected) | set(after)):
+            if expected.get(key, 0) != after.get(key, 0):
+                problems.append(f"{key[0]} product {key[1]}: expected {expected.get(key, 0)}, "
+                                f"found {after.get(key, 0)}")
+
+        cursor = inventory.read_cursor
+        for table in ('warehouse_product', 'location_product'):
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE quantity < 0")
+            negative = cursor.fetchone()[0]
+            if negative:
+                problems.append(f"{negative} {table} rows are negative")
+        for scope, owner_id in (('warehouse', warehouse_id), ('location', location_id)):
+            item_table, inventory_table, inventory_key, owner_key = INVENTORY_SCOPES[scope]
+            cursor.execute(f"""
+                SELECT COUNT(*) FROM (
+                    SELECT t.product_id, SUM(t.quantity) AS quantity
+                    FROM {item_table} t JOIN {inventory_table} i ON i.{inventory_key} = t.{inventory_key}
+                    WHERE i.{owner_key} = ? GROUP BY t.product_id
+                ) items
+                LEFT JOIN {STOCK_ROLLUPS[scope]} s ON s.product_id = items.product_id AND s.{owner_key} = ?
+                WHERE IFNULL(s.quantity, 0) != items.quantity
+            """, (owner_id, owner_id))
+            drifted = cursor.fetchone()[0]
+            if drifted:
+                problems.append(f"{drifted} {STOCK_ROLLUPS[scope]} rows differ from the item rows")
+        mismatches = inventory.verify_ledger()
+        if mismatches:
+            problems.append(f"{len(mismatches)} inventory ledger balances differ from the stock")
+    finally:
+        inventory.close()
+    return problems
+
+
+def run(db_name, workers, operations, products, busy_timeout, seed):
+    warehouse_id, location_id, product_ids = pick_target(db_name, products)
+    inventory = InventoryManagement(db_name, pooled=True)
+    try:
+        before = stock(inventory, warehouse_id, location_id, product_ids)
+    finally:
+        inventory.close()
+    print(f"Warehouse {warehouse_id} and location {location_id}, products {product_ids}")
+    print(f"Stock before: {before}")
+
+    # Half the processes sell at the location, the other half move stock in
+    roles = ['sales' if index % 2 == 0 else 'movement' for index in range(workers)]
+    jobs = [(role, new_parents(db_name, role, warehouse_id, location_id, operations)) for role in roles]
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(worker, db_name, role, parents, product_ids, busy_timeout, seed + index)
+                   for index, (role, parents) in enumerate(jobs)]
+        outcomes = [(role,) + outcome for (role, _), future in zip(jobs, futures) for outcome in future.result()]
+    elapsed = time.perf_counter() - started
+
+    latency = LatencyHistogram()
+    counts = {}
+    for role, ok, error, _, _, seconds in outcomes:
+        latency.record(seconds)
+        key = f"{role} {'ok' if ok else error}"
+        counts[key] = counts.get(key, 0) + 1
+
+    summary = latency.summary()
+    print(f"{len(outcomes)} operations by {workers} processes in {elapsed:.1f}s, "
+          f"{len(outcomes) / elapsed:.0f} ops/sec, p50 {summary['p50_ms']} ms, p99 {summary['p99_ms']} ms")
+    for key, count in sorted(counts.items()):
+        print(f"  {key}: {count}")
+
+    problems = check(db_name, warehouse_id, location_id, product_ids, before, outcomes)
+    if problems:
+        print(f"\n{len(problems)} problem(s):")
+        for problem in problems:
+            print(f"  {problem}")
+        return False
+    print("\nStock adds up: no oversell and no lost updates.")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress the inventory adjustments with concurrent writers")
+    parser.add_argument("--db", default="inventory-final2.db", help="database to copy, left unchanged")
+    parser.add_argument("--work", default="stress-work.db", help="copy the test runs on")
+    parser.add_argument("--workers", type=int, default=16, help="writer processes")
+    parser.add_argument("--operations", type=int, default=200, help="operations per process")
+    parser.add_argument("--products", type=int, default=3, help="products the writers fight over")
+    parser.add_argument("--busy-timeout", type=int, default=200, help="milliseconds to wait for the write lock")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    prepare(args.db, args.work)
+    if not run(args.work, args.workers, args.operations, args.products, args.busy_timeout, args.seed):
+        sys.exit(1)